@@ -0,0 +1,184 @@
+"""Cold storage for old history and transactions rows.
+
+Rows older than a cutoff are moved out of Library.db into one archive file per year,
+archive/Library-<year>.db next to it. attachArchives() brings them back on request as the
+temporary history_all and transactions_all views of a connection.
+
+The dashboard counters and the daily transaction rollup behind the graph are not touched,
+they keep counting archived transactions. Their rebuilds read the archived totals through
+loadArchivedTransactionDaily().
+"""
+import configparser
+import glob
+import os
+import re
+from datetime import date, timedelta
+
+from PyQt5.QtSql import QSqlDatabase, QSqlQuery
+
+from history import migrateHistory
+from queries import *
+
+
+# SQLite's default limit of attached databases is 10, one is kept free
+MAX_ATTACHED_ARCHIVES = 9
+
+DEFAULT_KEEP_DAYS = 365
+
+
+class ArchiveError(Exception):
+    """An archive step failed, the rows of the year being moved stay in Library.db."""
+
+
+def loadCutoff(config_path: str, keep_days: int = None) -> str:
+    """First day (yyyy-MM-dd) kept in Library.db: keep_days, or keep_days of the [archive] section
+    of config_path, before today.
+    """
+    if keep_days is None:
+        config = configparser.ConfigParser()
+        config.read(config_path)
+        keep_days = config.getint('archive', 'keep_days', fallback=DEFAULT_KEEP_DAYS)
+    return str(date.today() - timedelta(days=keep_days))
+
+
+def archiveDirectory(database_path: str) -> str:
+    return os.path.join(os.path.dirname(os.path.abspath(database_path)), 'archive')
+
+
+def archivePath(database_path: str, year: str) -> str:
+    return os.path.join(archiveDirectory(database_path), f'Library-{year}.db')
+
+
+def archiveYears(database_path: str) -> list:
+    """Years that have an archive file, oldest first."""
+    paths = glob.glob(os.path.join(archiveDirectory(database_path), 'Library-*.db'))
+    return sorted(match.group(1) for match in (re.search(r'Library-(\d{4})\.db$', path) for path in paths) if match)
+
+
+def execOrRaise(query: QSqlQuery, sql: str, *values):
+    """Runs sql with values bound in order, raises ArchiveError if it fails."""
+    query.prepare(sql)
+    for index, value in enumerate(values):
+        query.bindValue(index, value)
+    if not query.exec_():
+        raise ArchiveError(f"{sql.split()[0]}: {query.lastError().text()}")
+    return query
+
+
+def migrateArchivedHistory(query: QSqlQuery, schema: str):
+    """Converts the free text history of an archive file written by an older version into events,
+    raises ArchiveError if it fails.
+    """
+    if not migrateHistory(query, schema):
+        raise ArchiveError(f"Can't convert the free text history of {schema}")
+
+
+def archiveYear(query: QSqlQuery, database_path: str, year: str, cutoff: str) -> dict:
+    """Moves the rows of year older than cutoff into the year's archive file, in one transaction.
+
+    Returns {table: rows moved}.
+    """
+    schema = f'archive_{year}'
+    execOrRaise(query, "ATTACH DATABASE ? AS " + schema, archivePath(database_path, year))
+    moved = {}
+    try:
+        migrateArchivedHistory(query, schema)
+        for table in archived_tables:
+            execOrRaise(query, create_archive_table_query.format(schema=schema, table=table))
+            execOrRaise(query, create_archive_index_query.format(schema=schema, table=table))
+
+        execOrRaise(query, "BEGIN IMMEDIATE")
+        try:
+            for table in archived_tables:
+                execOrRaise(query, copy_archive_rows_query.format(schema=schema, table=table), cutoff, year)
+                execOrRaise(query, delete_archived_rows_query.format(table=table), cutoff, year)
+                moved[table] = query.numRowsAffected()
+            execOrRaise(query, "COMMIT")
+        except ArchiveError:
+            query.exec_("ROLLBACK")
+            raise
+    finally:
+        query.finish()
+        query.exec_("DETACH DATABASE " + schema)
+    return moved
+
+
+def archiveBefore(database: QSqlDatabase, cutoff: str) -> dict:
+    """Moves the history and transactions rows older than cutoff (yyyy-MM-dd) into per-year archive
+    files, then vacuums Library.db. Returns {year: {table: rows moved}}.
+
+    Raises ArchiveError, the years archived before the failing one stay archived.
+    """
+    database_path = database.databaseName()
+    query = QSqlQuery(database)
+    years = set()
+    for table in archived_tables:
+        execOrRaise(query, select_archive_years_query.format(table=table), cutoff)
+        while query.next():
+            years.add(query.value(0))
+
+    os.makedirs(archiveDirectory(database_path), exist_ok=True)
+    archived = {year: archiveYear(query, database_path, year, cutoff) for year in sorted(years)}
+    if archived:
+        query.exec_("VACUUM")
+    return archived
+
+
+def archivesLeftOut(database_path: str) -> list:
+    """Years of the oldest archive files, beyond MAX_ATTACHED_ARCHIVES, that attachArchives leaves out."""
+    return archiveYears(database_path)[:-MAX_ATTACHED_ARCHIVES]
+
+
+def loadArchivedTransactionDaily(query: QSqlQuery, database_path: str) -> list:
+    """Fills the temporary archived_transaction_daily table of the query's connection with the daily
+    totals of the archived transactions. The archive files are attached one at a time, so all of
+    them are counted whatever their number. Returns their years, raises ArchiveError if one can't be read.
+    """
+    execOrRaise(query, create_archived_transaction_daily_table_query)
+    execOrRaise(query, "DELETE FROM temp.archived_transaction_daily")
+    years = archiveYears(database_path)
+    for year in years:
+        schema = f'archive_{year}'
+        execOrRaise(query, "ATTACH DATABASE ? AS " + schema, archivePath(database_path, year))
+        try:
+            execOrRaise(query, insert_archived_transaction_daily_query.format(schema=schema))
+        finally:
+            query.finish()
+            query.exec_("DETACH DATABASE " + schema)
+    return years
+
+
+def attachArchives(database: QSqlDatabase) -> list:
+    """Attaches the most recent archive files to database and creates the temporary history_all and
+    transactions_all views over the live and archived rows. Returns the attached years.
+
+    SQLite attaches a limited number of databases, the years of archivesLeftOut aren't attached.
+    """
+    detachArchives(database)
+    query = QSqlQuery(database)
+    years = archiveYears(database.databaseName())[-MAX_ATTACHED_ARCHIVES:]
+    for year in years:
+        execOrRaise(query, f"ATTACH DATABASE ? AS archive_{year}", archivePath(database.databaseName(), year))
+        migrateArchivedHistory(query, f'archive_{year}')
+
+    for table in archived_tables:
+        if years:
+            selects = ' UNION ALL '.join(f'SELECT * FROM archive_{year}.{table}' for year in years)
+            execOrRaise(query, create_archive_view_query.format(table=table, selects=selects))
+        else:
+            execOrRaise(query, create_live_view_query.format(table=table))
+    return years
+
+
+def detachArchives(database: QSqlDatabase):
+    """Drops the views of attachArchives and detaches the archive files."""
+    query = QSqlQuery(database)
+    for table in archived_tables:
+        query.exec_(f"DROP VIEW IF EXISTS temp.{table}_all")
+    query.exec_("PRAGMA database_list")
+    schemas = []
+    while query.next():
+        if query.value(1).startswith('archive_'):
+            schemas.append(query.value(1))
+    for schema in schemas:
+        query.exec_("DETACH DATABASE " + schema)
@@ -0,0 +1,85 @@
+"""Measures checkouts (lend book) per second against a scratch database.
+
+A checkout is the statements completeLendBook runs: add the client, upsert its record,
+insert the transaction (which fires the counters and rollup triggers) and take the copies.
+
+    python benchmarks/checkout_benchmark.py
+    python benchmarks/checkout_benchmark.py --checkouts 500
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from queries import *  # noqa: E402
+
+
+def createDatabase(path: str) -> sqlite3.Connection:
+    """Creates the tables and triggers a checkout touches, with one class, house and book."""
+    # isolation_level=None leaves transaction control to the statements themselves
+    connection = sqlite3.connect(path, isolation_level=None)
+    for statement in (create_books_table_query, create_clients_table_query, create_client_records_table_query,
+                      create_transactions_table_query, create_categories_table_query, create_classes_table_query,
+                      create_houses_table_query, create_dashboard_counters_table_query,
+                      create_transactions_counters_trigger_query, create_transaction_daily_table_query,
+                      create_transactions_daily_trigger_query):
+        connection.execute(statement)
+    connection.execute(prepared_statements['insert_class'], ('1A',))
+    connection.execute(prepared_statements['insert_house'], ('Red',))
+    connection.execute(prepared_statements['insert_category'], ('Novel',))
+    connection.execute(prepared_statements['insert_book'], ('Benchmark', 'Novel', 10 ** 9))
+    return connection
+
+
+def checkout(connection: sqlite3.Connection, number: int):
+    """Lends one copy of the benchmark book to client number."""
+    client = (f'First{number}', f'Last{number}', '1A', 'Red')
+    connection.execute(prepared_statements['insert_client'], client)
+    client_id = connection.execute(prepared_statements['select_client_id'], client).fetchone()[0]
+    connection.execute(prepared_statements['upsert_client_record_lend'], (client_id, 1, 1))
+    connection.execute(prepared_statements['insert_transaction'], (client_id, 1, 1, 'LEND', 1))
+    connection.execute(prepared_statements['take_book_quantity'], (1, 1, 1))
+
+
+def autocommitted(connection: sqlite3.Connection, number: int):
+    """Every statement commits on its own, as lendBook used to."""
+    checkout(connection, number)
+
+
+def transactional(connection: sqlite3.Connection, number: int):
+    """The whole checkout is one BEGIN IMMEDIATE ... COMMIT, as lendBook does now."""
+    connection.execute(prepared_statements['begin_immediate'])
+    checkout(connection, number)
+    connection.execute(prepared_statements['commit'])
+
+
+def run(strategy, checkouts: int) -> float:
+    """Returns the checkouts per second of strategy on a fresh database file."""
+    with tempfile.TemporaryDirectory() as directory:
+        connection = createDatabase(os.path.join(directory, 'Library.db'))
+        start = time.perf_counter()
+        for number in range(checkouts):
+            strategy(connection, number)
+        elapsed = time.perf_counter() - start
+        connection.close()
+    return checkouts / elapsed
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--checkouts', type=int, default=200, help='checkouts per run (default: 200)')
+    args = parser.parse_args(argv)
+
+    before = run(autocommitted, args.checkouts)
+    after = run(transactional, args.checkouts)
+    print(f"autocommitted statements: {before:8.1f} checkouts/s")
+    print(f"one transaction:          {after:8.1f} checkouts/s ({after / before:.1f}x)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""Measures keeping the client name completers current as students are added.
+
+Compares re-running the query of a completer after every new client, as
+addClient used to, with patching the in-memory CompletionIndex the completers use now.
+
+    python benchmarks/completer_benchmark.py
+    python benchmarks/completer_benchmark.py --clients 100000 --added 200
+"""
+import argparse
+import os
+import random
+import sqlite3
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import CompletionIndex  # noqa: E402
+from queries import *  # noqa: E402
+
+
+def randomName() -> str:
+    return ''.join(random.choices(string.ascii_lowercase, k=random.randint(3, 9))).capitalize()
+
+
+def createDatabase(clients: int) -> sqlite3.Connection:
+    """An in-memory clients table with clients random names."""
+    connection = sqlite3.connect(':memory:')
+    connection.execute(create_clients_table_query)
+    connection.executemany(prepared_statements['insert_client'],
+                           ((randomName(), randomName(), '1A', 'Red') for _ in range(clients)))
+    return connection
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=100000, help='clients in the table (default: 100000)')
+    parser.add_argument('--added', type=int, default=100, help='clients added one by one (default: 100)')
+    args = parser.parse_args(argv)
+
+    connection = createDatabase(args.clients)
+    added = [(randomName(), randomName(), '1A', 'Red') for _ in range(args.added)]
+
+    start = time.perf_counter()
+    for client in added:
+        connection.execute(prepared_statements['insert_client'], client)
+        connection.execute(prepared_statements['select_client_first_name_counts']).fetchall()
+    reloaded = (time.perf_counter() - start) / args.added
+
+    start = time.perf_counter()
+    index = CompletionIndex(connection.execute(prepared_statements['select_client_first_name_counts']),
+                            substrings=False)
+    loaded = time.perf_counter() - start
+    start = time.perf_counter()
+    for client in added:
+        index.add(client[0])
+    patched = (time.perf_counter() - start) / args.added
+
+    prefixes = [name[:length] for name, *_ in added for length in (1, 2, 3)]
+    start = time.perf_counter()
+    for prefix in prefixes:
+        index.startingWith(prefix)
+    lookup = (time.perf_counter() - start) / len(prefixes)
+
+    print(f"{len(index)} distinct first names of {args.clients + args.added} clients")
+    print(f"re-run the query per client:       {reloaded * 1000:8.3f} ms")
+    print(f"patch the index per client:        {patched * 1000:8.3f} ms (loaded once in {loaded * 1000:.0f} ms)")
+    print(f"prefix lookup per keystroke:       {lookup * 1000:8.3f} ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
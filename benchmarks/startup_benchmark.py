@@ -0,0 +1,87 @@
+"""Measures the launch time to the login window with the .ui files compiled at runtime and cached.
+
+Each launch is a fresh Python process that loads the login and main window form classes,
+as mainApp does on import, and builds the login window. It is timed three ways: with
+uic.loadUiType parsing and generating code on every launch, as mainApp used to, with the
+compiled module cache on the first launch (which compiles and writes it) and on the
+launches after that. Opening the six tabs is timed the same way.
+
+    python benchmarks/startup_benchmark.py
+    python benchmarks/startup_benchmark.py --launches 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# run in a fresh process per launch, prints the timings in ms as JSON
+LAUNCH = """
+import os, sys, time
+start = time.perf_counter()
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, {base_dir!r})
+os.chdir({base_dir!r})
+from PyQt5 import uic
+from PyQt5.QtWidgets import QApplication, QWidget
+from uicache import loadUiClass, uiFiles
+
+app = QApplication(sys.argv[:1])
+imported = time.perf_counter()
+if {cache_dir!r} is None:
+    loadClass = lambda ui_path: uic.loadUiType(ui_path)[0]
+else:
+    loadClass = lambda ui_path: loadUiClass(ui_path, {cache_dir!r})
+login_path, main_path, *tab_paths = uiFiles()
+login, main = loadClass(login_path), loadClass(main_path)
+loaded = time.perf_counter()
+window = QWidget()
+login().setupUi(window)
+shown = time.perf_counter()
+for tab_path in tab_paths:
+    loadClass(tab_path)().setupUi(QWidget())
+tabs = time.perf_counter()
+print(json.dumps({{'ui': (loaded - imported) * 1000, 'login': (shown - start) * 1000,
+                  'tabs': (tabs - shown) * 1000}}))
+"""
+
+
+def launch(cache_dir: str or None) -> dict:
+    """Timings of one launch, cache_dir None compiles the .ui files at runtime."""
+    code = 'import json\n' + LAUNCH.format(base_dir=base_dir, cache_dir=cache_dir)
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def medians(launches: list) -> dict:
+    return {name: statistics.median(launch[name] for launch in launches) for name in launches[0]}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--launches', type=int, default=5, help='launches timed per way (default: 5)')
+    args = parser.parse_args(argv)
+
+    runtime = medians([launch(None) for _ in range(args.launches)])
+    first, cached = [], []
+    for _ in range(args.launches):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            first.append(launch(cache_dir))
+            cached.append(launch(cache_dir))
+    first, cached = medians(first), medians(cached)
+
+    print(f"{f'median of {args.launches} launches':32} {'login+main.ui':>14} {'to login window':>17} {'open 6 tabs':>13}")
+    for label, timings in (('uic.loadUiType at runtime:', runtime), ('compiled cache, first launch:', first),
+                           ('compiled cache, later launches:', cached)):
+        print(f"{label:32} {timings['ui']:11.1f} ms {timings['login']:14.1f} ms {timings['tabs']:10.1f} ms")
+    print(f"launch to login window: {runtime['login'] - cached['login']:.0f} ms faster with the compiled cache "
+          f"({runtime['login'] / cached['login']:.1f}x)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
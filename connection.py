@@ -0,0 +1,264 @@
+"""SQLite connection profiles.
+
+A profile is the set of pragmas applied to every connection as it opens. The profile is picked
+with --profile on the command line, or the profile key of the [connection] section of
+library.ini, and any of its pragmas can be overridden in that section, e.g:
+
+    [connection]
+    profile = fast
+    cache_size = -32000
+
+ConnectionPool hands every other thread its own clone of the main connection, with the same profile.
+"""
+import configparser
+import os
+import threading
+import time
+from contextlib import contextmanager
+from itertools import count
+
+from PyQt5.QtCore import QThread
+from PyQt5.QtSql import QSqlDatabase, QSqlQuery
+
+
+# pragmas are applied in this order, busy_timeout first so switching the journal mode waits for other connections
+PRAGMAS = ('busy_timeout', 'journal_mode', 'synchronous', 'cache_size', 'mmap_size', 'temp_store')
+
+PROFILES = {
+    # SQLite's own defaults: rollback journal and an fsync on every commit
+    'safe': {'busy_timeout': 5000, 'journal_mode': 'DELETE', 'synchronous': 'FULL',
+             'cache_size': -2000, 'mmap_size': 0, 'temp_store': 'DEFAULT'},
+    # write-ahead log with an fsync per checkpoint instead of per commit, 64 MiB page cache, 256 MiB mmap
+    'fast': {'busy_timeout': 5000, 'journal_mode': 'WAL', 'synchronous': 'NORMAL',
+             'cache_size': -64000, 'mmap_size': 268435456, 'temp_store': 'MEMORY'},
+    # WAL and mmap need shared memory, which network file systems don't provide
+    'shared-network-drive': {'busy_timeout': 30000, 'journal_mode': 'DELETE', 'synchronous': 'FULL',
+                             'cache_size': -16000, 'mmap_size': 0, 'temp_store': 'MEMORY'},
+}
+
+DEFAULT_PROFILE = 'fast'
+
+DEFAULT_POOL_SETTINGS = {'max_connections': 4, 'idle_timeout': 60.0}
+
+# SQLite reports these two pragmas as numbers
+PRAGMA_NAMES = {
+    'synchronous': {0: 'OFF', 1: 'NORMAL', 2: 'FULL', 3: 'EXTRA'},
+    'temp_store': {0: 'DEFAULT', 1: 'FILE', 2: 'MEMORY'},
+}
+
+
+class ConnectionProfile:
+    """A named set of pragmas."""
+
+    def __init__(self, name: str, pragmas: dict):
+        self.name = name
+        self.pragmas = pragmas  # {pragma: value}
+
+    def apply(self, database: QSqlDatabase) -> dict:
+        """Applies the pragmas to an open connection and returns the values SQLite settled on."""
+        pragma_query = QSqlQuery(database)
+        for pragma in PRAGMAS:
+            if not pragma_query.exec_(f"PRAGMA {pragma}={self.pragmas[pragma]}"):
+                print(f"Can't set {pragma}: {pragma_query.lastError().text()}")
+        pragma_query.finish()
+        return readPragmas(database)
+
+    def describe(self, database: QSqlDatabase) -> str:
+        """Profile name followed by the pragma values in effect on database."""
+        return f"{self.name} ({', '.join(f'{pragma}={value}' for pragma, value in readPragmas(database).items())})"
+
+
+def readPragmas(database: QSqlDatabase) -> dict:
+    """Returns the current value of every profile pragma of database."""
+    values = {}
+    pragma_query = QSqlQuery(database)
+    for pragma in PRAGMAS:
+        pragma_query.exec_(f"PRAGMA {pragma}")
+        value = pragma_query.value(0) if pragma_query.next() else None
+        values[pragma] = PRAGMA_NAMES.get(pragma, {}).get(value, value)
+    pragma_query.finish()
+    return values
+
+
+def loadProfile(config_path: str, name: str = None) -> ConnectionProfile:
+    """Returns profile name, or the one configured in config_path, with config_path's overrides applied.
+
+    Raises ValueError for an unknown profile or pragma.
+    """
+    config = configparser.ConfigParser()
+    config.read(config_path)
+    section = config['connection'] if config.has_section('connection') else {}
+
+    name = name or section.get('profile', DEFAULT_PROFILE)
+    if name not in PROFILES:
+        raise ValueError(f"Unknown connection profile '{name}', choose from {', '.join(PROFILES)}.")
+
+    pragmas = dict(PROFILES[name])
+    for pragma, value in section.items():
+        if pragma == 'profile':
+            continue
+        if pragma not in PRAGMAS:
+            raise ValueError(f"Unknown pragma '{pragma}' in {os.path.basename(config_path)}.")
+        pragmas[pragma] = value
+    return ConnectionProfile(name, pragmas)
+
+
+def loadPoolSettings(config_path: str) -> dict:
+    """Returns the ConnectionPool keyword arguments from the [pool] section of config_path."""
+    config = configparser.ConfigParser()
+    config.read(config_path)
+    settings = dict(DEFAULT_POOL_SETTINGS)
+    if config.has_section('pool'):
+        settings['max_connections'] = config['pool'].getint('max_connections', settings['max_connections'])
+        settings['idle_timeout'] = config['pool'].getfloat('idle_timeout', settings['idle_timeout'])
+    return settings
+
+
+class PoolTimeoutError(Exception):
+    """No pooled connection became free in time."""
+
+
+class PooledConnection:
+    """A connection of the pool and the thread it belongs to."""
+
+    def __init__(self, database: QSqlDatabase, thread: QThread):
+        self.database = database
+        self.thread = thread
+        self.users = 0  # nested acquire() calls of the owning thread
+        self.last_used = time.monotonic()
+
+    def ownerFinished(self) -> bool:
+        """Whether the owning thread has ended, its connection can then be closed from any thread."""
+        try:
+            return self.thread.isFinished()
+        except RuntimeError:  # Qt already deleted the QThread of a finished non-Qt thread
+            return True
+
+
+class ConnectionPool:
+    """Per-thread clones of a connection.
+
+    QtSql connections can only be used in the thread that opened them, so a thread always gets
+    back its own connection and at most max_connections threads hold one at a time, the others
+    wait (counted in stats()). Connections left idle for idle_timeout seconds are closed by
+    retireIdle(), either from their own thread or from any thread once theirs has finished.
+    A long-lived thread retires its own, see worker.DatabaseWorker.retireIdle.
+    """
+
+    def __init__(self, database: QSqlDatabase, profile: ConnectionProfile, max_connections=4,
+                 idle_timeout=60.0, prefix='pool'):
+        self.template = database.connectionName()
+        self.profile = profile
+        self.max_connections = max_connections
+        self.idle_timeout = idle_timeout
+        self.prefix = prefix
+        self.connections = {}  # {thread ident: PooledConnection}
+        self.condition = threading.Condition()
+        self.connection_numbers = count(1)
+        self.waits = 0
+        self.created = 0
+        self.retired = 0
+
+    def acquire(self, timeout: float = None) -> QSqlDatabase:
+        """Returns the open connection of the calling thread, opening one if it has none.
+
+        Raises PoolTimeoutError if the pool stays full for timeout seconds.
+        """
+        thread_id = threading.get_ident()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.condition:
+            pooled = self.connections.get(thread_id)
+            if pooled is not None and pooled.ownerFinished():
+                # the ident of a finished thread was reused, its connection can't move to this one
+                self._retire(lambda finished: finished is pooled)
+                pooled = None
+            waited = False
+            while pooled is None and len(self.connections) >= self.max_connections:
+                # connections of finished threads only take up room
+                if self._retire(lambda pooled: pooled.ownerFinished()):
+                    continue
+                if not waited:
+                    self.waits += 1
+                    waited = True
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0 or not self.condition.wait(remaining):
+                    raise PoolTimeoutError(f"No free connection after {timeout} seconds.")
+            if pooled is None:
+                pooled = PooledConnection(self._open(), QThread.currentThread())
+                self.connections[thread_id] = pooled
+            pooled.users += 1
+            return pooled.database
+
+    def release(self):
+        """Hands the calling thread's connection back, it stays open for the thread's next acquire()."""
+        with self.condition:
+            pooled = self.connections[threading.get_ident()]
+            pooled.users -= 1
+            pooled.last_used = time.monotonic()
+            self.condition.notify()
+
+    @contextmanager
+    def connection(self, timeout: float = None):
+        """acquire() and release() around a block."""
+        database = self.acquire(timeout)
+        try:
+            yield database
+        finally:
+            self.release()
+
+    def isIdle(self) -> bool:
+        """Whether the calling thread's connection is released and has been for longer than idle_timeout."""
+        with self.condition:
+            pooled = self.connections.get(threading.get_ident())
+            return (pooled is not None and pooled.users == 0
+                    and pooled.last_used <= time.monotonic() - self.idle_timeout)
+
+    def retireIdle(self) -> int:
+        """Closes the connections idle for longer than idle_timeout that the calling thread may close.
+        Returns how many were closed.
+        """
+        thread_id = threading.get_ident()
+        idle_since = time.monotonic() - self.idle_timeout
+        with self.condition:
+            return self._retire(lambda pooled: pooled.last_used <= idle_since
+                                and (self.connections.get(thread_id) is pooled or pooled.ownerFinished()))
+
+    def closeAll(self) -> int:
+        """Closes every released connection, call once the threads using the pool have stopped."""
+        with self.condition:
+            return self._retire(lambda pooled: True)
+
+    def stats(self) -> dict:
+        """Pool counters, to size max_connections."""
+        with self.condition:
+            in_use = sum(1 for pooled in self.connections.values() if pooled.users)
+            return {'open': len(self.connections), 'in_use': in_use, 'idle': len(self.connections) - in_use,
+                    'max': self.max_connections, 'waits': self.waits, 'created': self.created,
+                    'retired': self.retired}
+
+    def _open(self) -> QSqlDatabase:
+        name = f"{self.prefix}_{next(self.connection_numbers)}"
+        database = QSqlDatabase.cloneDatabase(self.template, name)
+        if not database.open():
+            error = database.lastError().text()
+            database = None
+            QSqlDatabase.removeDatabase(name)
+            raise ValueError(f"Can't open pooled connection: {error}")
+        self.profile.apply(database)
+        self.created += 1
+        return database
+
+    def _retire(self, retirable) -> int:
+        """Closes the released connections retirable(pooled) is true for. Called with the condition held."""
+        retired = [thread_id for thread_id, pooled in self.connections.items()
+                   if pooled.users == 0 and retirable(pooled)]
+        for thread_id in retired:
+            pooled = self.connections.pop(thread_id)
+            name = pooled.database.connectionName()
+            pooled.database.close()
+            pooled.database = None  # removeDatabase warns while a QSqlDatabase still refers to it
+            QSqlDatabase.removeDatabase(name)
+        if retired:
+            self.retired += len(retired)
+            self.condition.notify_all()
+        return len(retired)
@@ -0,0 +1,119 @@
+"""Transaction ledger export.
+
+Rows are read with a forward-only query and written to the file one at a time, so memory
+use doesn't grow with the number of transactions.
+"""
+import csv
+import gzip
+import json
+import os
+import time
+
+from PyQt5.QtSql import QSqlDatabase
+
+from archive import archivesLeftOut, attachArchives, detachArchives
+from queries import prepared_statements
+from statements import StatementError, StatementRegistry
+
+
+FORMATS = ('csv', 'jsonl')
+
+PROGRESS_EVERY = 1000  # rows
+
+
+class ExportResult:
+    """Counters of an export run."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.rows = 0
+        self.seconds = 0.0
+        self.cancelled = False
+        self.archives_left_out = []  # years of the archive files that couldn't be attached
+
+    @property
+    def size(self) -> int:
+        return os.path.getsize(self.path) if os.path.isfile(self.path) else 0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+def openOutput(path: str, compress: bool):
+    """Opens path for writing text, through gzip if compress."""
+    if compress:
+        return gzip.open(path, 'wt', encoding='utf-8', newline='')
+    return open(path, 'w', encoding='utf-8', newline='')
+
+
+def exportTransactions(database: QSqlDatabase, path: str, file_format='csv', first_day='0000-01-01',
+                       last_day='9999-12-31', type_='', compress=False, include_archived=False,
+                       progress=None, cancelled=None) -> ExportResult:
+    """Writes the transactions from first_day to last_day (yyyy-MM-dd, both included) of type_
+    ('' for every type) to path as CSV with a header row or as JSON Lines.
+    include_archived adds the transactions moved to the archive files.
+
+    progress, if given, is called with (rows written, rows to write) every PROGRESS_EVERY rows.
+    The export stops and the file is removed as soon as cancelled() returns True.
+    """
+    if file_format not in FORMATS:
+        raise ValueError(f"Unknown export format '{file_format}', choose from {', '.join(FORMATS)}.")
+
+    if include_archived:
+        attachArchives(database)
+    try:
+        result = writeTransactions(database, path, file_format, (first_day, last_day, type_, type_), compress,
+                                   'all_transactions_export' if include_archived else 'transactions_export',
+                                   progress, cancelled)
+        if include_archived:
+            result.archives_left_out = archivesLeftOut(database.databaseName())
+        return result
+    finally:
+        if include_archived:
+            detachArchives(database)  # the connection goes back to the pool
+
+
+def writeTransactions(database: QSqlDatabase, path: str, file_format: str, values: tuple, compress: bool,
+                      statement: str, progress, cancelled) -> ExportResult:
+    """Streams the rows of the select_<statement> statement to path, see exportTransactions."""
+    result = ExportResult(path)
+    start = time.perf_counter()
+    statements = StatementRegistry(database, prepared_statements)
+    total = statements.fetchOne(f'count_{statement}', *values)[0]
+
+    export_query = statements.executeOrRaise(f'select_{statement}', *values)  # forward only
+    record = export_query.record()
+    columns = [record.fieldName(column) for column in range(record.count())]
+
+    with openOutput(path, compress) as output:
+        if file_format == 'csv':
+            writer = csv.writer(output)
+            writer.writerow(columns)
+            write = writer.writerow
+        else:
+            def write(row):
+                output.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False))
+                output.write('\n')
+
+        while export_query.next():
+            write([export_query.value(column) for column in range(len(columns))])
+            result.rows += 1
+            if result.rows % PROGRESS_EVERY == 0:
+                if cancelled is not None and cancelled():
+                    result.cancelled = True
+                    break
+                if progress is not None:
+                    progress(result.rows, total)
+
+    error = export_query.lastError()
+    export_query.finish()
+    if result.cancelled:
+        os.remove(path)
+    elif error.isValid():
+        raise StatementError(f"select_{statement}: {error.text()}")
+    elif progress is not None:
+        progress(result.rows, total)
+
+    result.seconds = time.perf_counter() - start
+    return result
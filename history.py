@@ -0,0 +1,104 @@
+"""Users' history event log.
+
+Each event is a row of history: who (user_id), what (an action code), on which table
+(a table code) and a JSON payload with the details, e.g. the title of the book added.
+Codes are stored instead of text so the log stays compact and can be filtered by index.
+"""
+import json
+
+from PyQt5.QtSql import QSqlQuery
+
+from queries import *
+
+
+# {action: code}. Codes are stored in the database, never change or reuse one
+HISTORY_ACTIONS = {
+    'LEGACY': 0,  # free text entry of the history before event codes, the text is in the payload
+    'LOGGED IN': 1,
+    'LOGGED OUT': 2,
+    'ADDED': 3,
+    'EDITED': 4,
+    'DELETED': 5,
+    'RENAMED': 6,
+    'CHANGED PASSWORD': 7,
+    'IMPORTED': 8,
+    'EXPORTED': 9,
+    'GAVE PERMISSIONS': 10,
+    'EDITED PERMISSIONS': 11,
+    'REMOVED PERMISSIONS': 12,
+}
+
+# {table: code}, the tables an event can be about
+HISTORY_TABLES = {
+    'users': 1,
+    'user_permissions': 2,
+    'books': 3,
+    'categories': 4,
+    'clients': 5,
+    'classes': 6,
+    'houses': 7,
+    'transactions': 8,
+}
+
+# columns of the users' history table, see describeEvent
+EVENT_COLUMNS = ['user', 'action', 'table', 'details', 'datetime', 'event_id']
+
+action_names = {code: action for action, code in HISTORY_ACTIONS.items()}
+table_names = {code: table for table, code in HISTORY_TABLES.items()}
+
+
+def historyValues(user_id: int, action: str, table: str = None, **details) -> tuple:
+    """Values of the insert_history statement for an event of user_id, details being its payload."""
+    return (user_id, HISTORY_ACTIONS[action], HISTORY_TABLES.get(table),
+            json.dumps(details, ensure_ascii=False) if details else None)
+
+
+def describeDetails(payload: str or None) -> str:
+    """Readable text of an event payload, e.g. title: Oliver Twist, category: Novel."""
+    if not payload:
+        return ''
+    details = json.loads(payload)
+    if 'text' in details:  # entry converted from the free text history
+        return details['text']
+    return ', '.join(f"{name.replace('_', ' ')}: {', '.join(map(str, value)) if isinstance(value, list) else value}"
+                     for name, value in details.items() if name != 'user_name')
+
+
+def describeEvent(row: tuple) -> tuple:
+    """Turns a history page row (user, action, table, payload, datetime, event_id) into the row shown."""
+    user, action, table, payload, datetime, event_id = row
+    return (user, action_names.get(action, action), table_names.get(table, table) or '',
+            describeDetails(payload), datetime, event_id)
+
+
+def historyNeedsMigration(query: QSqlQuery, schema: str = 'main') -> bool:
+    """Whether the history table of schema still has the free text columns of older versions."""
+    query.prepare("SELECT count(*) FROM pragma_table_info('history', ?) WHERE name = 'user_name'")
+    query.addBindValue(schema)
+    return query.exec_() and query.next() and query.value(0) > 0
+
+
+def migrateHistory(query: QSqlQuery, schema: str = 'main') -> bool:
+    """Converts the free text history of schema (main or an attached archive) into events, in one transaction.
+
+    Logins and logouts get their codes, other entries become LEGACY events keeping their text.
+    Entries are matched to the users by name, the name is kept in the payload for renamed or
+    deleted users. Returns False and leaves the history as it was if a step fails.
+    """
+    if not historyNeedsMigration(query, schema):
+        return True
+    coded = ('LOGGED IN', 'LOGGED OUT')
+    values = {
+        'schema': schema,
+        'actions': ' '.join(f"WHEN '{action}' THEN {HISTORY_ACTIONS[action]}" for action in coded),
+        'tables': ' '.join(f"WHEN '{table}' THEN {code}" for table, code in HISTORY_TABLES.items()),
+        'coded': ', '.join(f"'{action}'" for action in coded),
+    }
+    statements = [statement.format(**values) for statement in migrate_history_queries]
+    query.exec_("BEGIN IMMEDIATE")
+    for statement in statements:
+        if not query.exec_(statement):
+            print(query.lastError().text())
+            query.exec_("ROLLBACK")
+            return False
+    return query.exec_("COMMIT")
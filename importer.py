@@ -0,0 +1,271 @@
+"""Bulk imports from CSV files.
+
+Rows are streamed from the file and written a chunk at a time, each chunk in its own
+transaction, so a large file neither sits in memory nor holds the write lock for long.
+User accounts are the exception, see importUsers.
+"""
+import csv
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+from PyQt5.QtSql import QSqlQuery
+
+from history import historyValues
+from passwords import hashPassword
+from queries import create_import_books_table_query
+from statements import StatementError, StatementRegistry
+
+
+# {role of a user import row: permissions statement}, roles are matched case-insensitively
+USER_ROLES = {'admin': 'insert_admin_permissions', 'standard': 'insert_standard_permissions'}
+
+
+class ImportResult:
+    """Counters of an import run."""
+
+    def __init__(self):
+        self.rows = 0  # valid rows read
+        self.skipped = []  # (line number, reason)
+        self.added = 0
+        self.updated = 0
+        self.categories_added = 0
+        self.seconds = 0.0
+        self.hash_seconds = 0.0  # part of seconds spent hashing passwords (user import)
+
+    @property
+    def duplicates(self) -> int:
+        """Valid rows that were already in the table (roster import)."""
+        return self.rows - self.added
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+def formatText(text: str) -> str:
+    """Same clean up MainApp.formatText applies to typed titles and categories."""
+    return text.strip().title()
+
+
+def readBookRows(csv_file, result: ImportResult):
+    """Yields (title, category, quantity) from a title,category,quantity CSV file.
+
+    A header row is skipped, invalid rows are recorded in result.skipped.
+    """
+    reader = csv.reader(csv_file)
+    for row in reader:
+        line = reader.line_num
+        if not row or not any(field.strip() for field in row):
+            continue
+        if len(row) != 3:
+            result.skipped.append((line, f"expected 3 fields, got {len(row)}"))
+            continue
+        title, category, quantity = (field.strip() for field in row)
+        if result.rows == 0 and not result.skipped and quantity.lower() == 'quantity':
+            continue  # header
+        if not title or not category:
+            result.skipped.append((line, "title and category are required"))
+            continue
+        try:
+            quantity = int(quantity)
+        except ValueError:
+            result.skipped.append((line, f"quantity '{quantity}' is not a whole number"))
+            continue
+        if quantity < 0:
+            result.skipped.append((line, "quantity can't be negative"))
+            continue
+        result.rows += 1
+        yield formatText(title), formatText(category), quantity
+
+
+def importBookChunk(statements: StatementRegistry, chunk: list, result: ImportResult):
+    """Writes one chunk of rows in a single transaction.
+
+    The rows are staged with one execBatch call, then the missing categories are added and the
+    books inserted or their quantities increased with one set-based statement each.
+    """
+    with statements.transaction():
+        books_before = statements.fetchOne('select_books_count')[0]
+        stage_query = statements.prepare('insert_import_book')
+        for column in zip(*chunk):
+            stage_query.addBindValue(list(column))
+        if not stage_query.execBatch():
+            raise StatementError(f"insert_import_book: {stage_query.lastError().text()}")
+
+        result.categories_added += statements.executeOrRaise('insert_import_categories').numRowsAffected()
+        statements.executeOrRaise('upsert_import_books')
+        statements.executeOrRaise('delete_import_books')
+
+        added = statements.fetchOne('select_books_count')[0] - books_before
+        result.added += added
+        result.updated += len({(title, category) for title, category, _ in chunk}) - added
+
+
+def importBooks(statements: StatementRegistry, csv_path: str, chunk_size=1000, progress=None) -> ImportResult:
+    """Imports a title,category,quantity CSV file. Quantities of books already in the library are added to.
+
+    progress, if given, is called with the ImportResult after every chunk.
+    Raises StatementError if a chunk fails, the chunks before it stay imported.
+    """
+    result = ImportResult()
+    start = time.perf_counter()
+    QSqlQuery(statements.database).exec_(create_import_books_table_query)
+
+    with open(csv_path, newline='', encoding='utf-8-sig') as csv_file:
+        chunk = []
+        for row in readBookRows(csv_file, result):
+            chunk.append(row)
+            if len(chunk) == chunk_size:
+                importBookChunk(statements, chunk, result)
+                chunk = []
+                if progress is not None:
+                    progress(result)
+        if chunk:
+            importBookChunk(statements, chunk, result)
+
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+def readRosterRows(csv_file, classes: set, houses: set, result: ImportResult):
+    """Yields (first name, last name, class, house) from a first name,last name,class,house CSV file.
+
+    Classes and houses are checked against the given sets, a header row is skipped and
+    invalid rows are recorded in result.skipped.
+    """
+    reader = csv.reader(csv_file)
+    for row in reader:
+        line = reader.line_num
+        if not row or not any(field.strip() for field in row):
+            continue
+        if len(row) != 4:
+            result.skipped.append((line, f"expected 4 fields, got {len(row)}"))
+            continue
+        fname, lname, class_, house = (field.strip() for field in row)
+        # classes and houses are stored upper case, like MainApp.addClass and addHouse do
+        class_, house = class_.upper(), house.upper()
+        if result.rows == 0 and not result.skipped and (class_, house) == ('CLASS', 'HOUSE'):
+            continue  # header
+        if not fname or not lname:
+            result.skipped.append((line, "first and last name are required"))
+            continue
+        if class_ not in classes:
+            result.skipped.append((line, f"no class '{class_}'"))
+            continue
+        if house not in houses:
+            result.skipped.append((line, f"no house '{house}'"))
+            continue
+        result.rows += 1
+        yield formatText(fname), formatText(lname), class_, house
+
+
+def importRosterChunk(statements: StatementRegistry, chunk: list, result: ImportResult):
+    """Inserts one chunk of clients with one execBatch call in a single transaction.
+    Clients already registered are left alone by the UNIQUE constraint (INSERT OR IGNORE).
+    """
+    with statements.transaction():
+        clients_before = statements.fetchOne('select_clients_count')[0]
+        insert_query = statements.prepare('insert_client')
+        for column in zip(*chunk):
+            insert_query.addBindValue(list(column))
+        if not insert_query.execBatch():
+            raise StatementError(f"insert_client: {insert_query.lastError().text()}")
+        result.added += statements.fetchOne('select_clients_count')[0] - clients_before
+
+
+def importRoster(statements: StatementRegistry, csv_path: str, chunk_size=500, progress=None) -> ImportResult:
+    """Registers the pupils of a first name,last name,class,house CSV file.
+
+    progress, if given, is called with the ImportResult after every chunk.
+    Raises StatementError if a chunk fails, the chunks before it stay imported.
+    """
+    result = ImportResult()
+    start = time.perf_counter()
+    # validated in memory instead of by a foreign key lookup per row
+    classes = set(statements.fetchColumn('select_classes'))
+    houses = set(statements.fetchColumn('select_houses'))
+
+    with open(csv_path, newline='', encoding='utf-8-sig') as csv_file:
+        chunk = []
+        for row in readRosterRows(csv_file, classes, houses, result):
+            chunk.append(row)
+            if len(chunk) == chunk_size:
+                importRosterChunk(statements, chunk, result)
+                chunk = []
+                if progress is not None:
+                    progress(result)
+        if chunk:
+            importRosterChunk(statements, chunk, result)
+
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+def readUserRows(csv_file, usernames: set, result: ImportResult):
+    """Yields (name, username, password, role) from a name,username,password,role CSV file.
+
+    Usernames already in usernames or earlier in the file, a header row and invalid rows are
+    recorded in result.skipped.
+    """
+    reader = csv.reader(csv_file)
+    usernames = set(usernames)
+    for row in reader:
+        line = reader.line_num
+        if not row or not any(field.strip() for field in row):
+            continue
+        if len(row) != 4:
+            result.skipped.append((line, f"expected 4 fields, got {len(row)}"))
+            continue
+        name, username, password, role = (field.strip() for field in row)
+        role = role.lower()
+        if result.rows == 0 and not result.skipped and (username.lower(), role) == ('username', 'role'):
+            continue  # header
+        if not name or not username or not password:
+            result.skipped.append((line, "name, username and password are required"))
+            continue
+        if role not in USER_ROLES:
+            result.skipped.append((line, f"role '{role}' is not one of {', '.join(USER_ROLES)}"))
+            continue
+        if username in usernames:
+            result.skipped.append((line, f"username '{username}' is taken"))
+            continue
+        usernames.add(username)
+        result.rows += 1
+        yield formatText(name), username, password, role
+
+
+def importUsers(statements: StatementRegistry, csv_path: str, hash_settings: dict, user_id: int,
+                workers=None) -> ImportResult:
+    """Creates the accounts of a name,username,password,role CSV file, recorded in the history as
+    added by user_id.
+
+    The passwords are hashed in a pool of workers processes (one per core by default) since the
+    hashes are made slow on purpose, then every user, their permissions and history entries are
+    written in a single transaction: the file is imported completely or not at all.
+    Raises StatementError if a write fails.
+    """
+    result = ImportResult()
+    start = time.perf_counter()
+    with open(csv_path, newline='', encoding='utf-8-sig') as csv_file:
+        rows = list(readUserRows(csv_file, statements.fetchColumn('select_usernames'), result))
+    if not rows:
+        result.seconds = time.perf_counter() - start
+        return result
+
+    hash_start = time.perf_counter()
+    with ProcessPoolExecutor(workers) as executor:
+        hashes = list(executor.map(hashPassword, (password for _, _, password, _ in rows), repeat(hash_settings)))
+    result.hash_seconds = time.perf_counter() - hash_start
+
+    with statements.transaction():
+        for (name, username, _, role), hashed_password in zip(rows, hashes):
+            statements.executeOrRaise('insert_user', username, name, hashed_password)
+            statements.executeOrRaise('insert_history', *historyValues(user_id, 'ADDED', 'users',
+                                                                       name=name, user=username))
+            statements.executeOrRaise(USER_ROLES[role], username)
+            statements.executeOrRaise('insert_history', *historyValues(
+                user_id, 'GAVE PERMISSIONS', 'user_permissions', user=username, permissions=role.title()))
+    result.added = len(rows)
+    result.seconds = time.perf_counter() - start
+    return result
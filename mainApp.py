@@ -1,23 +1,36 @@
-from datetime import datetime
-import hashlib
-import hmac
+import argparse
+from datetime import datetime, timedelta
+from operator import itemgetter
 import os
 import sys
-from ast import literal_eval
+from time import perf_counter
 
-from PyQt5 import uic
+from PyQt5 import sip
 from PyQt5.QtChart import (QChart, QDateTimeAxis, QLineSeries, QValueAxis)
-from PyQt5.QtCore import QDate, QDateTime, QPoint, Qt, QRegularExpression, QTimer
+from PyQt5.QtCore import QByteArray, QDate, QDateTime, QPoint, Qt, QRegularExpression, QTimer
 from PyQt5.QtGui import QEnterEvent, QPainter, QPixmap, QIcon, QColor
-from PyQt5.QtSql import (QSqlDatabase, QSqlQuery, QSqlRelation,
-                         QSqlRelationalTableModel, QSqlTableModel, QSqlQueryModel)
+from PyQt5.QtSql import QSqlDatabase, QSqlQuery, QSqlTableModel
 from PyQt5.QtWidgets import (QApplication, QButtonGroup, QDesktopWidget,
                              QHeaderView, QLabel, QLineEdit, QMainWindow,
                              QMessageBox, QPushButton, QWidget, QCompleter, QCheckBox,
                              QTreeWidgetItemIterator, QTreeWidgetItem, QGraphicsDropShadowEffect,
-                             QFrame, QSpinBox, QComboBox)
-
+                             QFrame, QSpinBox, QComboBox, QFileDialog, QProgressDialog, QInputDialog)
+
+from archive import MAX_ATTACHED_ARCHIVES, archivesLeftOut, attachArchives, detachArchives
+from connection import PROFILES, ConnectionPool, loadPoolSettings, loadProfile
+from exporter import exportTransactions
+from history import EVENT_COLUMNS, HISTORY_TABLES, describeEvent, historyValues, migrateHistory
+from importer import importBooks, importRoster
+from maintenance import (rebuildBooksFts, rebuildDashboardCounters, rebuildTransactionDaily,
+                         rebuildTrigramIndexes)
+from models import CompletionModel, KeyedRowsTableModel, PagedRowsTableModel, RowsTableModel
+from passwords import hashPassword, loadHashSettings, migratePasswords, verifyPassword
 from queries import *
+from search import SEARCH_LIMIT, ftsQuery, similarBooks, similarClients
+from statements import StatementError, StatementRegistry
+from uicache import loadUiClass
+from warmup import warmUpDatabase
+from worker import BackgroundTask, DatabaseWorker
 
 
 base_dir = os.path.dirname(__file__)
@@ -53,16 +66,63 @@ def initializeDatabase() -> None:
     query.exec_(create_users_table_query)
     query.exec_(create_books_table_query)
     query.exec_(create_transactions_table_query)
+    query.exec_(create_transactions_datetime_index_query)
+    for create_index_query in create_transactions_filter_index_queries:
+        query.exec_(create_index_query)
     query.exec_(create_categories_table_query)
     query.exec_(create_clients_table_query)
     query.exec_(create_client_records_table_query)
     query.exec_(create_client_record_view_query)
+    migrateHistory(query)  # free text history of older versions
     query.exec_(create_history_table_query)
+    for create_index_query in create_history_index_queries:
+        query.exec_(create_index_query)
     query.exec_(create_user_permissions_table_query)
-    query.exec_(create_transaction_acc_view_query)
+    migratePasswords(query)  # text hashes of older versions
     query.exec_(create_classes_table_query)
     query.exec_(create_houses_table_query)
 
+    # dashboard counters, counted once from existing data then kept current by triggers
+    new_counters_table = not database.tables().__contains__("dashboard_counters")
+    query.exec_(create_dashboard_counters_table_query)
+    query.exec_(create_transactions_counters_trigger_query)
+    query.exec_(create_users_insert_counters_trigger_query)
+    query.exec_(create_users_delete_counters_trigger_query)
+    if new_counters_table:
+        rebuildDashboardCounters(query, database.databaseName())
+
+    # daily transaction rollup read by the transactions graph
+    new_daily_table = not database.tables().__contains__("transaction_daily")
+    query.exec_(create_transaction_daily_table_query)
+    query.exec_(create_transactions_daily_trigger_query)
+    if new_daily_table:
+        rebuildTransactionDaily(query, database.databaseName())
+    # catalogue search index, filled once from existing books then kept current by triggers
+    new_books_fts_table = not database.tables().__contains__("books_fts")
+    query.exec_(create_books_fts_table_query)
+    query.exec_(create_books_fts_insert_trigger_query)
+    query.exec_(create_books_fts_delete_trigger_query)
+    query.exec_(create_books_fts_update_trigger_query)
+    if new_books_fts_table:
+        rebuildBooksFts(query)
+
+    # trigram indexes of book titles and client names for the "did you mean" lookups
+    new_trigram_tables = not database.tables().__contains__("clients_trigram")
+    query.exec_(create_books_trigram_table_query)
+    query.exec_(create_books_trigram_insert_trigger_query)
+    query.exec_(create_books_trigram_delete_trigger_query)
+    query.exec_(create_books_trigram_update_trigger_query)
+    query.exec_(create_clients_trigram_table_query)
+    query.exec_(create_clients_trigram_insert_trigger_query)
+    query.exec_(create_clients_trigram_delete_trigger_query)
+    query.exec_(create_clients_trigram_update_trigger_query)
+    if new_trigram_tables:
+        rebuildTrigramIndexes(query)
+
+    # recreated so databases still holding the view over transactions get the rollup one
+    query.exec_("DROP VIEW IF EXISTS transaction_acc_vw")
+    query.exec_(create_transaction_acc_view_query)
+
     # check for classes in classes table
     query.exec_('SELECT COUNT(*) FROM classes')
     # if no class in classes table, insert default ones from classes.txt
@@ -72,7 +132,9 @@ def initializeDatabase() -> None:
             for class_ in classes:
                 # removes \n at the end of each class
                 class_ = class_.strip('\n')
-                query.exec_(f'INSERT INTO classes VALUES("{class_}")')
+                query.prepare('INSERT INTO classes VALUES(?)')
+                query.addBindValue(class_)
+                query.exec_()
 
     # check for houses in houses table
     query.exec_('SELECT COUNT(*) FROM houses')
@@ -83,7 +145,9 @@ def initializeDatabase() -> None:
             for house in houses:
                 # removes \n at the end of each house
                 house = house.strip('\n')
-                query.exec_(f'INSERT INTO houses VALUES("{house}")')
+                query.prepare('INSERT INTO houses VALUES(?)')
+                query.addBindValue(house)
+                query.exec_()
 
     # Creates default category, 'Unknown'.
     query.exec_("INSERT INTO categories VALUES('Unknown')")
@@ -91,12 +155,12 @@ def initializeDatabase() -> None:
     # check if any user exits
     query.exec_("SELECT COUNT(*) FROM users")
     # if no user exists, create admin user
-    if query.next():
-        hashed_user_password = str(hashPassword('admin'))
+    if query.next() and query.value(0) == 0:
+        hashed_user_password = hashPassword('admin', password_settings)
         query.prepare(
             'INSERT INTO users(user_name, user_password) VALUES(?, ?)')
         query.addBindValue('admin')
-        query.addBindValue(hashed_user_password)
+        query.addBindValue(QByteArray(hashed_user_password))  # bytes would be bound as an empty string
         query.exec_()
 
         query.exec_(
@@ -106,27 +170,6 @@ def initializeDatabase() -> None:
                 "INSERT INTO user_permissions VALUES('admin',2,2,2,2,2,2,2,2,2,2,2,2,2,2,2,2,2,2,2,2,2,2,2,2)")
 
 
-def hashPassword(password: str) -> bytes:
-    """
-    Hashes password and concatenates with a salt.
-    returns: hashed password of type bytes  
-    """
-    salt = os.urandom(16)
-    hashed_user_password = hashlib.pbkdf2_hmac(
-        'sha256', password.encode(), salt, 100000)
-    return hashed_user_password + salt
-
-
-def password_check(entered_password: str, db_password: bytes) -> bool:
-    """
-    Hashes entered password using salt from hashed password pulled from database then compares both passwords.
-    """
-    salt = db_password[-16:]
-    hashed_entered_password = hashlib.pbkdf2_hmac(
-        'sha256', entered_password.encode(), salt, 100000) + salt
-    return hmac.compare_digest(hashed_entered_password, db_password)
-
-
 def btn_close_clicked(self):
     """closes program
     """
@@ -167,8 +210,11 @@ def centerWindow(self):
               (screen_height - self.height()) // 2)
 
 
-login, _ = uic.loadUiType('login.ui')
-main, _ = uic.loadUiType('main.ui')
+# compiled once into ui_cache, see uicache.py
+login = loadUiClass(os.path.join(base_dir, 'login.ui'))
+main = loadUiClass(os.path.join(base_dir, 'main.ui'))
+# tabs whose page is built from tabs/<tab>_tab.ui the first time it is opened, see MainApp.buildTab
+on_demand_tabs = ('books', 'issue_book', 'report', 'history', 'settings', 'users')
 
 
 class LoginWindow(QWidget, login):
@@ -184,6 +230,8 @@ class LoginWindow(QWidget, login):
         self.login_btn.clicked.connect(self.handleLogin)
         self.show_password_cb.stateChanged.connect(self.showPassword)
         self.label.setVisible(False)
+        self.password_task = self.warm_up_task = None
+        self.warmed_up = None  # False while the warm-up runs, True once it is done, see handleLogin
         for child in self.widget.findChildren((QLineEdit, QPushButton)):
             shadow = QGraphicsDropShadowEffect(
                 blurRadius=10, xOffset=0, yOffset=4, color=QColor('black'))
@@ -201,44 +249,87 @@ class LoginWindow(QWidget, login):
             self.password_le.setEchoMode(QLineEdit.Password)
 
     def handleLogin(self):
-        """Checks for the user in the database the checks if the entered password is correct.
+        """Checks for the user in the database then checks if the entered password is correct.
         If the username does not exist or password is incorrect, a response is displayed.
-        If both username and password are correct, login window is closed and main window opens(Logged in)."""
+
+        The password is hashed on a thread while another one warms up the database (see warmup.py),
+        the login window keeps repainting meanwhile. The main window opens once both are done, see openMainWindow."""
+
+        if self.password_task is not None and self.password_task.isRunning():
+            return  # the previous password is still being checked
 
         username = self.username_le.text()
         password = self.password_le.text()
 
         self.password_le.clear()
-        query.exec_(
-            f"SELECT user_id, user_password FROM users WHERE user_name = '{username}'")
-        data = []
-        while query.next():
-            data.append((query.value(0)))
-            data.append((query.value(1)))
-        try:
-            # if passwords match
-            if password_check(password, literal_eval(data[1])):
-                self.username_le.clear()
-                self.show_password_cb.setChecked(False)
-                self.label.setVisible(False)
-                self.main_window = MainApp(data[0], username)
-                self.close()  # close login window
-                self.main_window.show()  # show main window
-                query.exec_(
-                    f"""INSERT INTO history(user_name, [action]) VALUES('{username}', 'LOGGED IN')""")
-            else:
-                self.label.setVisible(True)  # show error message
-                self.label.adjustSize()
-
+        data = statements.fetchOne('select_login_user', username)
         # When entered username does not exist
-        except IndexError:
+        if data is None:
             self.label.setVisible(True)  # show error message
             self.label.adjustSize()
+            return
+
+        self.login_btn.setEnabled(False)
+        self.login_user = (data[0], username)
+        self.password_correct = None
+        # an outdated hash is replaced on the same thread, see passwords.verifyPassword
+        self.password_task = BackgroundTask(None, verifyPassword, password, data[1], password_settings)
+        self.password_task.finished.connect(self.passwordChecked)
+        self.password_task.failed.connect(lambda error: self.passwordChecked((False, None)))
+        self.password_task.start()
+
+        # the database is warmed up once, by the first attempt, a retry after a mistyped password waits for it
+        if self.warmed_up is None:
+            self.warmed_up = False
+            self.warm_up_task = BackgroundTask(connection_pool, warmUpDatabase)
+            self.warm_up_task.finished.connect(self.databaseWarmedUp)
+            self.warm_up_task.failed.connect(lambda error: self.databaseWarmedUp(None))  # the window reads them
+            self.warm_up_task.start()
+
+    def passwordChecked(self, result: tuple):
+        """Shows the error message if the password is incorrect, otherwise stores the new hash of an outdated one
+        and opens the main window once the database is warmed up.
+
+        Args:
+            result (tuple): (whether the password is correct, its new hash or None)
+        """
+        correct, new_hash = result
+        if not correct:
+            self.label.setVisible(True)  # show error message
+            self.label.adjustSize()
+            self.login_btn.setEnabled(True)
+            return
+        if new_hash is not None:
+            statements.execute('update_password', new_hash, self.login_user[0])
+        self.password_correct = True
+        self.openMainWindow()
+
+    def databaseWarmedUp(self, dashboard_counters: list or None):
+        self.dashboard_counters = dashboard_counters
+        self.warmed_up = True
+        self.openMainWindow()
+
+    def openMainWindow(self):
+        """Closes the login window and opens the main window (logged in) once the password is correct and
+        the database warmed up."""
+        if not (self.password_correct and self.warmed_up):
+            return
+        self.password_correct = None
+        user_id, username = self.login_user
+        self.username_le.clear()
+        self.show_password_cb.setChecked(False)
+        self.label.setVisible(False)
+        self.login_btn.setEnabled(True)
+        self.main_window = MainApp(user_id, username, self.dashboard_counters)
+        self.dashboard_counters = None  # read from the database by the windows of later logins
+        self.close()  # close login window
+        self.main_window.show()  # show main window
+        statements.execute('insert_history', *historyValues(user_id, 'LOGGED IN'))
 
 
 class MainApp(QMainWindow, main):
 
-    def __init__(self, user_id, username):
+    def __init__(self, user_id, username, dashboard_counters=None):
         super(QMainWindow, self).__init__()
         self.setupUi(self)
         self.setWindowFlags(Qt.FramelessWindowHint)
@@ -246,8 +337,44 @@ class MainApp(QMainWindow, main):
         self.user_id = user_id
         self.username = username
         self.searched_user = None
+        self.dashboard_counters = dashboard_counters  # rows read while signing in, see warmup.py
+
+        # tab contents are loaded the first time the tab is opened, see loadTab. Until then their
+        # models are None and the changes made from other tabs are read when they are loaded
+        self.book_title_model = self.first_name_model = self.last_name_model = None
+        self.book_table_model = self.category_cb_model = self.classes_cb_model = self.houses_cb_model = None
+        self.client_record_table_model = self.clients_records_table_model = None
+        self.history_table_model = self.transactions_table_model = self.users_table_model = None
+        self.l_series = self.r_series = None
+        # {tab: setups run the first time it is opened}, setups shared by several tabs only run once
+        self.tab_setups = {
+            'dashboard': (self.initDashVals,),
+            'books': (self.setupCategoryComboBox, self.setupBookTitleCompleter, self.setupBooksTableView),
+            'issue_book': (self.setupCategoryComboBox, self.setupBookTitleCompleter, self.setupClassComboBox,
+                           self.setupHouseComboBox, self.setupClientNameCompleters, self.setupClientRecordView),
+            'report': (self.plotTransactionGraph, self.setupAllClientRecordsView),
+            'history': (self.setupCategoryComboBox, self.setupBookTitleCompleter, self.showHistory,
+                        self.setupTransactionsTableView, self.updateLibrarianFilter),
+            'settings': (self.setupClassComboBox, self.setupHouseComboBox),
+            'users': (self.showUsers, self.setupPermissionsTree),
+        }
+        # {tab: method connecting its signals and adjusting its widgets once built}, see buildTab
+        self.tab_handlers = {
+            'books': self.handleBooksTab,
+            'issue_book': self.handleIssueBookTab,
+            'history': self.handleHistoryTab,
+            'settings': self.handleSettingsTab,
+            'users': self.handleUsersTab,
+        }
+        # sub-tab each setup fills, handlePermissions deletes the sub-tabs a user may not use
+        self.setup_pages = {'showHistory': 'users_history_tab',
+                            'setupTransactionsTableView': 'transactions_history_tab'}
+        self.denied_widgets = set()  # names of the widgets deleted by handlePermissions
+        self.tab_load_seconds = {}  # {tab: seconds its first opening took}
+
         self.handleUi()
-        self.initDashVals()
+        self.loadTab('dashboard')
+        db_worker.busyChanged.connect(self.showBusy)
         self.widget_2.installEventFilter(self)
         self.main_tab_widget.installEventFilter(self)
         self.main_tabs.installEventFilter(self)
@@ -255,58 +382,10 @@ class MainApp(QMainWindow, main):
         self._initDrag()
         self.setMouseTracking(True)
         self.edit_book_data = []  # Contains record of book to be edited
-        query.exec_(f"SELECT user_name FROM users")
-        self.usernames = []  # List of existing user names
-        while query.next():
-            self.usernames.append(query.value(0))
-
-        query.exec_(
-            f"SELECT count(*) FROM transactions WHERE user_id={self.user_id} AND DATE(datetime)='{datetime.today().date()}'")
-        if query.next():
-            # Number of transactions performed today
-            self.today_transac_count = query.value(0)
-
-        self.book_title_model = QSqlQueryModel()
-        self.book_title_model.setQuery(
-            "SELECT DISTINCT book_title FROM books")  # all book titles
-
-        # auto completes book title entires
-        self.book_title_completer = QCompleter()
-        self.book_title_completer.setModel(self.book_title_model)
-        self.book_title_completer.setCaseSensitivity(
-            Qt.CaseInsensitive)  # makes title entries case insensitive
-        # searches by checking if entry is contained in any title
-        self.book_title_completer.setFilterMode(Qt.MatchFlag.MatchContains)
-
-        self.book_title_le_2.setCompleter(self.book_title_completer)
-        self.book_title_le_3.setCompleter(self.book_title_completer)
-        # book title auto completion end
-
-        self.first_name_model = QSqlQueryModel()
-        self.first_name_model.setQuery(
-            "SELECT DISTINCT client_first_name FROM clients")  # client first names
-
-        # auto completes first entires
-        self.first_name_completer = QCompleter()
-        self.first_name_completer.setModel(self.first_name_model)
-        self.first_name_completer.setCaseSensitivity(
-            Qt.CaseInsensitive)  # makes title entries case insensitive
-
-        self.fname_le.setCompleter(self.first_name_completer)
-        self.fname_le_2.setCompleter(self.first_name_completer)
+        self.usernames = statements.fetchColumn('select_usernames')  # List of existing user names
 
-        self.last_name_model = QSqlQueryModel()
-        self.last_name_model.setQuery(
-            "SELECT DISTINCT client_last_name FROM clients")  # all client last names
-
-        # auto completes first entires
-        self.last_name_completer = QCompleter()
-        self.last_name_completer.setModel(self.last_name_model)
-        self.last_name_completer.setCaseSensitivity(
-            Qt.CaseInsensitive)  # makes title entries case insensitive
-
-        self.lname_le.setCompleter(self.last_name_completer)
-        self.lname_le_2.setCompleter(self.last_name_completer)
+        self.added_client_names = []  # (first name, last name) of clients added by the running checkout
+        self.export_task = None  # running transactions export, see exportTransactions
 
     def _initDrag(self):
         # Set the default value of mouse tracking judgment trigger
@@ -399,7 +478,7 @@ class MainApp(QMainWindow, main):
     def handleUi(self):
         """Handles everything that deals with changes to the interface."""
 
-        self.handlePermissions()
+        self.handlePermissions(vars(self))
         self.username_label_3.setText(self.username)
         centerWindow(self)
         # make dashboard tab default current tab
@@ -409,34 +488,9 @@ class MainApp(QMainWindow, main):
         self.dashboard_btn.update()
         self.title_bar_pos = 917
         self.setMaximumSize(screen_width, screen_height)
-        self.setupHouseComboBox()
-        self.setupClassComboBox()
-        self.class_combo_box.setCurrentIndex(-1)
-        self.house_combo_box.setCurrentIndex(-1)
-        self.class_combo_box_2.setCurrentIndex(-1)
-        self.house_combo_box_2.setCurrentIndex(-1)
-        self.delete_class_cb.setCurrentIndex(-1)
-        self.current_class_name_cb.setCurrentIndex(-1)
-        self.delete_house_cb.setCurrentIndex(-1)
-        self.current_house_name_cb.setCurrentIndex(-1)
         self.main_tab_widget.tabBar().setVisible(False)
-        self.setupCategoryComboBox()
-        self.setupBooksTableView()
-        self.setupClientRecordView()
-        self.setupAllClientRecordsView()
-        self.showUsers()
-        self.showHistory()
-        self.plotTransactionGraph()
-        self.setupTransactionsTableView()
-        self.change_username_le.setPlaceholderText(self.username)
         self.current_tab_btn = self.dashboard_btn
-
-        # add shadows to all LineEdits, SpinBoxes and ComboBoxes
-        for child in self.main_tab_widget.findChildren((QPushButton, QLineEdit, QSpinBox, QComboBox)):
-            shadow = QGraphicsDropShadowEffect(
-                blurRadius=10, xOffset=0, yOffset=4, color=QColor('black'))
-            child.setGraphicsEffect(shadow)
-        self.category_combo_box.lineEdit().setGraphicsEffect(None)
+        self.addShadows(self.main_tab_widget)
 
         # add shadows to dashboard holders (frames)
         for child in self.dashboard_tab.findChildren(QFrame, QRegularExpression('frame')):
@@ -460,12 +514,26 @@ class MainApp(QMainWindow, main):
                 blurRadius=15, xOffset=0, yOffset=4, color=QColor('black'))
             child.setGraphicsEffect(shadow)
 
-        # permissions tree
+    @staticmethod
+    def addShadows(widget: QWidget):
+        """Adds shadows to the LineEdits, SpinBoxes, ComboBoxes, buttons and table headers in widget
+        """
+        for child in widget.findChildren((QPushButton, QLineEdit, QSpinBox, QComboBox)):
+            shadow = QGraphicsDropShadowEffect(
+                blurRadius=10, xOffset=0, yOffset=4, color=QColor('black'))
+            child.setGraphicsEffect(shadow)
+
+        # Table header shadow
+        for header in widget.findChildren(QHeaderView):
+            shadow = QGraphicsDropShadowEffect(
+                blurRadius=15, xOffset=0, yOffset=5, color=QColor('black'))
+            header.setGraphicsEffect(shadow)
+
+    def setupPermissionsTree(self):
+        """Fills the permissions tree of the users tab with the permission columns of user_permissions
+        """
         # get all table column names (permissions)
-        query.exec_("SELECT name FROM PRAGMA_TABLE_INFO('user_permissions')")
-        permissions = []
-        while query.next():
-            permissions.append(query.value(0))
+        permissions = statements.fetchColumn('select_permission_names')
 
         dic_permissions = {}
         # start from second index, the first is not a permission
@@ -501,72 +569,103 @@ class MainApp(QMainWindow, main):
                 child.setText(0, child_text.replace('_', ' ').title())
                 child.setCheckState(0, Qt.Unchecked)
 
-        # Table header shadow
-        table_headers = self.findChildren(QHeaderView)
-        for header in table_headers:
-            shadow = QGraphicsDropShadowEffect(
-                blurRadius=15, xOffset=0, yOffset=5, color=QColor('black'))
-            header.setGraphicsEffect(shadow)
-
-    def handlePermissions(self):
+    def loadTab(self, tab: str):
+        """Builds tab (a tab_setups key) and runs its setups the first time it is opened and records how long
+        it took. Setups of sub-tabs the user may not use are skipped.
+        """
+        if tab in self.tab_load_seconds:
+            return
+        start = perf_counter()
+        if tab in on_demand_tabs:
+            self.buildTab(tab)
+        for setup in self.tab_setups[tab]:
+            if self.setup_pages.get(setup.__name__) not in self.denied_widgets:
+                setup()
+        self.tab_load_seconds[tab] = perf_counter() - start
+
+    def buildTab(self, tab: str):
+        """Builds the widgets of tab from tabs/<tab>_tab.ui into its empty page of main_tab_widget,
+        then applies the user's permissions, the shadows and the signals to them.
+        """
+        form = loadUiClass(os.path.join(base_dir, 'tabs', f'{tab}_tab.ui'))()
+        contents = QWidget()
+        form.setupUi(contents)
+        getattr(self, f'{tab}_tab_layout').addWidget(contents)
+        # the widgets are reached by name as if they were in main.ui
+        widgets = vars(form)
+        self.__dict__.update(widgets)
+        self.handlePermissions(widgets)
+        self.addShadows(contents)
+        if tab in self.tab_handlers:
+            self.tab_handlers[tab]()
+
+    def liveWidgets(self, *names: str) -> list:
+        """Widgets named names that are built and were not deleted, with a sub-tab or not, by handlePermissions"""
+        widgets = [getattr(self, name) for name in names if hasattr(self, name) and name not in self.denied_widgets]
+        return [widget for widget in widgets if not sip.isdeleted(widget)]
+
+    def handlePermissions(self, widgets: dict):
         """Checks user's permissions to appropriately to alter what is accessible by the user.
-        """
 
-        permission_affectees = [(self.dashboard_btn, self.dashboard_tab), (self.books_btn, self.books_tab), self.add_book_tab,
-                                self.edit_book_btn, self.delete_book_btn, self.add_category_btn, (
-                                    self.issue_book_btn, self.issue_book_tab),
-                                self.lend_book_tab, self.retrieve_book_btn, (
-                                    self.report_btn, self.report_tab), (self.history_btn, self.history_tab),
-                                self.users_history_tab, self.transactions_history_tab, (
-                                    self.settings_btn, self.settings_tab),
-                                (self.add_class_btn, self.add_class_le, self.add_class_label), (
-                                    self.delete_class_btn, self.delete_class_cb, self.deleted_class_label),
-                                (self.change_class_name_btn, (self.new_class_name,
-                                 self.current_class_name_cb), self.change_class_name_label),
-                                (self.add_house_btn, self.add_house_le, self.add_house_label), (
-                                    self.delete_house_btn, self.delete_house_cb, self.delete_house_label),
-                                (self.change_house_name_btn, (self.new_house_name, self.current_house_name_cb),
-                                 self.change_house_labe), (self.users_btn, self.users_tab),
-                                self.create_user_tab, self.delete_user_btn, self.permissions_tab]
+        Args:
+            widgets (dict): {name: widget} just built, the main window's or a tab's (see buildTab)
+        """
+
+        # names of the widgets of each permission, the tabs' widgets only exist once the tab is built
+        permission_affectees = [('dashboard_btn', 'dashboard_tab'), ('books_btn', 'books_tab'), 'add_book_tab',
+                                'edit_book_btn', 'delete_book_btn', 'add_category_btn', (
+                                    'issue_book_btn', 'issue_book_tab'),
+                                'lend_book_tab', 'retrieve_book_btn', (
+                                    'report_btn', 'report_tab'), ('history_btn', 'history_tab'),
+                                'users_history_tab', 'transactions_history_tab', (
+                                    'settings_btn', 'settings_tab'),
+                                ('add_class_btn', 'add_class_le', 'add_class_label'), (
+                                    'delete_class_btn', 'delete_class_cb', 'deleted_class_label'),
+                                ('change_class_name_btn', ('new_class_name',
+                                 'current_class_name_cb'), 'change_class_name_label'),
+                                ('add_house_btn', 'add_house_le', 'add_house_label'), (
+                                    'delete_house_btn', 'delete_house_cb', 'delete_house_label'),
+                                ('change_house_name_btn', ('new_house_name', 'current_house_name_cb'),
+                                 'change_house_labe'), ('users_btn', 'users_tab'),
+                                'create_user_tab', 'delete_user_btn', 'permissions_tab']
 
-        query.exec_(
-            f"SELECT * FROM user_permissions WHERE user_name='{self.username}'")
         index = 1
-        while query.next():
+        for permission_row in statements.fetchAll('select_user_permissions', self.username):
             for i, permission_affectee in enumerate(permission_affectees):
+                if isinstance(permission_affectee, str):
+                    permission_affectee = (permission_affectee,)
                 if i in (0, 1, 2, 5, 6, 7, 9, 10, 11, 12, 13, 20, 21, 22):
-                    if query.value(index) not in (2, 1):
-                        try:
-                            permission_affectee.deleteLater()
-                        except:
-                            permission_affectee[0].deleteLater()
-                            permission_affectee[1].deleteLater()
-
-                else:
-                    if query.value(index) not in (2, 1):
-                        try:
-                            permission_affectee.setEnabled(False)
-                        except:
+                    if permission_row[index] not in (2, 1):
+                        # a main tab button is built with the main window, the others with their tab
+                        for name in permission_affectee:
+                            if name in widgets:
+                                widgets[name].deleteLater()
+                                self.denied_widgets.add(name)
+
+                # the widgets of the other permissions are all built with the same tab
+                elif permission_affectee[0] in widgets:
+                    if permission_row[index] not in (2, 1):
+                        if len(permission_affectee) == 1:
+                            widgets[permission_affectee[0]].setEnabled(False)
+                        else:
                             # last element is a label, this stores the index
                             label_index = len(permission_affectee) - 1
-                            for index_, widget in enumerate(permission_affectee):
+                            for index_, name in enumerate(permission_affectee):
                                 if index_ == label_index:
                                     # change color of label
-                                    widget.setStyleSheet("color: grey")
+                                    widgets[name].setStyleSheet("color: grey")
+                                # when a tuple is encountered
+                                elif isinstance(name, tuple):
+                                    for each in name:
+                                        widgets[each].setEnabled(False)
+                                        widgets[each].setStyleSheet(
+                                            "background-color: grey; border-color: grey")
                                 else:
-                                    # when a tuple is encountered
-                                    try:
-                                        widget.setEnabled(False)
-                                        # if widget is a line edit
-                                        if isinstance(widget, QLineEdit) or isinstance(widget, QComboBox):
-                                            widget.setStyleSheet(
-                                                "background-color: grey; border-color: grey")
-
-                                    except:
-                                        for each in widget:
-                                            each.setEnabled(False)
-                                            each.setStyleSheet(
-                                                "background-color: grey; border-color: grey")
+                                    widgets[name].setEnabled(False)
+                                    # if widget is a line edit
+                                    if isinstance(widgets[name], (QLineEdit, QComboBox)):
+                                        widgets[name].setStyleSheet(
+                                            "background-color: grey; border-color: grey")
 
                 index += 1
 
@@ -574,38 +673,22 @@ class MainApp(QMainWindow, main):
         """Displays the number of total books lent and retrieved all times and current
         date, as well as the unretrieved books and number od users.
         """
-        query.exec_("SELECT sum(quantity) FROM transactions WHERE type='LEND'")
-        if query.next():
-            total_lent = query.value(0)
-            if total_lent == '':
-                total_lent = 0
-
-        query.exec_(
-            "SELECT sum(quantity) FROM transactions WHERE type='RETRIEVE'")
-        if query.next():
-            total_retrieved = query.value(0)
-            if total_retrieved == '':
-                total_retrieved = 0
-
-        query.exec_(
-            "SELECT sum(quantity) FROM transactions WHERE type='LEND' AND date(datetime) = date('now', 'localtime')")
-        if query.next():
-            lent_today = query.value(0)
-            if lent_today == '':
-                lent_today = 0
-
-        query.exec_(
-            "SELECT sum(quantity) FROM transactions WHERE type='RETRIEVE' AND date(datetime) = date('now', 'localtime')")
-        if query.next():
-            retrieved_today = query.value(0)
-            if retrieved_today == '':
-                retrieved_today = 0
-
-        query.exec_("SELECT count(*) FROM users")
-        if query.next():
-            users_val = query.value(0)
-            if users_val == '':
-                users_val = 0
+        # one lookup on dashboard_counters' primary key for all-time ('') and today's counters,
+        # already done by the warm-up when the user signed in
+        rows = self.dashboard_counters
+        if rows is None:
+            rows = statements.fetchAll('select_dashboard_counters')
+        self.dashboard_counters = None
+        counters = {}
+        for day, counter, value in rows:
+            period = 'total' if day == '' else 'today'
+            counters[(period, counter)] = value
+
+        total_lent = counters.get(('total', 'LEND'), 0)
+        total_retrieved = counters.get(('total', 'RETRIEVE'), 0)
+        lent_today = counters.get(('today', 'LEND'), 0)
+        retrieved_today = counters.get(('today', 'RETRIEVE'), 0)
+        users_val = counters.get(('total', 'USERS'), 0)
 
         self.total_lent_val.setText(str(total_lent))
         self.total_retrieved_val.setText(str(total_retrieved))
@@ -629,22 +712,70 @@ class MainApp(QMainWindow, main):
         label.setText(str(val))
 
     def setupCategoryComboBox(self):
-        """Loads categories from category table as items in the combo-box
-        """
-        self.category_cb_model = QSqlTableModel()
-        self.category_cb_model.setTable('categories')
-        column = self.category_cb_model.fieldIndex('category')
-        self.category_cb_model.setSort(column, Qt.AscendingOrder)
-        self.category_cb_model.setEditStrategy(QSqlTableModel.OnManualSubmit)
-        self.category_cb_model.select()
-        self.category_combo_box.setModel(self.category_cb_model)
-        self.category_combo_box_2.setModel(self.category_cb_model)
-
-        # Give default values
-        index = self.category_combo_box.findText("Unknown")
-        self.category_combo_box.setCurrentIndex(index)
-        self.category_combo_box_2.setCurrentIndex(index)
-        self.category_combo_box_3.setCurrentIndex(index)
+        """Loads categories from category table as items in the combo-boxes built since the last call
+        """
+        if self.category_cb_model is None:
+            self.category_cb_model = QSqlTableModel()
+            self.category_cb_model.setTable('categories')
+            column = self.category_cb_model.fieldIndex('category')
+            self.category_cb_model.setSort(column, Qt.AscendingOrder)
+            self.category_cb_model.setEditStrategy(QSqlTableModel.OnManualSubmit)
+            self.category_cb_model.select()
+        for category_cb in self.liveWidgets('category_combo_box', 'category_combo_box_2'):
+            if category_cb.model() is self.category_cb_model:
+                continue
+            category_cb.setModel(self.category_cb_model)
+            # Give default values
+            category_cb.setCurrentIndex(category_cb.findText("Unknown"))
+
+    def setupBookTitleCompleter(self):
+        """Loads all book titles into the book title completer, then patched as books are added, edited and deleted.
+        The completer is given to the book title entries built since the last call
+        """
+        if self.book_title_model is None:
+            self.book_title_model = CompletionModel(statements.fetchAll('select_book_title_counts'), contains=True)
+
+            # auto completes book title entires
+            self.book_title_completer = QCompleter()
+            self.book_title_completer.setModel(self.book_title_model)
+            self.book_title_completer.setCaseSensitivity(
+                Qt.CaseInsensitive)  # makes title entries case insensitive
+            # searches by checking if entry is contained in any title
+            self.book_title_completer.setFilterMode(Qt.MatchFlag.MatchContains)
+
+        # transactions history filters complete like the book entries
+        for book_title_le in self.liveWidgets('book_title_le_2', 'book_title_le_3', 'filter_book_le'):
+            if book_title_le.completer() is self.book_title_completer:
+                continue
+            book_title_le.setCompleter(self.book_title_completer)
+            book_title_le.textEdited.connect(self.book_title_model.complete)
+
+    def setupClientNameCompleters(self):
+        """Loads client first and last names into their completers, then patched as clients are added
+        """
+        self.first_name_model = CompletionModel(statements.fetchAll('select_client_first_name_counts'))  # client first names
+
+        # auto completes first entires
+        self.first_name_completer = QCompleter()
+        self.first_name_completer.setModel(self.first_name_model)
+        self.first_name_completer.setCaseSensitivity(
+            Qt.CaseInsensitive)  # makes title entries case insensitive
+
+        for fname_le in self.liveWidgets('fname_le', 'fname_le_2'):
+            fname_le.setCompleter(self.first_name_completer)
+            fname_le.textEdited.connect(self.first_name_model.complete)
+
+        self.last_name_model = CompletionModel(statements.fetchAll('select_client_last_name_counts'))  # all client last names
+
+        # auto completes first entires
+        self.last_name_completer = QCompleter()
+        self.last_name_completer.setModel(self.last_name_model)
+        self.last_name_completer.setCaseSensitivity(
+            Qt.CaseInsensitive)  # makes title entries case insensitive
+
+        for lname_le in self.liveWidgets('lname_le', 'lname_le_2'):
+            lname_le.setCompleter(self.last_name_completer)
+            lname_le.textEdited.connect(self.last_name_model.complete)
 
     def predictCategory(self):
         """Predicts book category in category combo box from book title given.
@@ -653,108 +784,255 @@ class MainApp(QMainWindow, main):
         """
         book_title = self.formatText(self.book_title_le_3.text())
         self.category_combo_box_3.clear()
-        query.exec_(f"SELECT category FROM books where book_title='{book_title}'")
-        
-        while query.next():
-            self.category_combo_box_3.addItem(query.value(0))
+        self.category_combo_box_3.addItems(
+            statements.fetchColumn('select_book_categories', book_title))
 
     def setupClassComboBox(self):
-        """Loads houses from houses table as items in the combo-box
-        """
-        self.classes_cb_model = QSqlTableModel()
-        self.classes_cb_model.setTable('classes')
-        self.classes_cb_model.setEditStrategy(QSqlTableModel.OnManualSubmit)
-        column = self.classes_cb_model.fieldIndex('class')
-        self.classes_cb_model.setSort(column, Qt.AscendingOrder)
-        self.classes_cb_model.select()
-        self.class_combo_box.setModel(self.classes_cb_model)
-        self.class_combo_box_2.setModel(self.classes_cb_model)
-        self.delete_class_cb.setModel(self.classes_cb_model)
-        self.current_class_name_cb.setModel(self.classes_cb_model)
+        """Loads classes from classes table as items in the combo-boxes built since the last call
+        """
+        if self.classes_cb_model is None:
+            self.classes_cb_model = QSqlTableModel()
+            self.classes_cb_model.setTable('classes')
+            self.classes_cb_model.setEditStrategy(QSqlTableModel.OnManualSubmit)
+            column = self.classes_cb_model.fieldIndex('class')
+            self.classes_cb_model.setSort(column, Qt.AscendingOrder)
+            self.classes_cb_model.select()
+        for class_cb in self.classComboBoxes():
+            if class_cb.model() is self.classes_cb_model:
+                continue
+            class_cb.setModel(self.classes_cb_model)
+            class_cb.setCurrentIndex(-1)
+
+    def classComboBoxes(self) -> list:
+        return self.liveWidgets('class_combo_box', 'class_combo_box_2', 'delete_class_cb', 'current_class_name_cb')
 
     def updateClassComboBoxes(self):
         """submits manual changes and set combobox current index to -1
         """
         self.classes_cb_model.submitAll()
-        self.class_combo_box.setCurrentIndex(-1)
-        self.class_combo_box_2.setCurrentIndex(-1)
-        self.delete_class_cb.setCurrentIndex(-1)
-        self.current_class_name_cb.setCurrentIndex(-1)
+        for class_cb in self.classComboBoxes():
+            class_cb.setCurrentIndex(-1)
 
     def setupHouseComboBox(self):
-        """Loads houses from houses table as items in the combo-box
-        """
-        self.houses_cb_model = QSqlTableModel()
-        self.houses_cb_model.setTable('houses')
-        self.houses_cb_model.setEditStrategy(QSqlTableModel.OnManualSubmit)
-        column = self.houses_cb_model.fieldIndex('house')
-        self.houses_cb_model.setSort(column, Qt.AscendingOrder)
-        self.houses_cb_model.select()
-        self.house_combo_box.setModel(self.houses_cb_model)
-        self.house_combo_box_2.setModel(self.houses_cb_model)
-        self.delete_house_cb.setModel(self.houses_cb_model)
-        self.current_house_name_cb.setModel(self.houses_cb_model)
+        """Loads houses from houses table as items in the combo-boxes built since the last call
+        """
+        if self.houses_cb_model is None:
+            self.houses_cb_model = QSqlTableModel()
+            self.houses_cb_model.setTable('houses')
+            self.houses_cb_model.setEditStrategy(QSqlTableModel.OnManualSubmit)
+            column = self.houses_cb_model.fieldIndex('house')
+            self.houses_cb_model.setSort(column, Qt.AscendingOrder)
+            self.houses_cb_model.select()
+        for house_cb in self.houseComboBoxes():
+            if house_cb.model() is self.houses_cb_model:
+                continue
+            house_cb.setModel(self.houses_cb_model)
+            house_cb.setCurrentIndex(-1)
+
+    def houseComboBoxes(self) -> list:
+        return self.liveWidgets('house_combo_box', 'house_combo_box_2', 'delete_house_cb', 'current_house_name_cb')
 
     def updateHouseComboBoxes(self):
         """submits manual changes and set combobox current index to -1
         """
         self.houses_cb_model.submitAll()
-        self.house_combo_box.setCurrentIndex(-1)
-        self.house_combo_box_2.setCurrentIndex(-1)
-        self.delete_house_cb.setCurrentIndex(-1)
-        self.current_house_name_cb.setCurrentIndex(-1)
+        for house_cb in self.houseComboBoxes():
+            house_cb.setCurrentIndex(-1)
 
     def booksTableSort(self):
         """
-        Sorts the book table data first by category then book title
+        Sorts the book table data first by category then book title.
+        While the search box has words in it, only shows the best matching books, best first
         """
-        self.book_table_model.setQuery(
-            QSqlQuery("SELECT * FROM books ORDER BY category, book_title"))
+        fts_query = ftsQuery(self.book_search_le.text())
+        if fts_query:
+            self.book_table_model.setRows(
+                *statements.fetchTable('search_books', fts_query, SEARCH_LIMIT), ordered=False)
+        else:
+            self.book_table_model.setRows(*statements.fetchTable('select_books_sorted'))
+
+    def refreshBookRows(self, *book_ids: int):
+        """Re-reads only books book_ids into the all books table, which keeps its order.
+        While searching, only the matching books already shown are updated.
+        """
+        if self.book_table_model is None:
+            return  # read whole when the books tab is first opened
+        for book_id in book_ids:
+            book = statements.fetchOne('select_book_by_id', book_id)
+            if book is None:
+                self.book_table_model.removeRowByKey(book_id)
+            else:
+                self.book_table_model.upsertRow(book)
 
     def setupBooksTableView(self):
         """Loads and displays all books from books table, and sorts them first according to category the book-title
         """
 
-        self.book_table_model = QSqlRelationalTableModel()
-        self.book_table_model.setTable('books')
-        self.book_table_model.setRelation(self.book_table_model.fieldIndex('category'), QSqlRelation(
-            'categories', 'category', 'category'))
+        # rows are kept ordered by category then book title, found by book_id
+        self.book_table_model = KeyedRowsTableModel(sort_key=itemgetter(2, 1))
         self.all_books_table_view.setModel(self.book_table_model)
         self.all_books_table_view.horizontalHeader(
         ).setSectionResizeMode(QHeaderView.Stretch)
         self.all_books_table_view.verticalHeader(
         ).setSectionResizeMode(QHeaderView.ResizeToContents)
-        self.book_table_model.setEditStrategy(QSqlTableModel.OnManualSubmit)
-        self.all_books_table_view.hideColumn(0)
         self.booksTableSort()
+        self.all_books_table_view.hideColumn(0)
 
-    def setTransactionTableQuery(self):
-        """set the transaction table model query
-        """
-        self.transactions_table_model.setQuery(QSqlQuery('''SELECT
-                                                    coalesce(name, 'USER ID '||users.user_id) AS user,
-                                                    book_title || ', ' || category AS book,
-                                                    transactions.type, 
-                                                    transactions.quantity,
-                                                    client_first_name || ' ' || client_last_name AS client,
-                                                    datetime
-                                                    from transactions INNER JOIN clients ON transactions.client_id == clients.client_id
-                                                    INNER JOIN books ON books.book_id == transactions.book_id
-                                                    INNER JOIN users ON users.user_id == transactions.user_id
-                                                    ORDER BY datetime DESC'''))
+    def transactionsFilterValues(self) -> list:
+        """Values of the transactions history filters applied, in the order the page statements bind them."""
+        return [value for name in transactions_filters if name in self.transactions_filters
+                for value in self.transactions_filters[name]]
+
+    def fetchTransactionsPage(self, after: tuple or None, page_size: int, on_page):
+        """Reads the page of filtered transactions older than after, (datetime, transaction_id) of the last row shown."""
+        if after is None:
+            db_worker.submit(transactionsPageName('select_transactions_page', self.transactions_filters),
+                             *self.transactionsFilterValues(), page_size,
+                             on_result=on_page, on_error=self.transactions_table_model.pageFailed)
+        else:
+            db_worker.submit(transactionsPageName('select_transactions_page_after', self.transactions_filters),
+                             *self.transactionsFilterValues(), *after, page_size,
+                             on_result=on_page, on_error=self.transactions_table_model.pageFailed)
+
+    def prependNewTransactions(self):
+        """Adds the filtered transactions newer than the newest one shown on top of the transactions table.
+        """
+        model = self.transactions_table_model
+        if model is None:
+            return  # read when the history tab is first opened
+        newest = model.firstKey()
+        if newest is None:
+            model.reload()
+        else:
+            db_worker.submit(transactionsPageName('select_transactions_newer', self.transactions_filters),
+                             *self.transactionsFilterValues(), *newest, on_result=model.current(model.prependRows))
+
+    def filterTransactions(self):
+        """Shows only the transactions matching the filters filled in, read a page at a time like the full history.
+        """
+        filters = {}
+        if self.filter_days_cb.isChecked():
+            filters['days'] = (self.filter_from_de.date().toString('yyyy-MM-dd'),
+                               self.filter_to_de.date().toString('yyyy-MM-dd'))
+        if self.filter_user_cb.currentIndex() > 0:
+            filters['user'] = (self.filter_user_cb.currentText(),)
+        if self.filter_book_le.text().strip():
+            filters['book'] = (self.formatText(self.filter_book_le.text()),)
+        if self.filter_category_le.text().strip():
+            filters['category'] = (self.formatText(self.filter_category_le.text()),)
+        if self.filter_client_le.text().strip():
+            # the last name is the last word, first names can have several ("Mary Ann Banda")
+            fname, _, lname = self.formatText(self.filter_client_le.text()).rpartition(' ')
+            filters['client'] = (fname.strip(), lname)
+        self.transactions_filters = filters
+        self.transactions_table_model.reload()
+
+    def clearTransactionsFilters(self):
+        """Clears the transactions history filters and shows every transaction again.
+        """
+        self.filter_days_cb.setChecked(False)
+        self.filter_user_cb.setCurrentIndex(0)
+        self.filter_book_le.clear()
+        self.filter_category_le.clear()
+        self.filter_client_le.clear()
+        self.filterTransactions()
+
+    def updateLibrarianFilter(self):
+        """Lists the existing user names in the librarian filters of the transactions and users' history.
+        """
+        for user_cb in self.liveWidgets('filter_user_cb', 'history_user_cb'):
+            current = user_cb.currentText()
+            user_cb.clear()
+            user_cb.addItem('All librarians')
+            user_cb.addItems(self.usernames)
+            user_cb.setCurrentIndex(max(user_cb.findText(current), 0))
 
     def setupTransactionsTableView(self):
-        """Creates a table with all user transactions
+        """Creates a table with all user transactions, newest first, read a page at a time as it is scrolled
         """
-        self.transactions_table_model = QSqlTableModel()
+        # pages are read by keyset on (datetime, transaction_id), the last two columns
+        self.transactions_filters = {}  # {filter: values}, see transactions_filters
+        self.transactions_table_model = PagedRowsTableModel(self.fetchTransactionsPage, itemgetter(5, 6))
         self.transactions_table_view.setModel(self.transactions_table_model)
-        self.setTransactionTableQuery()
+        self.transactions_table_model.modelReset.connect(lambda: self.transactions_table_view.hideColumn(6))
+        self.transactions_table_model.reload()
         self.transactions_table_view.horizontalHeader(
         ).setSectionResizeMode(QHeaderView.Stretch)
+        # fixed height rows, sizing them to their contents re-measures every loaded row after each page
         self.transactions_table_view.verticalHeader(
-        ).setSectionResizeMode(QHeaderView.ResizeToContents)
-        self.transactions_table_model.setEditStrategy(
-            QSqlTableModel.OnManualSubmit)
+        ).setSectionResizeMode(QHeaderView.Fixed)
+        # export this year's transactions by default
+        today = QDate.currentDate()
+        self.export_from_de.setDate(QDate(today.year(), 1, 1))
+        self.export_to_de.setDate(today)
+        self.filter_from_de.setDate(QDate(today.year(), 1, 1))
+        self.filter_to_de.setDate(today)
+        self.filter_category_completer = QCompleter(self.category_cb_model)
+        self.filter_category_completer.setCaseSensitivity(Qt.CaseInsensitive)
+        self.filter_category_le.setCompleter(self.filter_category_completer)
+
+    def exportTransactions(self):
+        """Exports the transactions of the selected days and type to a CSV or JSON Lines file
+        chosen by the user, on a background thread with a progress dialog.
+        """
+        first_day = self.export_from_de.date().toString('yyyy-MM-dd')
+        last_day = self.export_to_de.date().toString('yyyy-MM-dd')
+        if first_day > last_day:
+            QMessageBox.warning(
+                self, 'Invalid', "<p style='color:#842029; font-size: 13px;'>The first day is after the last day.</p>")
+            return
+
+        type_ = self.export_type_cb.currentText()
+        file_format = 'jsonl' if self.export_format_cb.currentIndex() == 1 else 'csv'
+        compress = self.export_gzip_cb.isChecked()
+        extension = f".{file_format}{'.gz' if compress else ''}"
+        path, _ = QFileDialog.getSaveFileName(
+            self, 'Export Transactions', os.path.join(base_dir, f'transactions_{first_day}_{last_day}{extension}'),
+            f'{self.export_format_cb.currentText()} (*{extension})')
+        if not path:
+            return
+
+        progress_dialog = QProgressDialog('Exporting transactions...', 'Cancel', 0, 0, self)
+        progress_dialog.setWindowTitle('Export')
+        progress_dialog.setWindowModality(Qt.WindowModal)
+        progress_dialog.setMinimumDuration(500)
+
+        def showProgress(rows: int, total: int):
+            progress_dialog.setMaximum(total)
+            progress_dialog.setValue(rows)
+
+        def exportFinished(result):
+            progress_dialog.reset()
+            self.export_btn.setEnabled(True)
+            self.export_task = None
+            if result.cancelled:
+                return
+            self.logHistory('EXPORTED', 'transactions', rows=result.rows, file=os.path.basename(path))
+            self.prependNewHistory()
+            left_out = ''
+            if result.archives_left_out:
+                left_out = f"""<p style='color:#842029;'>The archives of {', '.join(result.archives_left_out)} were left out,
+                                    SQLite can't open more than {MAX_ATTACHED_ARCHIVES} archive files at once.</p>"""
+            QMessageBox.information(
+                self, 'Exported', f"""<p style='color:#2020e6; font-size: 13px;'>Exported {result.rows} transactions in {result.seconds:.2f} s ({result.rows_per_second:.0f} rows/s).</p>
+                                    <p><span style='color:#13589e'>{path}</span> ({result.size / 1024:.1f} KiB)</p>{left_out}""")
+
+        def exportFailed(error: str):
+            progress_dialog.reset()
+            self.export_btn.setEnabled(True)
+            self.export_task = None
+            QMessageBox.critical(
+                self, 'Error', f"""<p style='color:crimson; font-size: 13px;'>Failed to export transactions.</p>
+                                    <p>{error}</p>""")
+
+        self.export_task = BackgroundTask(connection_pool, exportTransactions, path, file_format, first_day, last_day,
+                                          '' if type_ == 'All' else type_, compress, self.export_archived_cb.isChecked())
+        self.export_task.progressed.connect(showProgress)
+        self.export_task.finished.connect(exportFinished)
+        self.export_task.failed.connect(exportFailed)
+        progress_dialog.canceled.connect(self.export_task.cancel)
+        self.export_btn.setEnabled(False)
+        self.export_task.start()
 
     def setupClientRecordView(self):
         """Creates table to load books a client has not returned."""
@@ -766,18 +1044,28 @@ class MainApp(QMainWindow, main):
             QHeaderView.ResizeToContents)
         for column_hidden in (0, 1, 2, 3, 7):
             self.client_record_tv.hideColumn(column_hidden)
+        self.client_record_tv.selectionModel().selectionChanged.connect(self.bookSelected)
 
     def setupAllClientRecordsView(self):
         """Creates table to load clients' records."""
-        self.clients_records_table_model = QSqlTableModel()
-        self.clients_records_table_model.setTable('client_record_vw')
+        self.clients_records_table_model = RowsTableModel()
         self.client_record_tv_2.setModel(self.clients_records_table_model)
         self.client_record_tv_2.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
         self.client_record_tv_2.verticalHeader().setSectionResizeMode(
             QHeaderView.ResizeToContents)
-        self.clients_records_table_model.setQuery(
-            QSqlQuery('SELECT * FROM client_record_vw WHERE returned=0'))
-        self.client_record_tv_2.hideColumn(7)
+        self.setAllClientRecordsTableQuery()
+
+    def setAllClientRecordsTableQuery(self):
+        """sets the all clients' records table model query
+        """
+        if self.clients_records_table_model is None:
+            return  # read when the report tab is first opened
+
+        def setAllClientRecordsRows(columns: list, rows: list):
+            self.clients_records_table_model.setRows(columns, rows)
+            self.client_record_tv_2.hideColumn(7)  # a model reset shows every column again
+
+        db_worker.submit('select_unreturned_client_records', on_result=setAllClientRecordsRows)
 
     def updateCategoryList(self, data: list):
         """Updates the list of categories of book searched by user
@@ -786,39 +1074,128 @@ class MainApp(QMainWindow, main):
             data (list): book record [book_id, book_title, category, quantity]
         """
         self.category_lw.clear()
-        query.exec_(
-            f"SELECT category FROM books WHERE book_title = '{data[0][1]}'")
-        data_2 = []
-        while query.next():
-            data_2.append(query.value(0))
+        data_2 = statements.fetchColumn('select_book_categories', data[0][1])
         self.category_lw.addItems([cate for cate in data_2])
         if not data_2:
             self.edit_extra_label.setText(
                 f'"{data[0][1]}" did not appear in any category.')
 
+    def logHistory(self, action: str, table: str = None, **details):
+        """Records action (a history.HISTORY_ACTIONS key) of the signed in user on table in the users' history,
+        details being the payload of the event.
+        """
+        statements.execute('insert_history', *historyValues(self.user_id, action, table, **details))
+
+    def historyFilterValues(self) -> list:
+        """Values of the users' history filters applied, in the order the page statements bind them."""
+        return [value for name in history_filters if name in self.history_filters
+                for value in self.history_filters[name]]
+
+    def fetchHistoryPage(self, after: tuple or None, page_size: int, on_page):
+        """Reads the page of filtered events older than after, (datetime, event_id) of the last row shown.
+        Pages are read by the worker, whose connection has the archived history view, see showArchivedHistory.
+        """
+        def describePage(columns: list, rows: list):
+            on_page(EVENT_COLUMNS, [describeEvent(row) for row in rows])
+
+        if after is None:
+            db_worker.submit(historyPageName('select_history_page', self.history_filters, self.history_archived),
+                             *self.historyFilterValues(), page_size,
+                             on_result=describePage, on_error=self.history_table_model.pageFailed)
+        else:
+            db_worker.submit(historyPageName('select_history_page_after', self.history_filters, self.history_archived),
+                             *self.historyFilterValues(), *after, page_size,
+                             on_result=describePage, on_error=self.history_table_model.pageFailed)
+
+    def prependNewHistory(self):
+        """Adds the filtered events newer than the newest one shown on top of the users' history table.
+        """
+        model = self.history_table_model
+        if model is None:
+            return  # read when the history tab is first opened
+        newest = model.firstKey()
+        if newest is None:
+            model.reload()
+        else:
+            prependRows = model.current(model.prependRows)
+            db_worker.submit(historyPageName('select_history_newer', self.history_filters, self.history_archived),
+                             *self.historyFilterValues(), *newest,
+                             on_result=lambda columns, rows: prependRows(EVENT_COLUMNS, [describeEvent(row) for row in rows]))
+
+    def filterHistory(self):
+        """Shows only the events matching the history filters filled in, read a page at a time.
+        """
+        filters = {}
+        if self.history_days_cb.isChecked():
+            filters['days'] = (self.history_from_de.date().toString('yyyy-MM-dd'),
+                               self.history_to_de.date().toString('yyyy-MM-dd'))
+        if self.history_user_cb.currentIndex() > 0:
+            filters['user'] = (self.history_user_cb.currentText(),)
+        if self.history_table_cb.currentIndex() > 0:
+            filters['table'] = (HISTORY_TABLES[self.history_table_cb.currentText()],)
+        self.history_filters = filters
+        self.history_table_model.reload()
+
+    def clearHistoryFilters(self):
+        """Clears the users' history filters and shows every event again.
+        """
+        self.history_days_cb.setChecked(False)
+        self.history_user_cb.setCurrentIndex(0)
+        self.history_table_cb.setCurrentIndex(0)
+        self.filterHistory()
+
     def showHistory(self):
-        """Loads and displays history of user activities"""
+        """Creates a table with the history of user activities, newest first, read a page at a time as it is scrolled"""
 
-        self.history_table_model = QSqlTableModel()
-        self.history_table_model.setTable('history')
+        # pages are read by keyset on (datetime, event_id), the last two columns
+        self.history_filters = {}  # {filter: values}, see history_filters
+        self.history_archived = False
+        self.history_table_model = PagedRowsTableModel(self.fetchHistoryPage, itemgetter(4, 5))
         self.history_tv.setModel(self.history_table_model)
+        self.history_table_model.modelReset.connect(lambda: self.history_tv.hideColumn(5))
+        self.history_table_model.reload()
         self.history_tv.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
-        self.history_tv.verticalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
-        column = self.history_table_model.fieldIndex('datetime')
-        self.history_table_model.setSort(column, Qt.DescendingOrder)
-        self.history_table_model.setEditStrategy(QSqlTableModel.OnManualSubmit)
-        self.history_table_model.select()
+        self.history_tv.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.history_table_cb.addItem('All tables')
+        self.history_table_cb.addItems(HISTORY_TABLES)
+        today = QDate.currentDate()
+        self.history_from_de.setDate(today.addDays(-7))
+        self.history_to_de.setDate(today)
+
+    def showArchivedHistory(self, archived: bool):
+        """Switches the users' history table between the live history and the live plus archived history.
+        The archives are attached to the worker connection the pages are read on, queued before the pages.
+        """
+        if not archived:
+            self.history_archived = False
+            self.history_table_model.reload()
+            db_worker.submitCall(detachArchives)
+            return
+
+        def archivesAttached(years: list):
+            if not self.history_archived_cb.isChecked():
+                return  # unticked meanwhile, the detach is queued behind
+            left_out = archivesLeftOut(database.databaseName())
+            if left_out:
+                QMessageBox.warning(
+                    self, 'Archive', f"""<p style='color:#842029; font-size: 13px;'>The archives of {', '.join(left_out)} are left out.</p>
+                                        <p>SQLite can't open more than {MAX_ATTACHED_ARCHIVES} archive files at once.</p>""")
+            self.history_archived = True
+            self.history_table_model.reload()
+
+        def archivesFailed(error: str):
+            QMessageBox.critical(
+                self, 'Error', f"""<p style='color:crimson; font-size: 13px;'>Failed to open the archive.</p>
+                                    <p>{error}</p>""")
+            self.history_archived_cb.setChecked(False)
+
+        db_worker.submitCall(attachArchives, on_result=archivesAttached, on_error=archivesFailed, busy=True)
 
     def setClientRecordTableQuery(self, fname, lname, class_, house):
         """ sets the client record table model query
         """
         self.client_record_table_model.setQuery(
-            QSqlQuery(f"""SELECT BOOK_TITLE, CATEGORY, OWING_QUANTITY, RETURNED FROM client_record_vw 
-                        WHERE first_name='{fname}'
-                        AND last_name='{lname}'
-                        AND class='{class_}' 
-                        AND house='{house}'
-                        AND RETURNED=FALSE"""))
+            statements.executeForModel('select_client_record', fname, lname, class_, house))
 
     def showClientRecord(self, fname: str, lname: str, class_: str, house: str):
         """Loads and displays books a client has not returned
@@ -827,6 +1204,19 @@ class MainApp(QMainWindow, main):
             QMessageBox.warning(
                 self, 'Invalid', "<p style='color:#842029; font-size: 13px;'>Fill out all entries.</p>", QMessageBox.Ok, QMessageBox.Ok)
 
+        # if client doesn't exist, offer the clients with the most similar names
+        elif statements.fetchOne('select_client_id', fname, lname, class_, house) is None:
+            client = self.chooseSuggestion(
+                f"{fname} {lname}, {class_}, {house}",
+                {f"{client[1]} {client[2]}, {client[3]}, {client[4]}": client
+                 for client in similarClients(statements, fname, lname, class_, house)})
+            if client is not None:
+                self.fname_le_2.setText(client[1])
+                self.lname_le_2.setText(client[2])
+                self.class_combo_box_2.setCurrentIndex(self.class_combo_box_2.findText(client[3]))
+                self.house_combo_box_2.setCurrentIndex(self.house_combo_box_2.findText(client[4]))
+                self.showClientRecord(*client[1:])
+
         else:
             self.client_info_label.setText(
                 f"{fname}\t{lname}\t{class_}\t{house}")  # Displays client information
@@ -837,6 +1227,24 @@ class MainApp(QMainWindow, main):
 
             self.setClientRecordTableQuery(fname, lname, class_, house)
 
+    def chooseSuggestion(self, typed: str, suggestions: dict):
+        """Asks the user to pick one of the "did you mean" suggestions for what they typed.
+
+        Args:
+            typed (str): what the user typed, as shown to them
+            suggestions (dict): {label: value}, most likely first
+
+        Returns the value of the picked label, None if there are no suggestions or the user cancelled.
+        """
+        if not suggestions:
+            QMessageBox.warning(
+                self, 'Not Found', f"<p style='color:#842029; font-size: 13px;'><span style='color:#13589e'>{typed}</span> not found.</p>",
+                QMessageBox.Ok, QMessageBox.Ok)
+            return None
+        label, picked = QInputDialog.getItem(
+            self, 'Not Found', f'"{typed}" not found. Did you mean:', list(suggestions), 0, False)
+        return suggestions[label] if picked else None
+
     @staticmethod
     def formatText(text: str) -> str:
         """Cleans user input by removing trailing whitespaces 
@@ -873,26 +1281,32 @@ class MainApp(QMainWindow, main):
         widget.update()
 
     def loadTransactionData(self) -> list[list, list]:
-        """Loads transactions from transaction_acc_vw and returns them according to type.
+        """Loads daily transaction totals from transaction_daily and returns them according to type.
+        Every day from the first transaction up to today gets a data point, days without
+        transactions of a type get a zero quantity.
 
         Returns:
-            list[list, list]: [[[lent_quantities], [lent_dates]], [[retrieved_quantities], [retrieved_dates]]]
+            list[list, list]: [[[lent_dates], [lent_quantities]], [[retrieved_dates], [retrieved_quantities]]]
         """
-        query.exec_("SELECT * FROM transaction_acc_vw")
+        today = datetime.today().date()
+        first_day = statements.fetchOne('select_first_transaction_day')[0]
+        if first_day:
+            first_day = min(datetime.strptime(first_day, '%Y-%m-%d').date(), today)
+        else:
+            first_day = today
+
+        quantities = {}  # {(date, type): quantity}
+        for day, type_, quantity in statements.fetchAll('select_transaction_daily', str(first_day), str(today)):
+            quantities[(day, type_)] = quantity
+
         lent_trans = [[], []]
         retrieved_trans = [[], []]
-        while query.next():
-            if query.value(1) == 'RETRIEVE':
-                retrieved_trans[0].append(query.value(2))
-                retrieved_trans[1].append(query.value(0))
-            elif query.value(1) == 'LEND':
-                lent_trans[0].append(query.value(2))
-                lent_trans[1].append(query.value(0))
-            else:
-                retrieved_trans[0].append(query.value(2))
-                retrieved_trans[1].append(query.value(0))
-                lent_trans[0].append(query.value(2))
-                lent_trans[1].append(query.value(0))
+        for day in range((today - first_day).days + 1):
+            day = str(first_day + timedelta(days=day))
+            lent_trans[0].append(day)
+            lent_trans[1].append(quantities.get((day, 'LEND'), 0))
+            retrieved_trans[0].append(day)
+            retrieved_trans[1].append(quantities.get((day, 'RETRIEVE'), 0))
 
         return lent_trans, retrieved_trans
 
@@ -1028,21 +1442,18 @@ class MainApp(QMainWindow, main):
                                     <p>Can't change username.</p>""")
             # if inputted username is not already taken
             else:
-                query.exec_(
-                    f"UPDATE users SET user_name='{new_username}' WHERE user_id={self.user_id}")
+                statements.execute('update_username', new_username, self.user_id)
                 self.username = new_username
-                query.exec_(
-                    f"""INSERT INTO history(user_name, [action], [table]) VALUES("{old_username}", "Changed username to '{self.username}'", "users")""")
-                query.exec_(
-                    f"UPDATE user_permissions SET user_name='{new_username}' WHERE user_name='{old_username}'")
-                query.exec_(
-                    f"""INSERT INTO history(user_name, [action], [table]) VALUES("{old_username}", "Changed username to '{self.username}'", "user_permissions")""")
+                self.logHistory('RENAMED', 'users', old_name=old_username, new_name=new_username)
+                statements.execute('update_permissions_username', new_username, old_username)
+                self.logHistory('RENAMED', 'user_permissions', old_name=old_username, new_name=new_username)
 
                 self.change_username_le.setPlaceholderText(new_username)
                 self.username_label_3.setText(new_username)
                 self.usernames[self.usernames.index(
                     old_username)] = new_username
-                self.history_table_model.submitAll()
+                self.updateLibrarianFilter()
+                self.prependNewHistory()
 
                 QMessageBox.information(
                     self, 'Changed', "<p style='color:#2020e6; font-size: 13px;'>Successfully Changed username.</p>")
@@ -1087,16 +1498,12 @@ class MainApp(QMainWindow, main):
                 self, 'Error', "<p style='color:#842029; font-size: 13px;'>No input given in one or both fields.</p>")
         # if passwords match
         elif password_1 == password_2:
-            hashed_password = str(hashPassword(password_1))  # encrypt password
-            query.prepare("UPDATE users SET user_password=? WHERE user_id=?")
-            query.addBindValue(hashed_password)
-            query.addBindValue(self.user_id)
-            query.exec_()
+            hashed_password = hashPassword(password_1, password_settings)  # encrypt password
+            statements.execute('update_password', hashed_password, self.user_id)
             QMessageBox.information(
                 self, 'Changed', "<p style='color:#2020e6; font-size: 13px;'>Password change successful.</p>")
-            query.exec_(
-                f"""INSERT INTO history(user_name, [action], [table]) VALUES('{self.username}', 'Changed password', 'users')""")
-            self.history_table_model.submitAll()
+            self.logHistory('CHANGED PASSWORD', 'users')
+            self.prependNewHistory()
             self.change_password_le.setStyleSheet("border-color: #394453;")
             self.change_password_le_2.setStyleSheet("border-color: #394453;")
 
@@ -1115,20 +1522,18 @@ class MainApp(QMainWindow, main):
 
         # if input is given
         if class_name:
-            query.exec_(f"INSERT INTO classes VALUES('{class_name}')")
             # if class already exists
-            if query.lastError().isValid():
+            if statements.execute('insert_class', class_name).lastError().isValid():
                 QMessageBox.critical(
                     self, 'Error', f"""<p style='color:crimson; font-size: 13px;'>Failed to change class name.</p>
                                             <p><span style='color:#13589e'>{class_name}</span> already exists.</p>""")
             else:
                 QMessageBox.information(
                     self, 'Added', "<p style='color:#2020e6; font-size: 13px;'>Class successfully added.</p>")
-                query.exec_(
-                    f"""INSERT INTO history(user_name, [action], [table]) VALUES("{self.username}", "Added '{class_name}'", "classes")""")
+                self.logHistory('ADDED', 'classes', name=class_name)
 
                 self.updateClassComboBoxes()
-                self.history_table_model.submitAll()
+                self.prependNewHistory()
         else:
             QMessageBox.warning(
                 self, 'Error', "<p style='color:#842029; font-size: 13px;'>No valid input given.</p>")
@@ -1143,48 +1548,47 @@ class MainApp(QMainWindow, main):
         # if input is given
         if class_name:
 
-            # check if any client from inputted class has not returned books
-            query.exec_(
-                f"SELECT FIRST_NAME, LAST_NAME, CLASS, HOUSE from client_record_vw WHERE class='{class_name}' AND returned=0")
-            
-            clients = []
-            while query.next():
-                clients.append(((query.value(
-                    0) + ' ' + query.value(1) + ' ' + query.value(2) + ' ' + query.value(3))))
-            # if owing clients exist
-            if clients:
-                num_left = len(clients) - 2
-                if num_left > 0:
-                    # only display two clients of many that haven't returned the book
-                    QMessageBox.information(
-                        self, 'Error', f"""<p style='color:#2020e6; font-size: 13px;'>The following clients from <span style='color:#13589e'>{class_name}</span> have unreturned books:</p>
-                                                <p style='color:#13589e'>{', '.join(clients[:2])} and {num_left} more.</p>
-                                                <p>Can't delete this class.</p>""")
-                elif num_left == 0:
-                    # display the two clients that haven't returned the book
-                    QMessageBox.information(
-                        self, 'Error', f"""<p style='color:#2020e6; font-size: 13px;'>The following clients from <span style='color:#13589e'>{class_name}</span> have unreturned books:</p>
-                                                <p style='color:#13589e'>{' and '.join(clients)}.</p>
-                                                <p>Can't delete this class.</p>""")
+            def completeDeleteClass(columns: list, owing_clients: list):
+                """Deletes the class once the worker has checked it has no owing clients"""
+                self.delete_class_btn.setEnabled(True)
+                clients = [' '.join(client) for client in owing_clients]
+                # if owing clients exist
+                if clients:
+                    num_left = len(clients) - 2
+                    if num_left > 0:
+                        # only display two clients of many that haven't returned the book
+                        QMessageBox.information(
+                            self, 'Error', f"""<p style='color:#2020e6; font-size: 13px;'>The following clients from <span style='color:#13589e'>{class_name}</span> have unreturned books:</p>
+                                                    <p style='color:#13589e'>{', '.join(clients[:2])} and {num_left} more.</p>
+                                                    <p>Can't delete this class.</p>""")
+                    elif num_left == 0:
+                        # display the two clients that haven't returned the book
+                        QMessageBox.information(
+                            self, 'Error', f"""<p style='color:#2020e6; font-size: 13px;'>The following clients from <span style='color:#13589e'>{class_name}</span> have unreturned books:</p>
+                                                    <p style='color:#13589e'>{' and '.join(clients)}.</p>
+                                                    <p>Can't delete this class.</p>""")
+                    else:
+                        # display the client that hasn't returned the book
+                        QMessageBox.information(
+                            self, 'Error', f"""<p style='color:#2020e6; font-size: 13px;'>The following client from <span style='color:#13589e'>{class_name}</span> has unreturned books:</p>
+                                                    <p style='color:#13589e'>{''.join(clients)}.</p>
+                                                    <p>Can't delete this class.</p>""")
+
+                # if owing clients don't exist
                 else:
-                    # display the client that hasn't returned the book
+                    statements.execute('delete_class', class_name)
+
                     QMessageBox.information(
-                        self, 'Error', f"""<p style='color:#2020e6; font-size: 13px;'>The following client from <span style='color:#13589e'>{class_name}</span> has unreturned books:</p>
-                                                <p style='color:#13589e'>{''.join(clients)}.</p>
-                                                <p>Can't delete this class.</p>""")
+                        self, 'Deleted', "<p style='color:#2020e6; font-size: 13px;'>Class successfully deleted.</p>")
+                    self.logHistory('DELETED', 'classes', name=class_name)
 
-            # if owing clients don't exist
-            else:
-                query.exec_(
-                    f"DELETE FROM classes WHERE class='{class_name}'")
-                
-                QMessageBox.information(
-                    self, 'Deleted', "<p style='color:#2020e6; font-size: 13px;'>Class successfully deleted.</p>")
-                query.exec_(
-                    f"""INSERT INTO history(user_name, [action], [table]) VALUES("{self.username}", "Deleted '{class_name}'", "classes")""")
+                    self.updateClassComboBoxes()
+                    self.prependNewHistory()
 
-                self.updateClassComboBoxes()
-                self.history_table_model.submitAll()
+            # check if any client from inputted class has not returned books, off the GUI thread
+            self.delete_class_btn.setEnabled(False)
+            db_worker.submit('select_class_owing_clients', class_name, on_result=completeDeleteClass,
+                             on_error=lambda error: self.delete_class_btn.setEnabled(True))
 
         else:
             QMessageBox.warning(
@@ -1201,25 +1605,22 @@ class MainApp(QMainWindow, main):
         # if input fields are filled out
         if new_class_name and current_class_name:
 
-            query.exec_(
-                f"UPDATE classes SET class='{new_class_name}' WHERE class='{current_class_name}'")
+            update_class_query = statements.execute('update_class', new_class_name, current_class_name)
 
             # if class unique constraint error(class already exists)
-            if query.lastError().isValid():
+            if update_class_query.lastError().isValid():
                 QMessageBox.critical(
                     self, 'Error', f"""<p style='color:crimson; font-size: 13px;'>Failed to change house name.</p>
                                             <p><span style='color:#13589e'>{new_class_name}</span> already exists.</p>""")
             else:
                 # manual cascade on update
-                query.exec_(
-                    f"UPDATE clients SET client_class='{new_class_name}' WHERE client_class='{current_class_name}'")
+                statements.execute('update_clients_class', new_class_name, current_class_name)
                 QMessageBox.information(
                     self, 'Changed', "<p style='color:#2020e6; font-size: 13px;'>Class name successfully changed.</p>")
-                query.exec_(
-                    f"""INSERT INTO history(user_name, [action], [table]) VALUES("{self.username}", "Changed '{current_class_name}' to '{new_class_name}'", "classes")""")
+                self.logHistory('RENAMED', 'classes', old_name=current_class_name, new_name=new_class_name)
 
                 self.updateClassComboBoxes()
-                self.history_table_model.submitAll()
+                self.prependNewHistory()
 
         # No valid input given
         else:
@@ -1236,19 +1637,18 @@ class MainApp(QMainWindow, main):
 
         # if input is given
         if house_name:
-            query.exec_(f"INSERT INTO houses VALUES('{house_name}')")
-            if query.lastError().isValid():
+            # if house already exists
+            if statements.execute('insert_house', house_name).lastError().isValid():
                 QMessageBox.critical(
                     self, 'Error', f"""<p style='color:crimson; font-size: 13px;'>Failed to change house name.</p>
                                             <p><span style='color:#13589e'>{house_name}</span> already exists.</p>""")
             else:
                 QMessageBox.information(
                     self, 'Added', "<p style='color:#2020e6; font-size: 13px;'>House successfully added.</p>")
-                query.exec_(
-                    f"""INSERT INTO history(user_name, [action], [table]) VALUES("{self.username}", "Added '{house_name}'", "houses")""")
+                self.logHistory('ADDED', 'houses', name=house_name)
 
                 self.updateHouseComboBoxes()
-                self.history_table_model.submitAll()
+                self.prependNewHistory()
 
         else:
             QMessageBox.warning(
@@ -1263,49 +1663,48 @@ class MainApp(QMainWindow, main):
 
         # if input is given
         if house_name:
-            # check if any client from inputted house has not returned books
-            query.exec_(
-                f"SELECT FIRST_NAME, LAST_NAME, CLASS, HOUSE from client_record_vw WHERE house='{house_name}' AND returned=0")
-            
-            clients = []
-            while query.next():
-                clients.append(((query.value(
-                    0) + ' ' + query.value(1) + ' ' + query.value(2) + ' ' + query.value(3))))
-
-            # if owing clients exist
-            if clients:
-                num_left = len(clients) - 2
-                if num_left > 0:
-                    # only display two clients of many that haven't returned the book
-                    QMessageBox.information(
-                        self, 'Error', f"""<p style='color:#2020e6; font-size: 13px;'>The following clients from <span style='color:#13589e'>{house_name}</span> have unreturned books:</p>
-                                            <p style='color:#13589e'>{', '.join(clients[:2])} and {num_left} more.</p>
-                                            <p>Can't delete this class.</p>""")
-                elif num_left == 0:
-                    # display the two clients that haven't returned the book
-                    QMessageBox.information(
-                        self, 'Error', f"""<p style='color:#2020e6; font-size: 13px;'>The following clients from <span style='color:#13589e'>{house_name}</span> have unreturned books:</p>
-                                            <p style='color:#13589e'>{' and '.join(clients)}.</p>
-                                            <p>Can't delete this class.</p>""")
+            def completeDeleteHouse(columns: list, owing_clients: list):
+                """Deletes the house once the worker has checked it has no owing clients"""
+                self.delete_house_btn.setEnabled(True)
+                clients = [' '.join(client) for client in owing_clients]
+
+                # if owing clients exist
+                if clients:
+                    num_left = len(clients) - 2
+                    if num_left > 0:
+                        # only display two clients of many that haven't returned the book
+                        QMessageBox.information(
+                            self, 'Error', f"""<p style='color:#2020e6; font-size: 13px;'>The following clients from <span style='color:#13589e'>{house_name}</span> have unreturned books:</p>
+                                                <p style='color:#13589e'>{', '.join(clients[:2])} and {num_left} more.</p>
+                                                <p>Can't delete this class.</p>""")
+                    elif num_left == 0:
+                        # display the two clients that haven't returned the book
+                        QMessageBox.information(
+                            self, 'Error', f"""<p style='color:#2020e6; font-size: 13px;'>The following clients from <span style='color:#13589e'>{house_name}</span> have unreturned books:</p>
+                                                <p style='color:#13589e'>{' and '.join(clients)}.</p>
+                                                <p>Can't delete this class.</p>""")
+                    else:
+                        # display the client that hasn't returned the book
+                        QMessageBox.information(
+                            self, 'Error', f"""<p style='color:#2020e6; font-size: 13px;'>The following client from <span style='color:#13589e'>{house_name}</span> has unreturned books:</p>
+                                                <p style='color:#13589e'>{''.join(clients)}.</p>
+                                                <p>Can't delete this class.</p>""")
+
+                # if owing clients don't exist
                 else:
-                    # display the client that hasn't returned the book
+                    statements.execute('delete_house', house_name)
+
                     QMessageBox.information(
-                        self, 'Error', f"""<p style='color:#2020e6; font-size: 13px;'>The following client from <span style='color:#13589e'>{house_name}</span> has unreturned books:</p>
-                                            <p style='color:#13589e'>{''.join(clients)}.</p>
-                                            <p>Can't delete this class.</p>""")
+                        self, 'Deleted', "<p style='color:#2020e6; font-size: 13px;'>House successfully deleted.</p>")
+                    self.logHistory('DELETED', 'houses', name=house_name)
 
-            # if owing clients don't exist
-            else:
-                query.exec_(
-                    f"DELETE FROM houses WHERE house='{house_name}'")
-               
-                QMessageBox.information(
-                    self, 'Deleted', "<p style='color:#2020e6; font-size: 13px;'>House successfully deleted.</p>")
-                query.exec_(
-                    f"""INSERT INTO history(user_name, [action], [table]) VALUES("{self.username}", "Deleted '{house_name}'", "houses")""")
+                    self.updateHouseComboBoxes()
+                    self.prependNewHistory()
 
-                self.updateHouseComboBoxes()
-                self.history_table_model.submitAll()
+            # check if any client from inputted house has not returned books, off the GUI thread
+            self.delete_house_btn.setEnabled(False)
+            db_worker.submit('select_house_owing_clients', house_name, on_result=completeDeleteHouse,
+                             on_error=lambda error: self.delete_house_btn.setEnabled(True))
 
         else:
             QMessageBox.warning(
@@ -1313,6 +1712,40 @@ class MainApp(QMainWindow, main):
 
         self.delete_house_cb.setCurrentIndex(-1)
 
+    def importRoster(self):
+        """Registers pupils from a first name,last name,class,house CSV file chosen by the user.
+        Pupils already registered are skipped, the name completers are refreshed once at the end.
+        """
+        csv_path, _ = QFileDialog.getOpenFileName(self, 'Import Roster', base_dir, 'CSV files (*.csv);;All files (*)')
+        if not csv_path:
+            return
+
+        QApplication.setOverrideCursor(Qt.BusyCursor)
+        try:
+            result = importRoster(statements, csv_path)
+        except (OSError, UnicodeDecodeError, StatementError) as error:
+            result = None
+            QApplication.restoreOverrideCursor()
+            QMessageBox.critical(
+                self, 'Error', f"""<p style='color:crimson; font-size: 13px;'>Failed to import roster.</p>
+                                    <p>{error}</p>
+                                    <p>Chunks imported before the error were kept.</p>""")
+        else:
+            QApplication.restoreOverrideCursor()
+            self.logHistory('IMPORTED', 'clients', added=result.added, file=os.path.basename(csv_path))
+
+        self.updateClientNameCompleters(reload=True)
+        self.prependNewHistory()
+
+        if result is not None:
+            skipped = ''.join(f"<br>line {line}: {reason}" for line, reason in result.skipped[:5])
+            if len(result.skipped) > 5:
+                skipped += f"<br>and {len(result.skipped) - 5} more."
+            QMessageBox.information(
+                self, 'Imported', f"""<p style='color:#2020e6; font-size: 13px;'>Imported {result.rows} rows in {result.seconds:.2f} s ({result.rows_per_second:.0f} rows/s).</p>
+                                    <p><span style='color:#13589e'>{result.added}</span> pupils registered, <span style='color:#13589e'>{result.duplicates}</span> already registered.</p>
+                                    {f"<p>Skipped {len(result.skipped)} rows:{skipped}</p>" if result.skipped else ""}""")
+
     def changeHouseName(self):
         """Changes house name of existing house and updates houses of clients that belong to it to the new house name
         """
@@ -1322,25 +1755,22 @@ class MainApp(QMainWindow, main):
         # if input fields are filled out
         if new_house_name and current_house_name:
 
-            query.exec_(
-                f"UPDATE houses SET house='{new_house_name}' WHERE house='{current_house_name}'")
+            update_house_query = statements.execute('update_house', new_house_name, current_house_name)
 
             # if unique constraint error
-            if query.lastError().isValid():
+            if update_house_query.lastError().isValid():
                 QMessageBox.critical(
                     self, 'Error', f"""<p style='color:crimson; font-size: 13px;'>Failed to change house name.</p>
                                             <p><span style='color:#13589e'>{new_house_name}</span> already exists.</p>""")
             else:
                 # manual cascade on update
-                query.exec_(
-                    f"UPDATE clients SET client_house='{new_house_name}' WHERE client_house='{current_house_name}'")
+                statements.execute('update_clients_house', new_house_name, current_house_name)
                 QMessageBox.information(
                     self, 'Changed', "<p style='color:#2020e6; font-size: 13px;'>House name successfully changed.</p>")
-                query.exec_(
-                    f"""INSERT INTO history(user_name, [action], [table]) VALUES("{self.username}", "Changed '{current_house_name}' to '{new_house_name}'", "houses")""")
+                self.logHistory('RENAMED', 'houses', old_name=current_house_name, new_name=new_house_name)
 
                 self.updateHouseComboBoxes()
-                self.history_table_model.submitAll()
+                self.prependNewHistory()
 
         else:
             QMessageBox.warning(
@@ -1361,14 +1791,6 @@ class MainApp(QMainWindow, main):
         self.max_btn.clicked.connect(lambda: btn_max_clicked(self))
         ###################################
 
-        # Permissions Group Box connections
-        self.b_group = QButtonGroup()
-        self.b_group.addButton(self.checkBox_21)
-        self.b_group.addButton(self.checkBox_22)
-        self.b_group.addButton(self.checkBox)
-        self.b_group.buttonClicked.connect(self.checkPermissions)
-        ###################################
-
         self.logout_btn.clicked.connect(self.handleLogout)  # logout connection
 
         # Main Tab Buttons' connections
@@ -1381,18 +1803,22 @@ class MainApp(QMainWindow, main):
         self.users_btn.clicked.connect(self.open_users_tab)
         ###################################
 
-        ############Books Tab connections START#############
+    def handleBooksTab(self):
+        """Connects the books tab buttons to functions once the tab is built
+        """
+        self.book_search_le.textChanged.connect(self.booksTableSort)
         self.add_book_btn.clicked.connect(
             lambda: self.addBook(self.formatText(self.book_title_le.text()),
                                  self.formatText(
                                      self.category_combo_box.currentText()),
                                  self.quantity_spin_box.value()))
+        self.import_books_btn.clicked.connect(self.importBooks)
         self.delete_book_btn.clicked.connect(
             lambda: self.deleteBook(self.formatText(self.book_title_le_2.text()),
                                     self.formatText(self.category_combo_box_2.currentText())))
         self.search_book_btn.clicked.connect(
             lambda: self.searchBook(self.formatText(self.book_title_le_2.text()),
-                                    self.formatText(self.category_combo_box_2.currentText())))
+                                    self.formatText(self.category_combo_box_2.currentText()), ranked=True))
         self.edit_book_btn.clicked.connect(
             lambda: self.editBook(self.formatText(self.book_title_le_2.text()),
                                   self.formatText(
@@ -1403,10 +1829,12 @@ class MainApp(QMainWindow, main):
         self.search_category_btn.clicked.connect(
             lambda: self.searchCategory(self.formatText(self.add_category_le.text())))
         self.category_lw.itemClicked.connect(self.categorySelected)
-        self.client_record_tv.selectionModel().selectionChanged.connect(self.bookSelected)
-        ############Books Tab connections END#############
+        # the category entry has its own shadow
+        self.category_combo_box.lineEdit().setGraphicsEffect(None)
 
-        ############Issue Books Tab connections START#############
+    def handleIssueBookTab(self):
+        """Connects the issue book tab buttons to functions once the tab is built
+        """
         self.book_title_le_3.editingFinished.connect(self.predictCategory)
         self.lend_book_btn.clicked.connect(
             lambda: self.lendBook(self.formatText(self.book_title_le_3.text()),
@@ -1420,27 +1848,33 @@ class MainApp(QMainWindow, main):
                                           self.house_combo_box_2.currentText()))
         self.retrieve_book_btn.clicked.connect(
             lambda: self.retrieveBook(self.book_title_category_label.text(), self.quantity_spin_box_4.value()))
-        ############Issue Books Tab connections END#############
-
-        ############Users Tab connections START#############
-        self.password_le_2.textChanged.connect(self.confirmPassword)
-        self.password_le.textChanged.connect(self.confirmPassword)
-        self.username_le.textChanged.connect(self.usernameConfirm)
-        self.create_user_btn.clicked.connect(self.createUser)
-        self.delete_user_btn.clicked.connect(self.deleteUser)
-        self.users_tv.selectionModel().selectionChanged.connect(self.userSelected)
         self.clear_btn.clicked.connect(
             lambda: self.clear_client_entry(
                 self.fname_le_2, self.lname_le_2, self.class_combo_box_2, self.house_combo_box_2)
         )
-        self.load_permissions_btn.clicked.connect(self.loadUserPermissions)
-        self.give_permissions_btn.clicked.connect(self.giveUserPermissions)
-        self.username_le_2.textChanged.connect(self.enablePermissionSearch)
-        self.show_password_cb.stateChanged.connect(
-            lambda: self.showPassword(self.password_le, self.password_le_2, self.show_password_cb.checkState()))
-        ############Users Tab connections END#############
 
-        ############Settings Tab connections START#############
+    def handleHistoryTab(self):
+        """Connects the history tab buttons to functions once the tab is built
+        """
+        self.export_btn.clicked.connect(self.exportTransactions)
+        self.filter_days_cb.toggled.connect(self.filter_from_de.setEnabled)
+        self.filter_days_cb.toggled.connect(self.filter_to_de.setEnabled)
+        self.filter_btn.clicked.connect(self.filterTransactions)
+        self.filter_clear_btn.clicked.connect(self.clearTransactionsFilters)
+        for filter_le in (self.filter_book_le, self.filter_category_le, self.filter_client_le):
+            filter_le.returnPressed.connect(self.filterTransactions)
+        self.history_archived_cb.toggled.connect(self.showArchivedHistory)
+        self.history_days_cb.toggled.connect(self.history_from_de.setEnabled)
+        self.history_days_cb.toggled.connect(self.history_to_de.setEnabled)
+        self.history_filter_btn.clicked.connect(self.filterHistory)
+        self.history_clear_btn.clicked.connect(self.clearHistoryFilters)
+
+    def handleSettingsTab(self):
+        """Connects the settings tab buttons to functions once the tab is built
+        """
+        self.change_username_le.setPlaceholderText(self.username)
+        self.connection_profile_val.setText(connection_profile.describe(database))
+
         # user connections
         self.change_username_le.textChanged.connect(
             self.confirmUsernameChange)
@@ -1462,13 +1896,50 @@ class MainApp(QMainWindow, main):
         self.add_house_btn.clicked.connect(self.addHouse)
         self.delete_house_btn.clicked.connect(self.deleteHouse)
         self.change_house_name_btn.clicked.connect(self.changeHouseName)
-        ############Settings Tab connections END#############
+
+        # student connections
+        self.import_roster_btn.clicked.connect(self.importRoster)
+
+    def handleUsersTab(self):
+        """Connects the users tab buttons to functions once the tab is built
+        """
+        # Permissions Group Box connections
+        self.b_group = QButtonGroup()
+        self.b_group.addButton(self.checkBox_21)
+        self.b_group.addButton(self.checkBox_22)
+        self.b_group.addButton(self.checkBox)
+        self.b_group.buttonClicked.connect(self.checkPermissions)
+
+        self.password_le_2.textChanged.connect(self.confirmPassword)
+        self.password_le.textChanged.connect(self.confirmPassword)
+        self.username_le.textChanged.connect(self.usernameConfirm)
+        self.create_user_btn.clicked.connect(self.createUser)
+        self.delete_user_btn.clicked.connect(self.deleteUser)
+        self.load_permissions_btn.clicked.connect(self.loadUserPermissions)
+        self.give_permissions_btn.clicked.connect(self.giveUserPermissions)
+        self.username_le_2.textChanged.connect(self.enablePermissionSearch)
+        self.show_password_cb.stateChanged.connect(
+            lambda: self.showPassword(self.password_le, self.password_le_2, self.show_password_cb.checkState()))
 
     def showAbout(self):
-        QMessageBox.about(self, 'About', '''<p style='color:#13589e; font-size: 14px; font-weight: bold'>HILLCREST LIBRARY MANAGEMENT SYSTEM</p>
+        statement_stats = statements.stats()
+        pool_stats = connection_pool.stats()
+        tab_loads = ', '.join(f"{tab.replace('_', ' ')} {seconds * 1000:.0f} ms"
+                              for tab, seconds in self.tab_load_seconds.items())
+        QMessageBox.about(self, 'About', f'''<p style='color:#13589e; font-size: 14px; font-weight: bold'>HILLCREST LIBRARY MANAGEMENT SYSTEM</p>
                                             <p>By:\t <a style='text-decoration: none;'href='https://github.com/Porcupine1'>Thomas Ngulube</a></p>
                                             <p>Project GitHub repo: <a style='text-decoration: none;'href='https://github.com/Porcupine1/School_Library_System'> Source Code</a> version 1.0</p>
-                                            <p>Blog: <a style='text-decoration: none;'href='https://thomasngulube.wordpress.com'>thomasngulube.wordpress.com</a></p>''')
+                                            <p>Blog: <a style='text-decoration: none;'href='https://thomasngulube.wordpress.com'>thomasngulube.wordpress.com</a></p>
+                                            <p style='color:grey'>Prepared statements: {statement_stats['prepared']}, cache hits: {statement_stats['hits']}, misses: {statement_stats['misses']}</p>
+                                            <p style='color:grey'>Connection pool: {pool_stats['open']}/{pool_stats['max']} open, {pool_stats['in_use']} in use, {pool_stats['waits']} waits, {pool_stats['retired']} retired</p>
+                                            <p style='color:grey'>First opening of the tabs: {tab_loads}</p>''')
+
+    def showBusy(self, busy: bool):
+        """Shows a busy cursor while the database worker is running slow reads"""
+        if busy:
+            QApplication.setOverrideCursor(Qt.BusyCursor)
+        else:
+            QApplication.restoreOverrideCursor()
 
     def handleLogout(self):
         """closes main window and then shows login window
@@ -1481,8 +1952,10 @@ class MainApp(QMainWindow, main):
         """Closes main window and records log out in history table
         """
 
-        query.exec_(
-            f"""INSERT INTO history(user_name, [action]) VALUES('{self.username}', 'LOGGED OUT')""")
+        self.logHistory('LOGGED OUT')
+        if self.export_task is not None:
+            self.export_task.cancel()
+            self.export_task.wait()
         event.accept()
 
     def checkPermissions(self, cb: QCheckBox):
@@ -1546,16 +2019,13 @@ class MainApp(QMainWindow, main):
         # show searched user's name
         self.permission_gb.setTitle(f"{self.searched_user}'s permissions")
 
-        query.exec_(
-            f"""SELECT * FROM user_permissions WHERE user_name='{self.searched_user}'""")
-
         index = 1  # does not start from zero because it is the user's user_name
-        while query.next():
+        for permission_row in statements.fetchAll('select_user_permissions', self.searched_user):
             while permissions.value():
                 # if searched user has permission
-                if query.value(index) == 2:
+                if permission_row[index] == 2:
                     permissions.value().setCheckState(0, Qt.Checked)
-                elif query.value(index) == 1:
+                elif permission_row[index] == 1:
                     permissions.value().setCheckState(0, Qt.PartiallyChecked)
                 # if searched user doesn't have permission
                 else:
@@ -1573,16 +2043,14 @@ class MainApp(QMainWindow, main):
 
         permissions = QTreeWidgetItemIterator(self.permissions_tree_widget)
         self.permission_gb.setTitle(f"User's Permissions")
-        query.prepare(
-            "INSERT INTO user_permissions VALUES(?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)")
-        query.addBindValue(self.searched_user)
+        permission_values = [self.searched_user]
 
         # bind all permission values
         while permissions.value():
-            query.addBindValue(permissions.value().checkState(0))
+            permission_values.append(int(permissions.value().checkState(0)))
             permissions += 1
 
-        query.exec_()  # commit query
+        statements.execute('insert_user_permissions', *permission_values)
 
         permissions_2 = QTreeWidgetItemIterator(self.permissions_tree_widget)
         # uncheck all permissions
@@ -1590,9 +2058,8 @@ class MainApp(QMainWindow, main):
             permissions_2.value().setCheckState(0, Qt.Unchecked)
             permissions_2 += 1
 
-        query.exec_(
-            f"""INSERT INTO history(user_name, [action], [table]) VALUES("{self.username}", "EDITED '{self.searched_user}' permissions.", "user_permissions")""")
-        self.history_table_model.submitAll()
+        self.logHistory('EDITED PERMISSIONS', 'user_permissions', user=self.searched_user)
+        self.prependNewHistory()
         self.searched_user = None
         self.give_permissions_btn.setEnabled(
             False)  # disabled give_permissions_btn
@@ -1634,6 +2101,7 @@ class MainApp(QMainWindow, main):
         self.users_table_model.select()
         self.users_tv.hideColumn(0)
         self.users_tv.hideColumn(3)
+        self.users_tv.selectionModel().selectionChanged.connect(self.userSelected)
 
     def createUser(self):
         """Creates user, give them permissions and records the action in the history table
@@ -1643,24 +2111,17 @@ class MainApp(QMainWindow, main):
         username = self.username_le.text()
         password = self.password_le.text()
 
-        hashed_user_password = str(hashPassword(password))
-        query.prepare(
-            'INSERT INTO users(user_name, name, user_password) VALUES(?, ?, ?)')
-        query.addBindValue(username)
-        query.addBindValue(name)
-        query.addBindValue(hashed_user_password)
-        query.exec_()
+        hashed_user_password = hashPassword(password, password_settings)
+        statements.execute('insert_user', username, name, hashed_user_password)
         self.users_table_model.submitAll()
-        query.exec_(
-            f"""INSERT INTO history(user_name, [action], [table]) VALUES("{self.username}", "ADDED '{name}, {username}'", "users")""")
-        self.history_table_model.submitAll()
-        query.exec_(
-            f"INSERT INTO user_permissions VALUES('{username}',2,1,2,0,0,2,2,2,2,2,1,0,2,1,2,0,0,2,0,0,0,0,0,0)")
-        query.exec_(
-            f"""INSERT INTO history(user_name, [action], [table]) VALUES("{self.username}", "GAVE '{username} Standard permissions'", "user_permissions")""")
+        self.logHistory('ADDED', 'users', name=name, user=username)
+        self.prependNewHistory()
+        statements.execute('insert_standard_permissions', username)
+        self.logHistory('GAVE PERMISSIONS', 'user_permissions', user=username, permissions='Standard')
         QMessageBox.information(self, 'Successful', "<p style='color:#2020e6; font-size: 13px;'>User created.</p>")
-        self.history_table_model.submitAll()
+        self.prependNewHistory()
         self.usernames.append(username)
+        self.updateLibrarianFilter()
         self.increase_dash_val(self.users_val, 1)
         self.fname_le_3.clear()
         self.lname_le_3.clear()
@@ -1692,16 +2153,14 @@ class MainApp(QMainWindow, main):
                                     <p>This cannot be undone.</p>""", QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes)
 
         if response == QMessageBox.Yes:
-            query.exec_(
-                f"DELETE FROM user_permissions WHERE user_name='{username}'")
-            query.exec_(
-                f"""INSERT INTO history(user_name, [action], [table]) VALUES("{self.username}", "REMOVED '{username} permissions'", "user_permissions")""")
-            query.exec_(f"DELETE FROM users WHERE user_name='{username}'")
+            statements.execute('delete_user_permissions', username)
+            self.logHistory('REMOVED PERMISSIONS', 'user_permissions', user=username)
+            statements.execute('delete_user', username)
             self.users_table_model.submitAll()
-            query.exec_(
-                f"""INSERT INTO history(user_name, [action], [table]) VALUES("{self.username}", "DELETED '{username}'", "users")""")
-            self.history_table_model.submitAll()
+            self.logHistory('DELETED', 'users', user=username)
+            self.prependNewHistory()
             self.usernames.remove(username)
+            self.updateLibrarianFilter()
             self.decrease_dash_val(self.users_val, 1)
             self.username_label.clear()
             self.delete_user_btn.setEnabled(False)
@@ -1806,43 +2265,49 @@ class MainApp(QMainWindow, main):
     def open_dashboard_tab(self):
         # set dashboard tab current tab
         self.styleCurrentTabBtn(self.current_tab_btn, self.dashboard_btn)
-        self.main_tab_widget.setCurrentIndex(0)
+        self.main_tab_widget.setCurrentWidget(self.dashboard_tab)
         self.current_tab_btn = self.dashboard_btn
 
     def open_books_tab(self):
         # set books tab current tab
+        self.loadTab('books')
         self.styleCurrentTabBtn(self.current_tab_btn, self.books_btn)
-        self.main_tab_widget.setCurrentIndex(1)
+        self.main_tab_widget.setCurrentWidget(self.books_tab)
         self.current_tab_btn = self.books_btn
 
     def open_issue_book_tab(self):
         # set issue book tab current tab
+        self.loadTab('issue_book')
         self.styleCurrentTabBtn(self.current_tab_btn, self.issue_book_btn)
-        self.main_tab_widget.setCurrentIndex(2)
+        self.main_tab_widget.setCurrentWidget(self.issue_book_tab)
         self.current_tab_btn = self.issue_book_btn
 
     def open_report_tab(self):
         # set report tab current tab
+        self.loadTab('report')
         self.styleCurrentTabBtn(self.current_tab_btn, self.report_btn)
-        self.main_tab_widget.setCurrentIndex(3)
+        self.main_tab_widget.setCurrentWidget(self.report_tab)
         self.current_tab_btn = self.report_btn
 
     def open_history_tab(self):
         # set history tab current tab
+        self.loadTab('history')
         self.styleCurrentTabBtn(self.current_tab_btn, self.history_btn)
-        self.main_tab_widget.setCurrentIndex(4)
+        self.main_tab_widget.setCurrentWidget(self.history_tab)
         self.current_tab_btn = self.history_btn
 
     def open_settings_tab(self):
         # set settings tab current tab
+        self.loadTab('settings')
         self.styleCurrentTabBtn(self.current_tab_btn, self.settings_btn)
-        self.main_tab_widget.setCurrentIndex(5)
+        self.main_tab_widget.setCurrentWidget(self.settings_tab)
         self.current_tab_btn = self.settings_btn
 
     def open_users_tab(self):
         # set users tab current tab
+        self.loadTab('users')
         self.styleCurrentTabBtn(self.current_tab_btn, self.users_btn)
-        self.main_tab_widget.setCurrentIndex(6)
+        self.main_tab_widget.setCurrentWidget(self.users_tab)
         self.current_tab_btn = self.users_btn
 
     def showBookSearchResults(self, data: list):
@@ -1879,12 +2344,13 @@ class MainApp(QMainWindow, main):
         label.clear()
         self.changeProperty(label, 'class', None)
 
-    def searchBook(self, book_title: str, category=None):
+    def searchBook(self, book_title: str, category=None, ranked=False):
         """
         Checks if no book title input is given. If yes an error message is displayed.
         Else, it checks for book title in inputted category and returns (True, book_id) if yes.
         Else, it checks if it is at all in any category (in the database) if yes, returns
         ('Try different category', None) (letting the user know that it appeared in another category).
+        Else, if ranked, shows the best full-text match of the title and returns ('Try different title', None).
         Else, returns (False, None) (it is not in the database)
         """
         if book_title == "":
@@ -1892,29 +2358,30 @@ class MainApp(QMainWindow, main):
                 self, 'Invalid Entry', "<p style='color:#842029; font-size: 13px;'>Book title is required!</p>", QMessageBox.Ok, QMessageBox.Ok)
             return (False, None)
         else:
-            query.exec_(
-                f"SELECT * FROM books WHERE book_title = '{book_title}' AND category = '{category}'")
+            row = statements.fetchOne('select_book', book_title, category)
 
             timer = QTimer(self)
             timer.timeout.connect(lambda: self.vanishResponse(self.edit_info_label))
             timer.setSingleShot(True)
 
             data = []
-            if query.next():
-                row = [query.value(0), query.value(
-                    1), query.value(2), query.value(3)]
+            if row:
                 data.append(row)
                 self.showBookSearchResults(data)
                 return (True, row[0])
 
             # if book is not in inputted category, check if it is at all in the database
             else:
-                query.exec_(
-                    f"SELECT * FROM books WHERE book_title = '{book_title}'")
-                while query.next():
-                    row = [query.value(0), query.value(
-                        1), query.value(2), query.value(3)]
-                    data.append(tuple(row))
+                data = statements.fetchAll('select_books_by_title', book_title)
+
+                # if the title isn't exact, show the categories of the best ranked match instead
+                fts_query = ftsQuery(book_title)
+                if not data and ranked and fts_query:
+                    matches = statements.fetchAll('search_books', fts_query, 1)
+                    if matches:
+                        self.showBookSearchResults(statements.fetchAll('select_books_by_title', matches[0][1]))
+                        self.edit_info_label.setText(f'"{book_title}" not found, closest match: "{matches[0][1]}".')
+                        return ('Try different title', None)
 
                 # if book is not in database, let the user know (returns false)
                 if not data:
@@ -1952,14 +2419,13 @@ class MainApp(QMainWindow, main):
         # if all input fields are filled
         else:
             result = self.addCategory(category, None)
-            query.exec_(
-                f"INSERT INTO books(book_title, category, quantity) VALUES('{book_title}', '{category}', {quantity})")
+            insert_book_query = statements.execute('insert_book', book_title, category, quantity)
 
-            self.book_table_model.submitAll()
-            self.booksTableSort()
+            if not insert_book_query.lastError().isValid():
+                self.refreshBookRows(insert_book_query.lastInsertId())
 
             # if book already exists
-            if query.lastError().isValid():
+            if insert_book_query.lastError().isValid():
                 QMessageBox.warning(
                     self, 'Book exists',
                     f"<p style='color:#842029; font-size: 13px;'><span style='color:#13589e'>{book_title}</span> already exists in <span style='color:#13589e'>{category}</span> category.</p>",
@@ -1967,9 +2433,9 @@ class MainApp(QMainWindow, main):
 
             # if book doesn't exist
             else:
-                query.exec_(
-                    f"""INSERT INTO history(user_name, [action], [table]) VALUES("{self.username}", "ADDED '{book_title}, {category}, {quantity}'", "books")""")
-                self.history_table_model.submitAll()
+                self.logHistory('ADDED', 'books', title=book_title, category=category, quantity=quantity)
+                self.prependNewHistory()
+                self.book_title_model.add(book_title)  # update book title completer data
 
                 # if category didn't exists(now it does)
                 if result != 'exists':
@@ -1985,10 +2451,44 @@ class MainApp(QMainWindow, main):
                         QMessageBox.Ok, QMessageBox.Ok)
             self.clear_book_entry(
                 self.book_title_le, self.category_combo_box, self.quantity_spin_box)
-            # updates book title completer
-            # update book title completer data
-            self.book_title_model.setQuery(
-                "SELECT DISTINCT book_title FROM books")
+
+    def importBooks(self):
+        """Imports books from a title,category,quantity CSV file chosen by the user.
+        Quantities of books already in the library are added to, the books views are refreshed once at the end.
+        """
+        csv_path, _ = QFileDialog.getOpenFileName(self, 'Import Books', base_dir, 'CSV files (*.csv);;All files (*)')
+        if not csv_path:
+            return
+
+        QApplication.setOverrideCursor(Qt.BusyCursor)
+        try:
+            result = importBooks(statements, csv_path)
+        except (OSError, UnicodeDecodeError, StatementError) as error:
+            result = None
+            QApplication.restoreOverrideCursor()
+            QMessageBox.critical(
+                self, 'Error', f"""<p style='color:crimson; font-size: 13px;'>Failed to import books.</p>
+                                    <p>{error}</p>
+                                    <p>Chunks imported before the error were kept.</p>""")
+        else:
+            QApplication.restoreOverrideCursor()
+            self.logHistory('IMPORTED', 'books', added=result.added, restocked=result.updated,
+                            file=os.path.basename(csv_path))
+
+        # refresh once, not per row
+        self.category_cb_model.submitAll()
+        self.booksTableSort()
+        self.book_title_model.load(statements.fetchAll('select_book_title_counts'))
+        self.prependNewHistory()
+
+        if result is not None:
+            skipped = ''.join(f"<br>line {line}: {reason}" for line, reason in result.skipped[:5])
+            if len(result.skipped) > 5:
+                skipped += f"<br>and {len(result.skipped) - 5} more."
+            QMessageBox.information(
+                self, 'Imported', f"""<p style='color:#2020e6; font-size: 13px;'>Imported {result.rows} rows in {result.seconds:.2f} s ({result.rows_per_second:.0f} rows/s).</p>
+                                    <p><span style='color:#13589e'>{result.added}</span> new books, <span style='color:#13589e'>{result.updated}</span> existing books restocked, <span style='color:#13589e'>{result.categories_added}</span> new categories.</p>
+                                    {f"<p>Skipped {len(result.skipped)} rows:{skipped}</p>" if result.skipped else ""}""")
 
     def deleteBook(self, book_title: str, category: str):
         """Deletes book from database if no client is owing any quantity/number of the book
@@ -2005,21 +2505,14 @@ class MainApp(QMainWindow, main):
         # if book is found
         if found is True:
             # check if client/s has/have not returned it
-            query.exec_(
-                f"SELECT client_id FROM client_records WHERE book_id={book_id} AND returned=0")
-            client_ids = []
-            while query.next():
-                client_ids.append(query.value(0))
+            client_ids = statements.fetchColumn('select_book_borrower_ids', book_id)
            
             # if has not been returned by one or more clients
             if client_ids:
                 data = []
                 for client_id in client_ids:
-                    query.exec_(
-                        f"SELECT client_first_name, client_last_name, client_class, client_house FROM clients WHERE client_id={client_id}")
-                    while query.next():
-                        data.append((query.value(0) + ' ' + query.value(1) +
-                                    ' ' + query.value(2) + ' ' + query.value(3)))
+                    for client in statements.fetchAll('select_client', client_id):
+                        data.append(' '.join(client))
                     num_left = len(data) - 2
                 if num_left > 0:
                     # only display two clients of many that haven't returned the book
@@ -2056,26 +2549,21 @@ class MainApp(QMainWindow, main):
 
                 # if user is sure to delete book
                 if response == QMessageBox.Yes:
-                    query.exec_(
-                        f"""DELETE FROM books WHERE book_title='{book_title}' AND category='{category}'""")
+                    deleted = statements.execute('delete_book', book_title, category).numRowsAffected()
                    
                     self.edit_info_label.setText(
                         f'"{book_title}" deleted from "{category}" category.')
                     self.changeProperty(self.edit_info_label,
                                         "class", "alert alert-success")
                     timer.start(5000)
-                    query.exec_(
-                        f"""INSERT INTO history(user_name, [action], [table]) VALUES("{self.username}", "DELETED '{book_title}, {category}'", "books")""")
-                    self.history_table_model.submitAll()
+                    self.logHistory('DELETED', 'books', title=book_title, category=category)
+                    self.prependNewHistory()
                     self.clear_book_entry(
                         self.book_title_le_2, self.category_combo_box_2, self.quantity_spin_box_2)
                     self.edit_book_data = []  # reset self.edit_book_data
                     self.updateCategoryList([(None, book_title, None, None)])
-                    self.book_table_model.submitAll()  # update all books table
-                    self.booksTableSort()  # sort the all books table
-                    # update book title completer data
-                    self.book_title_model.setQuery(
-                        "SELECT DISTINCT book_title FROM books")
+                    self.refreshBookRows(book_id)  # update all books table
+                    self.book_title_model.remove(book_title, deleted)  # update book title completer data
         elif found == 'Try different category':
             QMessageBox.warning(
                 self, 'Book Not found',
@@ -2091,14 +2579,13 @@ class MainApp(QMainWindow, main):
         def completeBookEdit(book_title: str, category: str, quantity: int):
             """Completes edit book function
             """
-            query.exec_(
-                f"UPDATE books SET book_title='{book_title}', category='{category}', quantity={quantity} WHERE book_id={int(self.edit_book_data[0][0])}")
-            self.book_table_model.submitAll()
-            self.booksTableSort()
-            query.exec_(
-                f"""INSERT INTO history(user_name, [action], [table]) 
-                VALUES("{self.username}", "EDITED FROM '{self.edit_book_data[0][1]}, {self.edit_book_data[0][2]}, {self.edit_book_data[0][3]}' TO '{book_title}, {category}, {quantity}'", "books")""")
-            self.history_table_model.submitAll()
+            if not statements.execute('update_book', book_title, category, quantity,
+                                      int(self.edit_book_data[0][0])).lastError().isValid():
+                self.book_title_model.rename(self.edit_book_data[0][1], book_title)
+            self.refreshBookRows(int(self.edit_book_data[0][0]))
+            self.logHistory('EDITED', 'books', before=list(self.edit_book_data[0][1:4]),
+                            after=[book_title, category, quantity])
+            self.prependNewHistory()
             QMessageBox.information(
                 self, 'Changes Successful', "<p style='color:#2020e6; font-size: 13px;'>Book successfully edited!</p>", QMessageBox.Ok, QMessageBox.Ok)
 
@@ -2106,9 +2593,8 @@ class MainApp(QMainWindow, main):
             self.edit_book_data = []
             self.clear_book_entry(
                 self.book_title_le_2, self.category_combo_box_2, self.quantity_spin_box_2)
-            index = self.category_combo_box.findText("Unknown")
-            self.category_combo_box.setCurrentIndex(index)
-            self.category_combo_box_3.setCurrentIndex(index)
+            for category_cb in self.liveWidgets('category_combo_box', 'category_combo_box_3'):
+                category_cb.setCurrentIndex(category_cb.findText("Unknown"))
             self.edit_info_label.clear()
             self.changeProperty(self.edit_info_label, "class", None)
             self.edit_extra_label.clear()
@@ -2144,38 +2630,32 @@ class MainApp(QMainWindow, main):
             else:
                 completeBookEdit(book_title, category, quantity)
 
-    def addClient(self, fname: str, lname: str, class_: str, house: str):
-        """creates client if they don't already exist and returns the client's id
+    def addClient(self, fname: str, lname: str, class_: str, house: str) -> int:
+        """creates client if they don't already exist and returns the client's id.
+        Runs inside the caller's statements.transaction() block.
         """
+        # if client didn't already exist
+        if statements.executeOrRaise('insert_client', fname, lname, class_, house).numRowsAffected() == 1:
+            self.added_client_names.append((fname, lname))
+            statements.executeOrRaise('insert_history', *historyValues(
+                self.user_id, 'ADDED', 'clients', student=f'{fname} {lname}', class_name=class_, house=house))
 
-        # if client input fields  are empty
-        if fname == "" or lname == "" or class_ == "" or house == "":
-            QMessageBox.warning(
-                self, 'Invalid', "<p style='color:#842029; font-size: 13px;'>Fill out all entries.</p>", QMessageBox.Ok, QMessageBox.Ok)
+        return statements.fetchOne('select_client_id', fname, lname, class_, house)[0]
 
+    def updateClientNameCompleters(self, reload=False):
+        """Adds the names of the clients added since the last call to clients' first and last name completers.
+        reload reloads every name instead, e.g. after a roster import.
+        """
+        if self.first_name_model is None:
+            pass  # every name is read when the issue book tab is first opened
+        elif reload:
+            self.first_name_model.load(statements.fetchAll('select_client_first_name_counts'))
+            self.last_name_model.load(statements.fetchAll('select_client_last_name_counts'))
         else:
-            query.exec_(
-                f"""INSERT INTO clients(client_first_name, client_last_name, client_class, client_house) VALUES('{fname}', '{lname}', '{class_}', '{house}')""")
-
-            # if query is successful(client didn't already exist)
-            if query.lastError().isValid() is False:
-                query.exec_(
-                    f"""INSERT INTO history(user_name, [action], [table]) VALUES("{self.username}", "ADDED '{fname} {lname}, {class_}, {house}'", "clients")""")
-                self.history_table_model.submitAll()
-
-            query.exec_(
-                f"""SELECT client_id FROM clients WHERE client_first_name = '{fname}' AND client_last_name = '{lname}' AND client_class = '{class_}' AND client_house = '{house}'""")
-
-            # updates clients' first name completer
-            self.first_name_model.setQuery(
-                "SELECT DISTINCT client_first_name FROM clients")
-            # updates clients' last name completer
-            self.last_name_model.setQuery(
-                "SELECT DISTINCT client_last_name FROM clients")
-
-            while query.next():
-                client_id = query.value(0)
-                return client_id
+            for fname, lname in self.added_client_names:
+                self.first_name_model.add(fname)
+                self.last_name_model.add(lname)
+        self.added_client_names = []
 
     def retrieveBook(self, book: str, quantity: int):
         """Retrieves books from client
@@ -2197,58 +2677,39 @@ class MainApp(QMainWindow, main):
             book_title, category = book.split(' | ')
             book_title = book_title.strip('"')
             category = category.strip('"')
-            query.exec_(
-                f"""SELECT client_id FROM clients WHERE client_first_name='{fname}' AND client_last_name='{lname}' AND client_class='{class_}' AND client_house='{house}'""")
-
-            while query.next():
-                client_id = query.value(0)
-
-            query.exec_(
-                f"""SELECT book_id FROM books WHERE book_title='{book_title}' AND category='{category}'""")
-
-            while query.next():
-                book_id = query.value(0)
 
-            query.exec_(
-                f"""UPDATE client_records SET quantity=quantity-{quantity}, 
-                    returned=(case when quantity-{quantity}=0 then TRUE else FALSE END) 
-                    WHERE client_id={client_id} AND book_id={book_id}""")
-
-            # if transaction has already been made today, only insert given quantity
-            if self.today_transac_count > 0:
-                query.exec_(
-                    f"""INSERT INTO transactions(client_id, book_id, quantity, type, user_id)
-                    VALUES({client_id}, {book_id}, {quantity}, 'RETRIEVE', {self.user_id})""")
-                self.today_transac_count += 1  # increase today's transaction count
-
-            # If no transaction have been performed today, add an obligatory zero quantity transaction of the day
-            else:
-                query.exec_(
-                    f"""INSERT INTO transactions(client_id, book_id, quantity, type, user_id)
-                    VALUES({client_id}, {book_id}, {quantity}, 'RETRIEVE', {self.user_id})""")
-                query.exec_(
-                    f"""INSERT INTO transactions(type, user_id)
-                    VALUES('LEND', {self.user_id})""")  # Zero quantity transaction of day
-                self.today_transac_count += 1  # Increase transaction count, exclusive of zero quantity transaction of day
+            try:
+                # every write of the retrieval commits (or rolls back) together, with one fsync
+                with statements.transaction():
+                    client_id = statements.fetchOne('select_client_id', fname, lname, class_, house)[0]
+                    book_id = statements.fetchOne('select_book', book_title, category)[0]
+
+                    if statements.executeOrRaise('update_client_record_retrieve', quantity, quantity, client_id,
+                                                 book_id, quantity).numRowsAffected() != 1:
+                        raise StatementError(f"{fname} {lname} is not owing {quantity} of {book_title}.")
+                    statements.executeOrRaise('insert_transaction', client_id, book_id, quantity, 'RETRIEVE', self.user_id)
+                    statements.executeOrRaise('update_book_quantity', quantity, book_id)
+            except StatementError as error:
+                QMessageBox.critical(
+                    self, 'Error', f"""<p style='color:crimson; font-size: 13px;'>Failed to retrieve book.</p>
+                                        <p>{error}</p>""")
+                return
 
-            query.exec_(
-                f"""UPDATE books SET quantity=quantity+{quantity} WHERE book_id={book_id}""")
             QMessageBox.information(
                 self, 'Retrieved', "<p style='color:#2020e6; font-size: 13px;'>Book retrieved.</p>")
 
             self.increase_dash_val(self.retrieved_today_val, quantity)
             self.increase_dash_val(self.total_retrieved_val, quantity)
             self.decrease_dash_val(self.unretrieved_val, quantity)
-            self.book_table_model.submitAll()
-            self.booksTableSort()
-            self.clients_records_table_model.setQuery(
-                QSqlQuery('SELECT * FROM client_record_vw WHERE returned=0'))
-            self.setTransactionTableQuery()
+            self.refreshBookRows(book_id)
+            self.setAllClientRecordsTableQuery()
+            self.prependNewTransactions()
             self.book_title_category_label.clear()
             self.quantity_spin_box_4.setValue(0)
             self.setClientRecordTableQuery(fname, lname, class_, house)
             
-            self.updateGraph([[str(datetime.today().date())], [quantity]],self.r_series)  # update graph
+            if self.r_series is not None:
+                self.updateGraph([[str(datetime.today().date())], [quantity]],self.r_series)  # update graph
 
     def lendBook(self, book_title: str, category: str, quantity: int):
         """Lends book to client. If client doesn't exist, they are created. if client is already owing that book, it added to the owing quantity.if the client has borrowed the book before client's records is set to returned=0(False) and quantity is updated
@@ -2261,72 +2722,75 @@ class MainApp(QMainWindow, main):
         def completeLendBook(book_id: int, quantity: int):
             """Completes lend book function
             """
-            client_id = self.addClient(self.formatText(self.fname_le.text()), self.formatText(self.lname_le.text()),
-                                       self.class_combo_box.currentText(
-            ), self.house_combo_box.currentText())
-
-            # if clients now exists(didn't exists and now added), record transaction
-            if client_id:
-                query.exec_(
-                    f"""INSERT INTO client_records(client_id, book_id, quantity, returned) VALUES({client_id}, {book_id}, {quantity}, FALSE)""")
-
-                # if client has borrowed the same book before
-                if query.lastError().isValid():
-                    query.exec_(
-                        f"""UPDATE client_records SET quantity=quantity+{quantity}, returned=FALSE WHERE client_id={client_id} AND book_id={book_id}""")
-
-                # if transaction has already been made today, only insert given quantity
-                if self.today_transac_count > 0:
-                    query.exec_(
-                        f"""INSERT INTO transactions(client_id, book_id, quantity, type, user_id) 
-                        VALUES({client_id}, {book_id}, {quantity}, 'LEND', {self.user_id})""")
-                    self.today_transac_count += 1
+            fname = self.formatText(self.fname_le.text())
+            lname = self.formatText(self.lname_le.text())
+            class_ = self.class_combo_box.currentText()
+            house = self.house_combo_box.currentText()
 
-                else:
-                    # If no transaction have been performed today, add obligatory zero quantity transaction of day
-                    query.exec_(
-                        f"""INSERT INTO transactions(client_id, book_id, quantity, type, user_id) 
-                        VALUES({client_id}, {book_id}, {quantity}, 'LEND', {self.user_id})""")
-                    query.exec_(
-                        f"""INSERT INTO transactions(type, user_id) 
-                            VALUES('RETRIEVE', {self.user_id})""")  # Zero quantity transaction of day
-                    self.today_transac_count += 1  # Increase transaction count, exclusive of zero quantity transaction of day
-
-                query.exec_(
-                    f"""UPDATE books SET quantity=quantity-{quantity} WHERE book_id={book_id}""")
+            # if client input fields  are empty
+            if fname == "" or lname == "" or class_ == "" or house == "":
+                QMessageBox.warning(
+                    self, 'Invalid', "<p style='color:#842029; font-size: 13px;'>Fill out all entries.</p>", QMessageBox.Ok, QMessageBox.Ok)
+
+            else:
+                try:
+                    # every write of the checkout commits (or rolls back) together, with one fsync
+                    with statements.transaction():
+                        client_id = self.addClient(fname, lname, class_, house)
+                        # adds to the owing quantity if client has borrowed the same book before
+                        statements.executeOrRaise('upsert_client_record_lend', client_id, book_id, quantity)
+                        statements.executeOrRaise('insert_transaction', client_id, book_id, quantity, 'LEND', self.user_id)
+                        if statements.executeOrRaise('take_book_quantity', quantity, book_id, quantity).numRowsAffected() != 1:
+                            raise StatementError(f"Not enough copies of {book_title} left.")
+                except StatementError as error:
+                    self.added_client_names = []  # rolled back with the rest of the checkout
+                    QMessageBox.critical(
+                        self, 'Error', f"""<p style='color:crimson; font-size: 13px;'>Failed to lend book.</p>
+                                            <p>{error}</p>""")
+                    return
+
+                self.updateClientNameCompleters()
+                self.prependNewHistory()
                 QMessageBox.information(
                     self, 'Lent', "<p style='color:#2020e6; font-size: 13px;'>Book lent</p>")
                 self.increase_dash_val(self.lent_today_val, quantity)
                 self.increase_dash_val(self.total_lent_val, quantity)
                 self.increase_dash_val(self.unretrieved_val, quantity)
-                self.book_table_model.submitAll()
-                self.booksTableSort()
-                self.setTransactionTableQuery()
-                self.clients_records_table_model.setQuery(
-                    QSqlQuery('SELECT * FROM client_record_vw WHERE returned=0'))
+                self.refreshBookRows(book_id)
+                self.prependNewTransactions()
+                self.setAllClientRecordsTableQuery()
                 self.clear_book_entry(
                     self.book_title_le_3, self.category_combo_box_3, self.quantity_spin_box_3)
                 self.clear_client_entry(
                     self.fname_le, self.lname_le, self.class_combo_box, self.house_combo_box)
 
-                self.updateGraph([[str(datetime.today().date())], [quantity]],self.l_series)  # update graph
+                if self.l_series is not None:
+                    self.updateGraph([[str(datetime.today().date())], [quantity]],self.l_series)  # update graph
 
         if book_title == "":
             QMessageBox.warning(
                 self, 'Invalid Entry', "<p style='color:#842029; font-size: 13px;'>Book title is required!</p>", QMessageBox.Ok, QMessageBox.Ok)
         else:
-            query.exec_(
-                f"""SELECT * FROM books WHERE book_title='{book_title}' AND category='{category}'""")
+            book = statements.fetchOne('select_book', book_title, category)
             data = {}
-            while query.next():
-                data['book_id'] = int(query.value(0))
-                data['quantity'] = int(query.value(3))
+            if book:
+                data['book_id'] = int(book[0])
+                data['quantity'] = int(book[3])
             if not data:
-                QMessageBox.warning(
-                    self, 'Not Found',
-                    f"""<p style='color:#842029; font-size: 13px;'><span style='color:#13589e'>{book_title}</span> is not in <span style='color:#13589e'>{category}</span> category.</p>
-                        <p>Make sure you have spelled them correctly or search using the Edit/Delete tab.</p>""",
-                    QMessageBox.Ok, QMessageBox.Ok)
+                # offer the books with the most similar titles
+                suggestions = {f"{book[1]} | {book[2]}": book for book in similarBooks(statements, book_title, category)}
+                if suggestions:
+                    book = self.chooseSuggestion(f"{book_title} | {category}", suggestions)
+                    if book is not None:
+                        self.book_title_le_3.setText(book[1])
+                        self.predictCategory()
+                        self.category_combo_box_3.setCurrentIndex(self.category_combo_box_3.findText(book[2]))
+                else:
+                    QMessageBox.warning(
+                        self, 'Not Found',
+                        f"""<p style='color:#842029; font-size: 13px;'><span style='color:#13589e'>{book_title}</span> is not in <span style='color:#13589e'>{category}</span> category.</p>
+                            <p>Make sure you have spelled them correctly or search using the Edit/Delete tab.</p>""",
+                        QMessageBox.Ok, QMessageBox.Ok)
 
             elif data['quantity'] == 0:
                 QMessageBox.information(
@@ -2360,16 +2824,14 @@ class MainApp(QMainWindow, main):
         timer.setSingleShot(True)
 
         if category:
-            query.exec_(
-                f"INSERT INTO categories VALUES('{category}')")
+            insert_category_query = statements.execute('insert_category', category)
             self.category_cb_model.submitAll()
-            index = self.category_combo_box.findText('Unknown')
-            self.category_combo_box.setCurrentIndex(index)
-            self.category_combo_box_2.setCurrentIndex(index)
-            self.category_combo_box_3.setCurrentIndex(index)
+            # the issue book tab may not be built yet
+            for category_cb in self.liveWidgets('category_combo_box', 'category_combo_box_2', 'category_combo_box_3'):
+                category_cb.setCurrentIndex(category_cb.findText('Unknown'))
 
             # if category already exists
-            if query.lastError().isValid():
+            if insert_category_query.lastError().isValid():
                 if label is not None:
                     label.setText(
                         f'"{category}" category already exists in library.')
@@ -2378,9 +2840,8 @@ class MainApp(QMainWindow, main):
                 return 'exists'
 
             else:
-                query.exec_(
-                    f"""INSERT INTO history(user_name, [action], [table]) VALUES("{self.username}", "ADDED '{category}'", "categories")""")
-                self.history_table_model.submitAll()
+                self.logHistory('ADDED', 'categories', category=category)
+                self.prependNewHistory()
 
             if label is not None:
                 label.setText(
@@ -2394,7 +2855,6 @@ class MainApp(QMainWindow, main):
                 label.setText("NO INPUT GIVEN!")
                 self.changeProperty(label, "class", "alert alert-danger")
                 timer.start(5000)
-        query.clear()
 
     def searchCategory(self, category: str) -> None:
         """
@@ -2405,12 +2865,7 @@ class MainApp(QMainWindow, main):
         timer.timeout.connect(lambda: self.vanishResponse(self.category_info_label))
         timer.setSingleShot(True)
         if category:
-            query.exec_(
-                f"SELECT * FROM categories WHERE category = '{category}'")
-
-            data = []
-            while query.next():
-                data.append(query.value(0))
+            data = statements.fetchColumn('select_category', category)
 
             # if category does not exist
             if not data:
@@ -2435,6 +2890,18 @@ class MainApp(QMainWindow, main):
             timer.start(5000)
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--profile', choices=PROFILES,
+                        help='SQLite connection profile, overrides the one in library.ini')
+    args, qt_args = parser.parse_known_args()
+    try:
+        connection_profile = loadProfile(os.path.join(base_dir, 'library.ini'), args.profile)
+        pool_settings = loadPoolSettings(os.path.join(base_dir, 'library.ini'))
+        password_settings = loadHashSettings(os.path.join(base_dir, 'library.ini'))
+    except ValueError as error:
+        print(error)
+        sys.exit(1)
+
     database = QSqlDatabase.addDatabase("QSQLITE")
     """For packaged windows app. This creates the database in 'C:/Users/[USERNAME]/AppData/Local/thomasngulube' to
     prevent it from being read-only if it were stored in the installation folder
@@ -2450,9 +2917,11 @@ if __name__ == '__main__':
     if not database.open():
         print("Unable to open data source file.")
         sys.exit(1)
+    connection_profile.apply(database)
     query = QSqlQuery(database)
     query.setForwardOnly(True)
-    app = QApplication(sys.argv)
+    statements = StatementRegistry(database, prepared_statements)
+    app = QApplication(sys.argv[:1] + qt_args)
     screen_width = QDesktopWidget().screenGeometry().width()
     screen_height = QDesktopWidget().screenGeometry().height()
     main_style = open(os.path.join(base_dir, 'themes/main.css'), 'r')
@@ -2461,6 +2930,15 @@ if __name__ == '__main__':
     login_style = login_style.read()
     app.setStyleSheet(main_style + login_style)
     app.setWindowIcon(QIcon(os.path.join(base_dir, "icons/app_icon.png")))
+    connection_pool = ConnectionPool(database, connection_profile, **pool_settings)
+    db_worker = DatabaseWorker(connection_pool, prepared_statements)
+    app.aboutToQuit.connect(db_worker.stop)
+    app.aboutToQuit.connect(connection_pool.closeAll)
+    # closes the connections of threads that have ended and the worker's once idle
+    pool_timer = QTimer()
+    pool_timer.timeout.connect(connection_pool.retireIdle)
+    pool_timer.timeout.connect(db_worker.retireIdle)
+    pool_timer.start(int(connection_pool.idle_timeout * 1000))
     login_window = LoginWindow()
     login_window.show()
     sys.exit(app.exec_())
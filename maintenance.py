@@ -0,0 +1,323 @@
+"""One-shot maintenance commands for an existing Library.db.
+
+Run from a terminal while the library app is closed, e.g:
+
+    python maintenance.py rebuild
+    python maintenance.py rebuild --database path/to/Library.db
+    python maintenance.py compact
+    python maintenance.py import-books catalogue.csv
+    python maintenance.py import-roster pupils.csv
+    python maintenance.py import-users staff.csv
+    python maintenance.py archive --keep-days 365
+    python maintenance.py explain
+"""
+import argparse
+import os
+import sys
+
+from PyQt5.QtCore import QCoreApplication
+from PyQt5.QtSql import QSqlDatabase, QSqlQuery
+
+from archive import ArchiveError, archiveBefore, loadArchivedTransactionDaily, loadCutoff
+from history import migrateHistory
+from importer import USER_ROLES, importBooks, importRoster, importUsers
+from passwords import loadHashSettings, migratePasswords
+from queries import *
+from statements import StatementError, StatementRegistry
+
+
+base_dir = os.path.dirname(__file__)
+
+
+def runInTransaction(query: QSqlQuery, statements) -> bool:
+    """Runs statements as a single unit of work.
+
+    Rolls back and returns False as soon as one of them fails.
+    """
+    query.exec_("BEGIN IMMEDIATE")
+    for statement in statements:
+        if not query.exec_(statement):
+            print(query.lastError().text())
+            query.exec_("ROLLBACK")
+            return False
+    return query.exec_("COMMIT")
+
+
+def loadArchivedTotals(query: QSqlQuery, database_path: str) -> bool:
+    """Reads the daily totals of the archived transactions for the rebuilds, see
+    archive.loadArchivedTransactionDaily. Returns False if an archive file can't be read.
+    """
+    try:
+        loadArchivedTransactionDaily(query, database_path)
+    except ArchiveError as error:
+        print(f"Can't read the archived transactions: {error}")
+        return False
+    return True
+
+
+def createDashboardCounters(query: QSqlQuery):
+    """Creates the dashboard_counters table and the triggers keeping it current, if missing."""
+    query.exec_(create_dashboard_counters_table_query)
+    query.exec_(create_transactions_counters_trigger_query)
+    query.exec_(create_users_insert_counters_trigger_query)
+    query.exec_(create_users_delete_counters_trigger_query)
+
+
+def createTransactionDaily(query: QSqlQuery):
+    """Creates the transaction_daily rollup and the trigger keeping it current, if missing."""
+    query.exec_(create_transaction_daily_table_query)
+    query.exec_(create_transactions_daily_trigger_query)
+
+
+def rebuildDashboardCounters(query: QSqlQuery, database_path: str) -> bool:
+    """Recounts the dashboard_counters table from the live and archived transactions and users.
+
+    The triggers keep the counters current from then on.
+    """
+    createDashboardCounters(query)
+    return loadArchivedTotals(query, database_path) and runInTransaction(query, rebuild_dashboard_counters_queries)
+
+
+def rebuildTransactionDaily(query: QSqlQuery, database_path: str) -> bool:
+    """Re-adds the transaction_daily rollup from the live and archived transactions.
+
+    The transactions_daily_trg trigger keeps it current from then on.
+    """
+    createTransactionDaily(query)
+    return loadArchivedTotals(query, database_path) and runInTransaction(query, rebuild_transaction_daily_queries)
+
+
+def rebuildBooksFts(query: QSqlQuery) -> bool:
+    """Re-indexes every book title and category in books_fts.
+
+    The books_fts triggers keep it current from then on.
+    """
+    query.exec_(create_books_fts_table_query)
+    return runInTransaction(query, (rebuild_books_fts_query,))
+
+
+def rebuildTrigramIndexes(query: QSqlQuery) -> bool:
+    """Re-indexes the book titles and client names of the "did you mean" lookups.
+
+    The books_trigram and clients_trigram triggers keep them current from then on.
+    """
+    query.exec_(create_books_trigram_table_query)
+    query.exec_(create_clients_trigram_table_query)
+    return runInTransaction(query, rebuild_trigram_queries)
+
+
+def rebuildDerivedTables(query: QSqlQuery, database_path: str) -> bool:
+    """Rebuilds every table derived from transactions, users, books and clients."""
+    return (rebuildDashboardCounters(query, database_path) and rebuildTransactionDaily(query, database_path)
+            and rebuildBooksFts(query) and rebuildTrigramIndexes(query))
+
+
+def explainFilters(query: QSqlQuery, filter_indexes: dict, page_keysets: dict, page_name) -> bool:
+    """Checks with EXPLAIN QUERY PLAN that every page statement of page_keysets restricted by each
+    filter of filter_indexes, named by page_name(statement, filters), reads its rows through the filter's index.
+    """
+    all_used = True
+    for name, index in filter_indexes.items():
+        for statement in page_keysets:
+            statement = page_name(statement, (name,))
+            query.prepare("EXPLAIN QUERY PLAN " + prepared_statements[statement])
+            for _ in range(prepared_statements[statement].count('?')):
+                query.addBindValue(None)  # the plan doesn't depend on the values
+            if not query.exec_():
+                print(f"FAIL {statement}: {query.lastError().text()}")
+                all_used = False
+                continue
+            plan = []
+            while query.next():
+                plan.append(query.value(3))
+            used = any(f" INDEX {index} " in f"{detail} " for detail in plan)
+            all_used = all_used and used
+            print(f"{'ok' if used else 'FAIL':4} {statement} uses {index}")
+            if not used:
+                print('\n'.join('     ' + detail for detail in plan))
+    return all_used
+
+
+def explainTransactionsFilters(query: QSqlQuery) -> bool:
+    """Creates the transactions history indexes if missing and checks that its filters use them."""
+    for statement in (create_transactions_datetime_index_query,) + create_transactions_filter_index_queries:
+        query.exec_(statement)
+    return explainFilters(query, transactions_filter_indexes, transactions_page_keysets, transactionsPageName)
+
+
+def explainHistoryFilters(query: QSqlQuery) -> bool:
+    """Converts a free text history, creates the users' history indexes if missing and checks that its
+    filters use them.
+    """
+    if not migrateHistory(query):
+        return False
+    for statement in create_history_index_queries:
+        query.exec_(statement)
+    return explainFilters(query, history_filter_indexes, history_page_keysets, historyPageName)
+
+
+def compactDatabase(query: QSqlQuery, path: str) -> bool:
+    """Deletes the zero quantity filler transactions older versions inserted once a day,
+    rebuilds the derived tables without them and vacuums the database file.
+    """
+    size_before = os.path.getsize(path)
+    # a database the app hasn't opened since upgrading has neither yet
+    createDashboardCounters(query)
+    createTransactionDaily(query)
+    query.exec_(count_filler_transactions_query)
+    deleted = query.value(0) if query.next() else 0
+
+    # the derived tables are rebuilt in the same transaction as the delete
+    if not loadArchivedTotals(query, path) or not runInTransaction(query, (delete_filler_transactions_query,)
+                            + rebuild_dashboard_counters_queries + rebuild_transaction_daily_queries):
+        return False
+    query.exec_("VACUUM")
+    size_after = os.path.getsize(path)
+
+    print(f"Deleted {deleted} filler transactions.")
+    print(f"Freed {(size_before - size_after) / 1024:.1f} KiB ({size_before} -> {size_after} bytes).")
+    return True
+
+
+def openDatabase(path: str) -> QSqlDatabase:
+    """Opens the library database at path, exits if it can't be opened."""
+    if not os.path.isfile(path):
+        print(f"{path} does not exist.")
+        sys.exit(1)
+
+    database = QSqlDatabase.addDatabase("QSQLITE")
+    database.setDatabaseName(path)
+    if not database.open():
+        print("Unable to open data source file.")
+        sys.exit(1)
+    return database
+
+
+def main(argv=None) -> int:
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--database', default=os.path.join(base_dir, 'Library.db'),
+                        help='library database file (default: Library.db next to this script)')
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('rebuild', parents=[common],
+                        help='rebuild the dashboard counters, daily transaction rollup and search indexes')
+    commands.add_parser('compact', parents=[common],
+                        help='delete the zero quantity filler transactions and vacuum the database')
+    import_books = commands.add_parser('import-books', parents=[common],
+                                       help='add or restock books from a title,category,quantity CSV file')
+    import_books.add_argument('csv', help='CSV file to import')
+    import_books.add_argument('--chunk-size', type=int, default=1000,
+                              help='rows written per transaction (default: 1000)')
+    import_roster = commands.add_parser('import-roster', parents=[common],
+                                        help='register pupils from a first name,last name,class,house CSV file')
+    import_roster.add_argument('csv', help='CSV file to import')
+    import_roster.add_argument('--chunk-size', type=int, default=500,
+                               help='rows written per transaction (default: 500)')
+    import_users = commands.add_parser('import-users', parents=[common],
+                                       help='create the accounts of a name,username,password,role CSV file, '
+                                            f"role being {' or '.join(USER_ROLES)}")
+    import_users.add_argument('csv', help='CSV file to import')
+    import_users.add_argument('--user', default='admin',
+                              help='user the accounts are recorded as added by in the history (default: admin)')
+    import_users.add_argument('--workers', type=int,
+                              help='processes hashing the passwords (default: one per core)')
+    archive = commands.add_parser('archive', parents=[common],
+                                  help='move old history and transactions rows into per-year archive files and vacuum')
+    cutoff = archive.add_mutually_exclusive_group()
+    cutoff.add_argument('--before', metavar='YYYY-MM-DD', help='archive the rows older than this day')
+    cutoff.add_argument('--keep-days', type=int,
+                        help='archive the rows older than this many days (default: keep_days of library.ini, or 365)')
+    commands.add_parser('explain', parents=[common],
+                        help="check that the transactions and users' history filters are served by their indexes")
+    args = parser.parse_args(argv)
+
+    app = QCoreApplication(sys.argv[:1])
+    database = openDatabase(args.database)
+    query = QSqlQuery(database)
+
+    if args.command == 'rebuild':
+        if not rebuildDerivedTables(query, args.database):
+            return 1
+        print("Dashboard counters, daily transaction rollup and search indexes rebuilt.")
+
+    elif args.command == 'compact':
+        if not compactDatabase(query, args.database):
+            return 1
+
+    elif args.command == 'import-books':
+        try:
+            result = importBooks(StatementRegistry(database, prepared_statements), args.csv, args.chunk_size,
+                                 progress=lambda result: print(f"{result.rows} rows...", end='\r'))
+        except (OSError, UnicodeDecodeError, StatementError) as error:
+            print(f"Import failed, chunks before the error were kept: {error}")
+            return 1
+        for line, reason in result.skipped:
+            print(f"Skipped line {line}: {reason}")
+        print(f"Imported {result.rows} rows in {result.seconds:.2f} s ({result.rows_per_second:.0f} rows/s): "
+              f"{result.added} new books, {result.updated} restocked, {result.categories_added} new categories.")
+
+    elif args.command == 'import-roster':
+        try:
+            result = importRoster(StatementRegistry(database, prepared_statements), args.csv, args.chunk_size,
+                                  progress=lambda result: print(f"{result.rows} rows...", end='\r'))
+        except (OSError, UnicodeDecodeError, StatementError) as error:
+            print(f"Import failed, chunks before the error were kept: {error}")
+            return 1
+        for line, reason in result.skipped:
+            print(f"Skipped line {line}: {reason}")
+        print(f"Imported {result.rows} rows in {result.seconds:.2f} s ({result.rows_per_second:.0f} rows/s): "
+              f"{result.added} pupils registered, {result.duplicates} already registered.")
+
+    elif args.command == 'import-users':
+        # a database the app hasn't opened since upgrading still has the free text history and text hashes
+        if not migrateHistory(query):
+            print("Import failed, no user was created: the history couldn't be converted to events.")
+            return 1
+        if not migratePasswords(query):
+            print("Import failed, no user was created: the password hashes couldn't be converted.")
+            return 1
+        statements = StatementRegistry(database, prepared_statements)
+        user = statements.fetchOne('select_user_id', args.user)
+        if user is None:
+            print(f"No user '{args.user}'.")
+            return 1
+        try:
+            hash_settings = loadHashSettings(os.path.join(base_dir, 'library.ini'))
+            result = importUsers(statements, args.csv, hash_settings, user[0], args.workers)
+        except (OSError, UnicodeDecodeError, ValueError, StatementError) as error:
+            print(f"Import failed, no user was created: {error}")
+            return 1
+        for line, reason in result.skipped:
+            print(f"Skipped line {line}: {reason}")
+        hashes_per_second = result.rows / result.hash_seconds if result.hash_seconds else 0.0
+        print(f"Imported {result.rows} users in {result.seconds:.2f} s ({result.rows_per_second:.1f} users/s), "
+              f"passwords hashed in {result.hash_seconds:.2f} s ({hashes_per_second:.1f} hashes/s).")
+
+    elif args.command == 'archive':
+        cutoff = args.before or loadCutoff(os.path.join(base_dir, 'library.ini'), args.keep_days)
+        size_before = os.path.getsize(args.database)
+        try:
+            archived = archiveBefore(database, cutoff)
+        except ArchiveError as error:
+            print(f"Archiving failed, years archived before the error stay archived: {error}")
+            return 1
+        for year, moved in archived.items():
+            print(f"{year}: " + ', '.join(f"{rows} {table} rows" for table, rows in moved.items()))
+        if not archived:
+            print(f"Nothing older than {cutoff} to archive.")
+        else:
+            size_after = os.path.getsize(args.database)
+            print(f"Freed {(size_before - size_after) / 1024:.1f} KiB ({size_before} -> {size_after} bytes).")
+
+    elif args.command == 'explain':
+        # both are run so every failing plan is printed
+        transactions_used = explainTransactionsFilters(query)
+        if not (explainHistoryFilters(query) and transactions_used):
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,361 @@
+"""Item models filled from rows instead of from a QSqlQuery."""
+import heapq
+from bisect import bisect_left
+
+from PyQt5.QtCore import QAbstractListModel, QAbstractTableModel, QModelIndex, Qt
+
+
+MATCH_LIMIT = 100  # completions handed to a completer's popup at a time
+PAGE_SIZE = 200  # rows a PagedRowsTableModel fetches at a time
+
+
+class RowsTableModel(QAbstractTableModel):
+    """Read-only table of rows, e.g. the result of a DatabaseWorker request.
+
+    Headers are the column names, like a QSqlQueryModel's.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.columns = []
+        self.rows = []
+
+    def setRows(self, columns: list, rows: list):
+        """Replaces the whole content of the model."""
+        self.beginResetModel()
+        self.columns = list(columns)
+        self.rows = list(rows)
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.columns)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if index.isValid() and role in (Qt.DisplayRole, Qt.EditRole):
+            return self.rows[index.row()][index.column()]
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal and section < len(self.columns):
+            return self.columns[section]
+        return super().headerData(section, orientation, role)
+
+
+class PagedRowsTableModel(RowsTableModel):
+    """RowsTableModel filled a page at a time as its view is scrolled down, newest rows first.
+
+    Pages are fetched by keyset: fetch_page is called with the key of the last row shown
+    (None for the first page), the page size and the callback to hand the rows to, newest
+    first. Rows newer than the first one shown are added on top with prependRows.
+    """
+
+    def __init__(self, fetch_page, key, page_size=PAGE_SIZE, parent=None):
+        super().__init__(parent)
+        self.fetch_page = fetch_page
+        self.key = key  # row -> keyset value, rows are in descending key order
+        self.page_size = page_size
+        self.more = False
+        self.fetching = False
+        self.generation = 0  # reloads so far
+
+    def current(self, callback):
+        """Wraps callback so that it is skipped once the model has been reloaded,
+        e.g. for rows requested before the filters changed.
+        """
+        generation = self.generation
+
+        def currentCallback(*args):
+            if generation == self.generation:
+                callback(*args)
+        return currentCallback
+
+    def reload(self):
+        """Drops every row and fetches the first page again."""
+        self.beginResetModel()
+        self.generation += 1
+        self.rows = []
+        self.more = True
+        self.fetching = False
+        self.endResetModel()
+        self.fetchMore()
+
+    def firstKey(self):
+        """Key of the newest row shown, None while there is none."""
+        return self.key(self.rows[0]) if self.rows else None
+
+    def canFetchMore(self, parent=QModelIndex()) -> bool:
+        return not parent.isValid() and self.more and not self.fetching
+
+    def fetchMore(self, parent=QModelIndex()):
+        if not self.canFetchMore(parent):
+            return
+        self.fetching = True
+        self.fetch_page(self.key(self.rows[-1]) if self.rows else None, self.page_size, self.current(self.appendPage))
+
+    def appendPage(self, columns: list, rows: list):
+        self.fetching = False
+        self.more = len(rows) >= self.page_size
+        if self.rows:
+            last = self.key(self.rows[-1])
+            rows = [row for row in rows if self.key(row) < last]
+        if list(columns) != self.columns:
+            self.setRows(columns, self.rows + list(rows))
+        elif rows:
+            self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows) + len(rows) - 1)
+            self.rows.extend(rows)
+            self.endInsertRows()
+
+    def pageFailed(self, error: str):
+        """Stops fetching pages after a page could not be read."""
+        print(error)
+        self.fetching = False
+        self.more = False
+
+    def prependRows(self, columns: list, rows: list):
+        """Adds rows, newest first, above the rows shown. Rows already shown are skipped."""
+        if self.rows:
+            first = self.key(self.rows[0])
+            rows = [row for row in rows if self.key(row) > first]
+        if not self.columns:
+            self.setRows(columns, list(rows) + self.rows)
+        elif rows:
+            self.beginInsertRows(QModelIndex(), 0, len(rows) - 1)
+            self.rows[:0] = rows
+            self.endInsertRows()
+
+
+class KeyedRowsTableModel(RowsTableModel):
+    """RowsTableModel whose rows can be changed one at a time, found by their key column.
+
+    While ordered, rows stay sorted by sort_key as they are added or changed, without
+    re-reading the others. Rows loaded unordered (e.g. ranked search results) keep their
+    positions and only rows already shown are updated.
+    """
+
+    def __init__(self, key_column=0, sort_key=None, parent=None):
+        super().__init__(parent)
+        self.key_column = key_column
+        self.sort_key = sort_key  # row -> value to order the rows by, the key column breaks ties
+        self.ordered = sort_key is not None
+        self.sort_keys = []  # sort key of every row while ordered, in row order
+        self.by_key = {}  # {key: row}
+
+    def _sortKey(self, row: tuple) -> tuple:
+        return self.sort_key(row), row[self.key_column]
+
+    def setRows(self, columns: list, rows: list, ordered=True):
+        """Replaces the whole content of the model, sorting rows unless ordered is False."""
+        self.ordered = ordered and self.sort_key is not None
+        rows = [tuple(row) for row in rows]
+        if self.ordered:
+            rows.sort(key=self._sortKey)
+            self.sort_keys = [self._sortKey(row) for row in rows]
+        else:
+            self.sort_keys = []
+        self.by_key = {row[self.key_column]: row for row in rows}
+        super().setRows(columns, rows)
+
+    def rowOf(self, key) -> int:
+        """Position of the row with key, -1 if there is none."""
+        row = self.by_key.get(key)
+        if row is None:
+            return -1
+        if self.ordered:
+            return bisect_left(self.sort_keys, self._sortKey(row))
+        return self.rows.index(row)
+
+    def upsertRow(self, row):
+        """Replaces the row having the same key as row, or inserts row at its sorted position."""
+        row = tuple(row)
+        key = row[self.key_column]
+        position = self.rowOf(key)
+        if position >= 0 and (not self.ordered or self._sortKey(row) == self.sort_keys[position]):
+            self.rows[position] = self.by_key[key] = row
+            self.dataChanged.emit(self.index(position, 0), self.index(position, len(self.columns) - 1))
+            return
+        if position >= 0:
+            # its sort key changed, it moves
+            self.removeRowByKey(key)
+        elif not self.ordered:
+            return
+
+        sort_key = self._sortKey(row)
+        position = bisect_left(self.sort_keys, sort_key)
+        self.beginInsertRows(QModelIndex(), position, position)
+        self.rows.insert(position, row)
+        self.sort_keys.insert(position, sort_key)
+        self.by_key[key] = row
+        self.endInsertRows()
+
+    def removeRowByKey(self, key):
+        """Removes the row with key if it is shown."""
+        position = self.rowOf(key)
+        if position < 0:
+            return
+        self.beginRemoveRows(QModelIndex(), position, position)
+        del self.rows[position]
+        if self.ordered:
+            del self.sort_keys[position]
+        del self.by_key[key]
+        self.endRemoveRows()
+
+
+class CompletionIndex:
+    """Multiset of strings searchable by prefix (a trie) or by substring (an n-gram index).
+
+    Matching is case insensitive. A string is only forgotten once it has been removed
+    as many times as it was added, the way a SELECT DISTINCT would stop returning it.
+    counts are (text, rows having it) pairs, the rows of a SELECT text, count(*) ... GROUP BY text.
+    """
+
+    GRAM = 3  # length of the n-grams indexed, shorter substrings are looked up with a scan
+
+    def __init__(self, counts=(), substrings=True):
+        self.substrings = substrings  # False leaves out the n-gram index, containing() then can't be used
+        self.counts = {}  # {text: rows having it}
+        self.keys = {}  # {text: casefolded text}
+        self.trie = {}  # nested {character: node}, the '' key of a node holds the texts ending there
+        self.grams = {}  # {n-gram: texts containing it}
+        for text, count in counts:
+            self.add(text, count)
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def _grams(self, key: str) -> set:
+        return {key[start:start + self.GRAM] for start in range(len(key) - self.GRAM + 1)}
+
+    def add(self, text: str, count=1):
+        if not text:
+            return
+        added = self.counts.get(text, 0)
+        self.counts[text] = added + count
+        if added:
+            return
+
+        key = self.keys[text] = text.casefold()
+        node = self.trie
+        for character in key:
+            node = node.setdefault(character, {})
+        node.setdefault('', set()).add(text)
+        if not self.substrings:
+            return
+        for gram in self._grams(key):
+            self.grams.setdefault(gram, set()).add(text)
+
+    def remove(self, text: str, count=1):
+        if text not in self.counts:
+            return
+        self.counts[text] -= count
+        if self.counts[text] > 0:
+            return
+        del self.counts[text]
+
+        key = self.keys.pop(text)
+        path = [self.trie]
+        for character in key:
+            path.append(path[-1][character])
+        path[-1][''].discard(text)
+        if not path[-1]['']:
+            del path[-1]['']
+        # prunes the branches left empty, deepest first
+        for depth in range(len(key), 0, -1):
+            if path[depth]:
+                break
+            del path[depth - 1][key[depth - 1]]
+        if not self.substrings:
+            return
+        for gram in self._grams(key):
+            texts = self.grams[gram]
+            texts.discard(text)
+            if not texts:
+                del self.grams[gram]
+
+    def startingWith(self, prefix: str, limit=MATCH_LIMIT) -> list:
+        """Texts starting with prefix in alphabetical order, at most limit of them."""
+        node = self.trie
+        for character in prefix.casefold():
+            node = node.get(character)
+            if node is None:
+                return []
+
+        matches = []
+        stack = [node]
+        while stack and len(matches) < limit:
+            node = stack.pop()
+            matches.extend(sorted(node.get('', ())))
+            stack.extend(node[character] for character in sorted(node, reverse=True) if character)
+        return matches[:limit]
+
+    def containing(self, text: str, limit=MATCH_LIMIT) -> list:
+        """Texts containing text in alphabetical order, at most limit of them."""
+        key = text.casefold()
+        if len(key) < self.GRAM:
+            candidates = (match for match, match_key in self.keys.items() if key in match_key)
+        else:
+            # every gram of text has to be in a match, the rarest one narrows it down most
+            postings = sorted((self.grams.get(key[start:start + self.GRAM], set())
+                               for start in range(len(key) - self.GRAM + 1)), key=len)
+            candidates = (match for match in postings[0].intersection(*postings[1:]) if key in self.keys[match])
+        return heapq.nsmallest(limit, candidates, key=str.casefold)
+
+
+class CompletionModel(QAbstractListModel):
+    """Completer model holding only the matches of what is being typed.
+
+    The strings and the number of rows having each are loaded once into a CompletionIndex
+    and patched with add, remove and rename as rows change. complete() has to be connected to the textEdited signal
+    of the line edits using the model's completer.
+    """
+
+    def __init__(self, counts=(), contains=False, limit=MATCH_LIMIT, parent=None):
+        super().__init__(parent)
+        self.contains = contains
+        self.limit = limit
+        self.index_ = CompletionIndex(counts, substrings=contains)
+        self.text = ''
+        self.matches = []
+
+    def load(self, counts):
+        """Replaces every string and its count, e.g. after a bulk import."""
+        self.index_ = CompletionIndex(counts, substrings=self.contains)
+        self.complete(self.text)
+
+    def add(self, text: str):
+        self.index_.add(text)
+        self.complete(self.text)
+
+    def remove(self, text: str, count=1):
+        self.index_.remove(text, count)
+        self.complete(self.text)
+
+    def rename(self, old: str, new: str):
+        if old != new:
+            self.index_.remove(old)
+            self.index_.add(new)
+            self.complete(self.text)
+
+    def complete(self, text: str):
+        """Looks up the matches of text."""
+        self.text = text
+        if not text:
+            matches = []
+        elif self.contains:
+            matches = self.index_.containing(text, self.limit)
+        else:
+            matches = self.index_.startingWith(text, self.limit)
+        if matches != self.matches:
+            self.beginResetModel()
+            self.matches = matches
+            self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.matches)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if index.isValid() and role in (Qt.DisplayRole, Qt.EditRole):
+            return self.matches[index.row()]
+        return None
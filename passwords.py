@@ -0,0 +1,169 @@
+"""Password hashes.
+
+A hash is stored in users.user_password as a BLOB that records how it was made:
+
+    version (1 byte) | algorithm (1 byte) | cost (4 bytes) | block size (2 bytes) | parallelism (2 bytes) | salt | key
+
+cost is the iteration count of PBKDF2-SHA256 or the n of scrypt, block size and parallelism are the r and p of
+scrypt (0 for PBKDF2). New hashes are made with the [passwords] settings of library.ini, e.g:
+
+    [passwords]
+    algorithm = scrypt
+    scrypt_n = 16384
+
+A user whose hash was made with other settings gets a new one the next time they sign in, see verifyPassword.
+Older versions stored str(bytes) of a PBKDF2 key followed by its salt as text, migratePasswords converts them.
+"""
+import configparser
+import hashlib
+import hmac
+import os
+import struct
+from ast import literal_eval
+
+from PyQt5.QtCore import QByteArray
+from PyQt5.QtSql import QSqlQuery
+
+from queries import *
+
+
+FORMAT_VERSION = 1
+
+# {algorithm: code}. Codes are stored in the hashes, never change or reuse one
+ALGORITHMS = {'pbkdf2_sha256': 1, 'scrypt': 2}
+
+HEADER = struct.Struct('>BBIHH')  # version, algorithm, cost, block size, parallelism
+SALT_SIZE = 16
+KEY_SIZE = 32
+
+DEFAULT_HASH_SETTINGS = {'algorithm': 'scrypt', 'pbkdf2_iterations': 600000,
+                         'scrypt_n': 16384, 'scrypt_r': 8, 'scrypt_p': 1}
+
+LEGACY_ITERATIONS = 100000  # PBKDF2-SHA256 iterations of the text hashes of older versions
+
+algorithm_names = {code: algorithm for algorithm, code in ALGORITHMS.items()}
+
+
+def loadHashSettings(config_path: str) -> dict:
+    """Returns the settings of new hashes from the [passwords] section of config_path.
+
+    Raises ValueError for an unknown algorithm or a setting that isn't a positive number.
+    """
+    config = configparser.ConfigParser()
+    config.read(config_path)
+    settings = dict(DEFAULT_HASH_SETTINGS)
+    if config.has_section('passwords'):
+        section = config['passwords']
+        settings['algorithm'] = section.get('algorithm', settings['algorithm'])
+        for name in ('pbkdf2_iterations', 'scrypt_n', 'scrypt_r', 'scrypt_p'):
+            settings[name] = section.getint(name, settings[name])
+    if settings['algorithm'] not in ALGORITHMS:
+        raise ValueError(f"Unknown password algorithm '{settings['algorithm']}', choose from {', '.join(ALGORITHMS)}.")
+    if min(settings[name] for name in settings if name != 'algorithm') < 1:
+        raise ValueError("Password hash settings must be positive numbers.")
+    return settings
+
+
+def hashParameters(settings: dict) -> tuple:
+    """(algorithm code, cost, block size, parallelism) of the hashes made with settings."""
+    if settings['algorithm'] == 'scrypt':
+        return ALGORITHMS['scrypt'], settings['scrypt_n'], settings['scrypt_r'], settings['scrypt_p']
+    return ALGORITHMS['pbkdf2_sha256'], settings['pbkdf2_iterations'], 0, 0
+
+
+def deriveKey(password: str, salt: bytes, algorithm: int, cost: int, block_size: int, parallelism: int) -> bytes:
+    if algorithm == ALGORITHMS['scrypt']:
+        # scrypt uses 128 * n * r bytes per lane, hashlib refuses more than 32 MiB unless told
+        return hashlib.scrypt(password.encode(), salt=salt, n=cost, r=block_size, p=parallelism,
+                              maxmem=256 * cost * block_size * parallelism, dklen=KEY_SIZE)
+    return hashlib.pbkdf2_hmac('sha256', password.encode(), salt, cost, KEY_SIZE)
+
+
+def encodeHash(salt: bytes, key: bytes, algorithm: int, cost: int, block_size: int, parallelism: int) -> bytes:
+    return HEADER.pack(FORMAT_VERSION, algorithm, cost, block_size, parallelism) + salt + key
+
+
+def decodeHash(stored: bytes) -> tuple:
+    """(salt, key, algorithm code, cost, block size, parallelism) of stored.
+
+    Raises ValueError if stored isn't a hash of a known version and algorithm.
+    """
+    stored = bytes(stored)  # a QByteArray when read with QtSql
+    if len(stored) != HEADER.size + SALT_SIZE + KEY_SIZE:
+        raise ValueError("Not a password hash.")
+    version, algorithm, cost, block_size, parallelism = HEADER.unpack_from(stored)
+    if version != FORMAT_VERSION or algorithm not in algorithm_names:
+        raise ValueError(f"Unknown password hash version {version}, algorithm {algorithm}.")
+    salt = stored[HEADER.size:HEADER.size + SALT_SIZE]
+    return salt, stored[HEADER.size + SALT_SIZE:], algorithm, cost, block_size, parallelism
+
+
+def hashPassword(password: str, settings: dict = DEFAULT_HASH_SETTINGS) -> bytes:
+    """Hashes password with a new salt and the algorithm and parameters of settings."""
+    parameters = hashParameters(settings)
+    salt = os.urandom(SALT_SIZE)
+    return encodeHash(salt, deriveKey(password, salt, *parameters), *parameters)
+
+
+def checkPassword(password: str, stored: bytes) -> bool:
+    """Hashes password with the salt and parameters of stored then compares both keys in constant time."""
+    try:
+        salt, key, *parameters = decodeHash(stored)
+    except ValueError:
+        return False
+    return hmac.compare_digest(deriveKey(password, salt, *parameters), key)
+
+
+def needsRehash(stored: bytes, settings: dict) -> bool:
+    """Whether stored was made with other parameters than the ones of settings."""
+    return tuple(decodeHash(stored)[2:]) != hashParameters(settings)
+
+
+def verifyPassword(password: str, stored: bytes, settings: dict) -> tuple:
+    """Returns (whether password matches stored, its new hash if it does and stored is outdated, else None).
+
+    Both hashes are made here so a login thread does all the hashing, see LoginWindow.handleLogin.
+    """
+    if not checkPassword(password, stored):
+        return False, None
+    return True, hashPassword(password, settings) if needsRehash(stored, settings) else None
+
+
+def convertLegacyHash(text: str) -> bytes:
+    """Versioned hash of an older version's str(bytes) hash: a PBKDF2-SHA256 key followed by its salt."""
+    legacy = literal_eval(text)
+    if not isinstance(legacy, bytes) or len(legacy) != KEY_SIZE + SALT_SIZE:
+        raise ValueError("Not a password hash.")
+    return encodeHash(legacy[KEY_SIZE:], legacy[:KEY_SIZE], ALGORITHMS['pbkdf2_sha256'], LEGACY_ITERATIONS, 0, 0)
+
+
+def migratePasswords(query: QSqlQuery) -> bool:
+    """Converts the text hashes of older versions into versioned BLOB hashes, in one transaction.
+
+    The keys are kept, so the passwords don't change; they are re-hashed with the current settings
+    as their users sign in. A hash that can't be read is left as it was and reported.
+    Returns False and leaves the hashes as they were if a write fails.
+    """
+    if not query.exec_(select_legacy_passwords_query):
+        print(query.lastError().text())
+        return False
+    converted = []
+    while query.next():
+        user_id, text = query.value(0), query.value(1)
+        try:
+            converted.append((convertLegacyHash(text), user_id))
+        except (ValueError, SyntaxError):
+            print(f"Password hash of user {user_id} can't be read, it was left as it is.")
+    if not converted:
+        return True
+
+    query.exec_("BEGIN IMMEDIATE")
+    query.prepare(update_password_query)
+    for hashed_password, user_id in converted:
+        query.addBindValue(QByteArray(hashed_password))  # bytes would be bound as an empty string
+        query.addBindValue(user_id)
+        if not query.exec_():
+            print(query.lastError().text())
+            query.exec_("ROLLBACK")
+            return False
+    return query.exec_("COMMIT")
@@ -1,11 +1,19 @@
+from itertools import combinations
+
+
 create_users_table_query = '''CREATE TABLE IF NOT EXISTS users (
                                 user_id INTEGER PRIMARY KEY AUTOINCREMENT,
                                 user_name   VARCHAR (30)    NOT NULL
                                                             UNIQUE,
                                 name        VARCHAR (30),
-                                user_password   VARCHAR  NOT NULL
+                                user_password   BLOB  NOT NULL
                             );'''
 
+# password hashes of older versions, str(bytes) stored as text, see passwords.migratePasswords
+select_legacy_passwords_query = "SELECT user_id, user_password FROM users WHERE typeof(user_password) = 'text'"
+
+update_password_query = "UPDATE users SET user_password=? WHERE user_id=?"
+
 create_books_table_query = '''CREATE TABLE IF NOT EXISTS books (
                                 book_id    INTEGER  PRIMARY KEY AUTOINCREMENT,
                                 book_title VARCHAR NOT NULL,
@@ -70,23 +78,54 @@ create_client_record_view_query = '''CREATE VIEW IF NOT EXISTS client_record_vw
                                                 books ON client_records.book_id = books.book_id;'''
 
 create_transaction_acc_view_query = '''CREATE VIEW IF NOT EXISTS transaction_acc_vw AS
-                                        SELECT coalesce(sum(quantity), 0) AS QUANTITY,
-                                        type AS TYPE, 
-                                        date FROM dates
+                                        SELECT coalesce(transaction_daily.quantity, 0) AS QUANTITY,
+                                        type AS TYPE,
+                                        dates.date FROM dates
                                             LEFT JOIN
-                                            transactions ON date(transactions.datetime) = dates.date
-                                        WHERE date <= date('now', 'localtime') 
-                                        GROUP BY date,
+                                            transaction_daily ON transaction_daily.date = dates.date
+                                        WHERE dates.date <= date('now', 'localtime')
+                                        ORDER BY dates.date,
                                                 type;'''
 
-create_history_table_query = '''CREATE TABLE IF NOT EXISTS history (
-                                user_name   VARCHAR(30) NOT NULL,
-                                [action]    VARCHAR(30) NOT NULL,
-                                [table] VARCHAR(30),
+# users' history event log, action and table are codes of history.HISTORY_ACTIONS and HISTORY_TABLES,
+# payload the event details as a JSON object. AUTOINCREMENT keeps event ids unique after old events
+# were moved to the archive files
+history_table_columns = '''(
+                                event_id    INTEGER PRIMARY KEY AUTOINCREMENT,
+                                user_id INTEGER,
+                                [action]    INTEGER NOT NULL,
+                                [table] INTEGER,
+                                payload TEXT,
                                 datetime    NOT NULL
-                                                DEFAULT (DATETIME('now', 'localtime')),
-                                CONSTRAINT user FOREIGN KEY(user_name)REFERENCES users (user_name)
-                            );'''
+                                                DEFAULT (DATETIME('now', 'localtime'))
+                            )'''
+
+create_history_table_query = "CREATE TABLE IF NOT EXISTS history " + history_table_columns
+
+# the (column, datetime) indexes return a filtered history already in datetime order
+create_history_index_queries = (
+    "CREATE INDEX IF NOT EXISTS history_datetime_idx ON history(datetime)",
+    "CREATE INDEX IF NOT EXISTS history_user_datetime_idx ON history(user_id, datetime)",
+    "CREATE INDEX IF NOT EXISTS history_table_datetime_idx ON history([table], datetime)",
+)
+
+# conversion of the free text history of older versions (user_name, action text, table name, datetime)
+# in {schema}, see history.migrateHistory. {actions} and {tables} are CASE branches mapping text to codes,
+# {coded} the texts that have an action code of their own
+migrate_history_queries = (
+    "ALTER TABLE {schema}.history RENAME TO history_v1",
+    "CREATE TABLE {schema}.history " + history_table_columns,
+    '''INSERT INTO {schema}.history(user_id, [action], [table], payload, datetime)
+        SELECT users.user_id,
+            CASE old.[action] {actions} ELSE 0 END,
+            CASE old.[table] {tables} END,
+            CASE WHEN old.[action] IN ({coded}) THEN json_object('user_name', old.user_name)
+                ELSE json_object('user_name', old.user_name, 'text', old.[action]) END,
+            old.datetime
+        FROM {schema}.history_v1 AS old LEFT JOIN main.users ON users.user_name = old.user_name
+        ORDER BY old.datetime, old.rowid''',
+    "DROP TABLE {schema}.history_v1",
+)
 
 create_user_permissions_table_query = '''CREATE TABLE IF NOT EXISTS user_permissions (
                                             user_name   VARCHAR PRIMARY KEY ON CONFLICT REPLACE NOT NULL,
@@ -124,3 +163,531 @@ create_houses_table_query = '''CREATE TABLE IF NOT EXISTS houses (
 create_classes_table_query = '''CREATE TABLE IF NOT EXISTS classes (
                                     class VARCHAR UNIQUE ON CONFLICT FAIL
                                 );'''
+
+create_dashboard_counters_table_query = '''CREATE TABLE IF NOT EXISTS dashboard_counters (
+                                            day VARCHAR(10) NOT NULL DEFAULT '',
+                                            counter VARCHAR(30) NOT NULL,
+                                            value INTEGER NOT NULL DEFAULT (0),
+                                            PRIMARY KEY (day, counter)
+                                        ) WITHOUT ROWID;'''
+
+# day '' holds all-time counters, any other day holds that date's counters
+create_transactions_counters_trigger_query = '''CREATE TRIGGER IF NOT EXISTS transactions_counters_trg
+                                                AFTER INSERT ON transactions
+                                                BEGIN
+                                                    INSERT INTO dashboard_counters(day, counter, value)
+                                                        VALUES('', NEW.type, coalesce(NEW.quantity, 0))
+                                                        ON CONFLICT(day, counter) DO UPDATE SET value=value+excluded.value;
+                                                    INSERT INTO dashboard_counters(day, counter, value)
+                                                        VALUES(date(NEW.datetime), NEW.type, coalesce(NEW.quantity, 0))
+                                                        ON CONFLICT(day, counter) DO UPDATE SET value=value+excluded.value;
+                                                END;'''
+
+create_users_insert_counters_trigger_query = '''CREATE TRIGGER IF NOT EXISTS users_insert_counters_trg
+                                                AFTER INSERT ON users
+                                                BEGIN
+                                                    INSERT INTO dashboard_counters(day, counter, value)
+                                                        VALUES('', 'USERS', 1)
+                                                        ON CONFLICT(day, counter) DO UPDATE SET value=value+1;
+                                                END;'''
+
+create_users_delete_counters_trigger_query = '''CREATE TRIGGER IF NOT EXISTS users_delete_counters_trg
+                                                AFTER DELETE ON users
+                                                BEGIN
+                                                    UPDATE dashboard_counters SET value=value-1
+                                                        WHERE day='' AND counter='USERS';
+                                                END;'''
+
+select_dashboard_counters_query = '''SELECT day, counter, value FROM dashboard_counters
+                                        WHERE day IN ('', date('now', 'localtime'))'''
+
+# read on a pooled connection while the user signs in, see warmup.py. They bring the pages the main window
+# reads first into the OS page cache (and the mmap): the permissions, the users, the books and categories
+# the books tabs load whole and the newest rows of the transactions and users' history
+warm_up_queries = (
+    "SELECT count(*), max(user_name) FROM user_permissions",
+    "SELECT count(*), max(user_name), max(name) FROM users",
+    "SELECT count(*), max(category) FROM categories",
+    "SELECT count(*), max(book_title), max(category), max(quantity) FROM books",
+    "SELECT max(client_id), max(book_id), max(user_id) FROM "
+    "(SELECT * FROM transactions ORDER BY datetime DESC LIMIT 200)",
+    "SELECT max(user_id), max(payload) FROM (SELECT * FROM history ORDER BY datetime DESC LIMIT 200)",
+)
+
+# daily totals of the archived transactions, filled an archive file at a time by
+# archive.loadArchivedTransactionDaily so the rebuilds below keep counting them
+create_archived_transaction_daily_table_query = '''CREATE TEMP TABLE IF NOT EXISTS archived_transaction_daily (
+                                                    date    DATE NOT NULL,
+                                                    type    VARCHAR(30) NOT NULL,
+                                                    quantity INTEGER NOT NULL
+                                                );'''
+
+insert_archived_transaction_daily_query = '''INSERT INTO temp.archived_transaction_daily(date, type, quantity)
+                                            SELECT date(datetime), type, coalesce(sum(quantity), 0)
+                                            FROM {schema}.transactions GROUP BY date(datetime), type'''
+
+# (date, type, quantity) of the live transactions and the archived daily totals
+all_transaction_quantities = '''(SELECT date(datetime) AS date, type, coalesce(quantity, 0) AS quantity FROM main.transactions
+                                 UNION ALL SELECT date, type, quantity FROM temp.archived_transaction_daily)'''
+
+rebuild_dashboard_counters_queries = (
+    "DELETE FROM dashboard_counters",
+    f'''INSERT INTO dashboard_counters(day, counter, value)
+        SELECT '', type, sum(quantity) FROM {all_transaction_quantities} GROUP BY type''',
+    f'''INSERT INTO dashboard_counters(day, counter, value)
+        SELECT date, type, sum(quantity) FROM {all_transaction_quantities} GROUP BY date, type''',
+    "INSERT INTO dashboard_counters(day, counter, value) SELECT '', 'USERS', count(*) FROM users",
+)
+
+create_transaction_daily_table_query = '''CREATE TABLE IF NOT EXISTS transaction_daily (
+                                            date    DATE NOT NULL,
+                                            type    VARCHAR(30) NOT NULL,
+                                            quantity INTEGER NOT NULL DEFAULT (0),
+                                            PRIMARY KEY (date, type)
+                                        ) WITHOUT ROWID;'''
+
+# runs inside the statement that inserts the transaction, so the rollup commits (or rolls back) with it
+create_transactions_daily_trigger_query = '''CREATE TRIGGER IF NOT EXISTS transactions_daily_trg
+                                            AFTER INSERT ON transactions
+                                            BEGIN
+                                                INSERT INTO transaction_daily(date, type, quantity)
+                                                    VALUES(date(NEW.datetime), NEW.type, coalesce(NEW.quantity, 0))
+                                                    ON CONFLICT(date, type) DO UPDATE SET quantity=quantity+excluded.quantity;
+                                            END;'''
+
+rebuild_transaction_daily_queries = (
+    "DELETE FROM transaction_daily",
+    f'''INSERT INTO transaction_daily(date, type, quantity)
+        SELECT date, type, sum(quantity) FROM {all_transaction_quantities} GROUP BY date, type''',
+)
+
+select_first_transaction_day_query = "SELECT min(date) FROM transaction_daily"
+
+# leftovers of the "obligatory zero quantity transaction of the day" older versions added for the graph
+count_filler_transactions_query = '''SELECT count(*) FROM transactions
+                                        WHERE client_id IS NULL AND book_id IS NULL AND quantity=0'''
+
+delete_filler_transactions_query = '''DELETE FROM transactions
+                                        WHERE client_id IS NULL AND book_id IS NULL AND quantity=0'''
+
+# staging table of the CSV book import, one chunk of rows at a time
+create_import_books_table_query = '''CREATE TEMP TABLE IF NOT EXISTS import_books (
+                                        book_title VARCHAR NOT NULL,
+                                        category   VARCHAR NOT NULL,
+                                        quantity   INTEGER NOT NULL
+                                    );'''
+
+# full-text index of book titles and categories, an external content table reading books
+create_books_fts_table_query = '''CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5(
+                                    book_title, category,
+                                    content='books', content_rowid='book_id',
+                                    tokenize='unicode61 remove_diacritics 2'
+                                );'''
+
+create_books_fts_insert_trigger_query = '''CREATE TRIGGER IF NOT EXISTS books_fts_insert_trg
+                                            AFTER INSERT ON books
+                                            BEGIN
+                                                INSERT INTO books_fts(rowid, book_title, category)
+                                                    VALUES(NEW.book_id, NEW.book_title, NEW.category);
+                                            END;'''
+
+create_books_fts_delete_trigger_query = '''CREATE TRIGGER IF NOT EXISTS books_fts_delete_trg
+                                            AFTER DELETE ON books
+                                            BEGIN
+                                                INSERT INTO books_fts(books_fts, rowid, book_title, category)
+                                                    VALUES('delete', OLD.book_id, OLD.book_title, OLD.category);
+                                            END;'''
+
+# quantity changes on every lend and retrieve, only title and category changes touch the index
+create_books_fts_update_trigger_query = '''CREATE TRIGGER IF NOT EXISTS books_fts_update_trg
+                                            AFTER UPDATE OF book_title, category ON books
+                                            BEGIN
+                                                INSERT INTO books_fts(books_fts, rowid, book_title, category)
+                                                    VALUES('delete', OLD.book_id, OLD.book_title, OLD.category);
+                                                INSERT INTO books_fts(rowid, book_title, category)
+                                                    VALUES(NEW.book_id, NEW.book_title, NEW.category);
+                                            END;'''
+
+rebuild_books_fts_query = "INSERT INTO books_fts(books_fts) VALUES('rebuild')"
+
+# trigram indexes of book titles and client names, the candidates of the "did you mean" lookups
+create_books_trigram_table_query = '''CREATE VIRTUAL TABLE IF NOT EXISTS books_trigram USING fts5(
+                                        book_title,
+                                        content='books', content_rowid='book_id',
+                                        tokenize='trigram'
+                                    );'''
+
+create_books_trigram_insert_trigger_query = '''CREATE TRIGGER IF NOT EXISTS books_trigram_insert_trg
+                                                AFTER INSERT ON books
+                                                BEGIN
+                                                    INSERT INTO books_trigram(rowid, book_title) VALUES(NEW.book_id, NEW.book_title);
+                                                END;'''
+
+create_books_trigram_delete_trigger_query = '''CREATE TRIGGER IF NOT EXISTS books_trigram_delete_trg
+                                                AFTER DELETE ON books
+                                                BEGIN
+                                                    INSERT INTO books_trigram(books_trigram, rowid, book_title)
+                                                        VALUES('delete', OLD.book_id, OLD.book_title);
+                                                END;'''
+
+create_books_trigram_update_trigger_query = '''CREATE TRIGGER IF NOT EXISTS books_trigram_update_trg
+                                                AFTER UPDATE OF book_title ON books
+                                                BEGIN
+                                                    INSERT INTO books_trigram(books_trigram, rowid, book_title)
+                                                        VALUES('delete', OLD.book_id, OLD.book_title);
+                                                    INSERT INTO books_trigram(rowid, book_title) VALUES(NEW.book_id, NEW.book_title);
+                                                END;'''
+
+create_clients_trigram_table_query = '''CREATE VIRTUAL TABLE IF NOT EXISTS clients_trigram USING fts5(
+                                        client_first_name, client_last_name,
+                                        content='clients', content_rowid='client_id',
+                                        tokenize='trigram'
+                                    );'''
+
+create_clients_trigram_insert_trigger_query = '''CREATE TRIGGER IF NOT EXISTS clients_trigram_insert_trg
+                                                AFTER INSERT ON clients
+                                                BEGIN
+                                                    INSERT INTO clients_trigram(rowid, client_first_name, client_last_name)
+                                                        VALUES(NEW.client_id, NEW.client_first_name, NEW.client_last_name);
+                                                END;'''
+
+create_clients_trigram_delete_trigger_query = '''CREATE TRIGGER IF NOT EXISTS clients_trigram_delete_trg
+                                                AFTER DELETE ON clients
+                                                BEGIN
+                                                    INSERT INTO clients_trigram(clients_trigram, rowid, client_first_name, client_last_name)
+                                                        VALUES('delete', OLD.client_id, OLD.client_first_name, OLD.client_last_name);
+                                                END;'''
+
+# class and house renames don't touch the index
+create_clients_trigram_update_trigger_query = '''CREATE TRIGGER IF NOT EXISTS clients_trigram_update_trg
+                                                AFTER UPDATE OF client_first_name, client_last_name ON clients
+                                                BEGIN
+                                                    INSERT INTO clients_trigram(clients_trigram, rowid, client_first_name, client_last_name)
+                                                        VALUES('delete', OLD.client_id, OLD.client_first_name, OLD.client_last_name);
+                                                    INSERT INTO clients_trigram(rowid, client_first_name, client_last_name)
+                                                        VALUES(NEW.client_id, NEW.client_first_name, NEW.client_last_name);
+                                                END;'''
+
+rebuild_trigram_queries = (
+    "INSERT INTO books_trigram(books_trigram) VALUES('rebuild')",
+    "INSERT INTO clients_trigram(clients_trigram) VALUES('rebuild')",
+)
+
+def pageStatementName(statement: str, filters: dict, applied=()) -> str:
+    """Name of page statement restricted by the filters applied, in the order of filters."""
+    return ':'.join([statement] + [name for name in filters if name in applied])
+
+
+def filteredPageStatements(select_query: str, page_keysets: dict, filters: dict, page_name, always=()) -> dict:
+    """Every page statement of page_keysets with every combination of filters, named by
+    page_name(statement, filters applied). select_query has a {where} and a {limit} placeholder,
+    the conditions of always restrict every page. Values: the filters' values, the keyset values, the page size.
+    """
+    statements = {}
+    for statement, (keyset, limit) in page_keysets.items():
+        for size in range(len(filters) + 1):
+            for applied in combinations(filters, size):
+                conditions = list(always) + [filters[name] for name in applied] + ([keyset] if keyset else [])
+                where = 'WHERE ' + ' AND '.join(conditions) if conditions else ''
+                statements[page_name(statement, applied)] = select_query.format(where=where, limit=limit)
+    return statements
+
+
+# keyset pages of the transactions history, newest first. transaction_id (the rowid) breaks ties
+# between transactions of the same second, {where} compares (datetime, transaction_id) to a row shown.
+# The page is picked from the indexes, reading only the rows checked against transactions_page_conditions,
+# and joined afterwards, so sorting a filter's matches doesn't read them. LEFT JOINs keep pages full and
+# show the transactions of deleted books, clients and users
+select_transactions_page_query = '''SELECT
+                                    coalesce(name, 'USER ID '||transactions.user_id) AS user,
+                                    book_title || ', ' || category AS book,
+                                    transactions.type,
+                                    transactions.quantity,
+                                    client_first_name || ' ' || client_last_name AS client,
+                                    transactions.datetime,
+                                    page.transaction_id
+                                    FROM (SELECT transactions.rowid AS transaction_id FROM transactions
+                                          {where}
+                                          ORDER BY transactions.datetime DESC, transactions.rowid DESC{limit}) AS page
+                                    INNER JOIN transactions ON transactions.rowid == page.transaction_id
+                                    LEFT JOIN clients ON transactions.client_id == clients.client_id
+                                    LEFT JOIN books ON books.book_id == transactions.book_id
+                                    LEFT JOIN users ON users.user_id == transactions.user_id
+                                    ORDER BY transactions.datetime DESC, transactions.rowid DESC'''
+
+create_transactions_datetime_index_query = "CREATE INDEX IF NOT EXISTS transactions_datetime_idx ON transactions(datetime)"
+
+# the (column, datetime) indexes return a filtered history already in datetime order
+create_transactions_filter_index_queries = (
+    "CREATE INDEX IF NOT EXISTS transactions_user_datetime_idx ON transactions(user_id, datetime)",
+    "CREATE INDEX IF NOT EXISTS transactions_book_datetime_idx ON transactions(book_id, datetime)",
+    "CREATE INDEX IF NOT EXISTS transactions_client_datetime_idx ON transactions(client_id, datetime)",
+)
+
+# transactions history filters, {filter: WHERE condition}. Their values are bound in this order
+transactions_filters = {
+    'days': "transactions.datetime >= ? AND transactions.datetime < date(?, '+1 day')",  # first day, last day
+    'user': "transactions.user_id = (SELECT user_id FROM users WHERE user_name = ?)",  # user name
+    'book': "transactions.book_id IN (SELECT book_id FROM books WHERE book_title = ?)",  # book title
+    'category': "transactions.book_id IN (SELECT book_id FROM books WHERE category = ?)",  # category
+    'client': '''transactions.client_id IN (SELECT client_id FROM clients
+                  WHERE client_first_name = ? AND client_last_name = ?)''',  # first name, last name
+}
+
+# index each filter has to be served by, checked with python maintenance.py explain
+transactions_filter_indexes = {
+    'days': 'transactions_datetime_idx',
+    'user': 'transactions_user_datetime_idx',
+    'book': 'transactions_book_datetime_idx',
+    'category': 'transactions_book_datetime_idx',
+    'client': 'transactions_client_datetime_idx',
+}
+
+# {page statement: (keyset condition, LIMIT clause)}, keyset values are datetime and transaction_id
+transactions_page_keysets = {
+    # first page
+    'select_transactions_page': ('', " LIMIT ?"),
+    # page older than the last row shown
+    'select_transactions_page_after': ("(transactions.datetime, transactions.rowid) < (?, ?)", " LIMIT ?"),
+    # every row newer than the first row shown
+    'select_transactions_newer': ("(transactions.datetime, transactions.rowid) > (?, ?)", ''),
+}
+
+
+# every transactions history page leaves out the zero quantity filler rows of older versions, which
+# have neither a client nor a book, see count_filler_transactions_query
+transactions_page_conditions = ("transactions.client_id IS NOT NULL",)
+
+
+def transactionsPageName(statement: str, filters=()) -> str:
+    """Name of page statement (a transactions_page_keysets key) restricted by filters."""
+    return pageStatementName(statement, transactions_filters, filters)
+
+
+def transactionsPageStatements() -> dict:
+    """Every transactions history page statement with every combination of filters."""
+    return filteredPageStatements(select_transactions_page_query, transactions_page_keysets, transactions_filters,
+                                  transactionsPageName, transactions_page_conditions)
+
+
+# keyset pages of the users' history, newest first, from {history}: history or the history_all view
+# of the live and archived events. Rows are decoded by history.describeEvent
+select_history_page_query = '''SELECT
+                                coalesce(users.user_name, json_extract(history.payload, '$.user_name'),
+                                         'USER ID '||history.user_id) AS user,
+                                history.[action],
+                                history.[table],
+                                history.payload,
+                                history.datetime,
+                                history.event_id
+                                FROM {history} AS history
+                                LEFT JOIN users ON users.user_id == history.user_id
+                                {where}
+                                ORDER BY history.datetime DESC, history.event_id DESC{limit}'''
+
+# users' history filters, {filter: WHERE condition}. Their values are bound in this order
+history_filters = {
+    'days': "history.datetime >= ? AND history.datetime < date(?, '+1 day')",  # first day, last day
+    'user': "history.user_id = (SELECT user_id FROM users WHERE user_name = ?)",  # user name
+    'table': "history.[table] = ?",  # table code
+}
+
+# index each filter has to be served by, checked with python maintenance.py explain
+history_filter_indexes = {
+    'days': 'history_datetime_idx',
+    'user': 'history_user_datetime_idx',
+    'table': 'history_table_datetime_idx',
+}
+
+# {page statement: (keyset condition, LIMIT clause)}, keyset values are datetime and event_id
+history_page_keysets = {
+    # first page
+    'select_history_page': ('', " LIMIT ?"),
+    # page older than the last row shown
+    'select_history_page_after': ("(history.datetime, history.event_id) < (?, ?)", " LIMIT ?"),
+    # every row newer than the first row shown
+    'select_history_newer': ("(history.datetime, history.event_id) > (?, ?)", ''),
+}
+
+
+def historyPageName(statement: str, filters=(), archived=False) -> str:
+    """Name of page statement (a history_page_keysets key) restricted by filters,
+    over the archived history too if archived.
+    """
+    if archived:
+        statement = statement.replace('select_', 'select_all_', 1)
+    return pageStatementName(statement, history_filters, filters)
+
+
+def historyPageStatements() -> dict:
+    """Every users' history page statement with every combination of filters, over the live
+    history and over the live and archived history.
+    """
+    statements = {}
+    for archived, history in ((False, 'history'), (True, 'history_all')):
+        statements.update(filteredPageStatements(
+            select_history_page_query.replace('{history}', history), history_page_keysets, history_filters,
+            lambda statement, filters: historyPageName(statement, filters, archived)))
+    return statements
+
+
+# ledger export of {transactions}, LEFT JOINs keep the transactions of deleted books and users
+count_transactions_export_query = '''SELECT count(*) FROM {transactions}
+                                    WHERE datetime >= ? AND datetime < date(?, '+1 day')
+                                    AND (? = '' OR type = ?)'''
+
+select_transactions_export_query = '''SELECT
+                                    coalesce(name, 'USER ID '||transactions.user_id) AS user,
+                                    book_title || ', ' || category AS book,
+                                    transactions.type,
+                                    transactions.quantity,
+                                    client_first_name || ' ' || client_last_name AS client,
+                                    datetime
+                                    FROM {transactions} AS transactions
+                                    LEFT JOIN clients ON transactions.client_id == clients.client_id
+                                    LEFT JOIN books ON books.book_id == transactions.book_id
+                                    LEFT JOIN users ON users.user_id == transactions.user_id
+                                    WHERE datetime >= ? AND datetime < date(?, '+1 day')
+                                    AND (? = '' OR transactions.type = ?)
+                                    ORDER BY datetime'''
+
+# archival of old rows into per-year files, see archive.py. {schema} is the attached archive
+archived_tables = ('history', 'transactions')
+
+select_archive_years_query = "SELECT DISTINCT strftime('%Y', datetime) FROM {table} WHERE datetime < ?"
+
+create_archive_table_query = "CREATE TABLE IF NOT EXISTS {schema}.{table} AS SELECT * FROM main.{table} WHERE 0"
+
+create_archive_index_query = "CREATE INDEX IF NOT EXISTS {schema}.{table}_datetime_idx ON {table}(datetime)"
+
+copy_archive_rows_query = '''INSERT INTO {schema}.{table} SELECT * FROM main.{table}
+                                WHERE datetime < ? AND strftime('%Y', datetime) = ?'''
+
+delete_archived_rows_query = "DELETE FROM main.{table} WHERE datetime < ? AND strftime('%Y', datetime) = ?"
+
+create_live_view_query = "CREATE TEMP VIEW {table}_all AS SELECT * FROM main.{table}"
+
+# {selects} is one 'SELECT * FROM schema.table' per archive joined with UNION ALL
+create_archive_view_query = '''CREATE TEMP VIEW {table}_all AS
+                                SELECT * FROM main.{table} UNION ALL {selects}'''
+
+# Statements run through statements.StatementRegistry, prepared once per connection.
+# Values are bound to the ? placeholders in order.
+prepared_statements = {
+    # transaction control, see StatementRegistry.transaction
+    'begin_immediate': "BEGIN IMMEDIATE",
+    'commit': "COMMIT",
+    'rollback': "ROLLBACK",
+
+    # users
+    'select_login_user': "SELECT user_id, user_password FROM users WHERE user_name=?",
+    'select_usernames': "SELECT user_name FROM users",
+    'select_user_id': "SELECT user_id FROM users WHERE user_name=?",
+    'insert_user': "INSERT INTO users(user_name, name, user_password) VALUES(?, ?, ?)",
+    'update_username': "UPDATE users SET user_name=? WHERE user_id=?",
+    'update_password': update_password_query,
+    'delete_user': "DELETE FROM users WHERE user_name=?",
+
+    # permissions
+    'select_permission_names': "SELECT name FROM PRAGMA_TABLE_INFO('user_permissions')",
+    'select_user_permissions': "SELECT * FROM user_permissions WHERE user_name=?",
+    'insert_user_permissions': "INSERT INTO user_permissions VALUES(?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)",
+    'insert_standard_permissions': "INSERT INTO user_permissions VALUES(?,2,1,2,0,0,2,2,2,2,2,1,0,2,1,2,0,0,2,0,0,0,0,0,0)",
+    'insert_admin_permissions': "INSERT INTO user_permissions VALUES(?,2,2,2,2,2,2,2,2,2,2,2,2,2,2,2,2,2,2,2,2,2,2,2,2)",
+    'update_permissions_username': "UPDATE user_permissions SET user_name=? WHERE user_name=?",
+    'delete_user_permissions': "DELETE FROM user_permissions WHERE user_name=?",
+
+    # history
+    # values: user_id, action code, table code, JSON payload, see history.historyValues
+    'insert_history': "INSERT INTO history(user_id, [action], [table], payload) VALUES(?, ?, ?, ?)",
+    # history pages are added below by historyPageStatements
+
+    # dashboard and graph
+    'select_dashboard_counters': select_dashboard_counters_query,
+    'select_first_transaction_day': select_first_transaction_day_query,
+    'select_transaction_daily': "SELECT date, type, quantity FROM transaction_daily WHERE date BETWEEN ? AND ?",
+
+    # books and categories
+    'select_book': "SELECT * FROM books WHERE book_title=? AND category=?",
+    'select_books_by_title': "SELECT * FROM books WHERE book_title=?",
+    'select_books_sorted': "SELECT * FROM books ORDER BY category, book_title",
+    'select_book_by_id': "SELECT * FROM books WHERE book_id=?",
+    'select_book_categories': "SELECT category FROM books WHERE book_title=?",
+    # (text, rows having it) of the completers, see models.CompletionIndex
+    'select_book_title_counts': "SELECT book_title, count(*) FROM books GROUP BY book_title",
+    # values: fts5 query (see search.ftsQuery), maximum rows. Title matches weigh 10 times category ones
+    'search_books': '''SELECT books.* FROM books_fts JOIN books ON books.book_id = books_fts.rowid
+                        WHERE books_fts MATCH ? ORDER BY bm25(books_fts, 10.0, 1.0) LIMIT ?''',
+    # values: trigram query (see search.trigramQuery), maximum candidates. Reranked by search.similarity
+    'search_similar_books': '''SELECT books.* FROM books_trigram JOIN books ON books.book_id = books_trigram.rowid
+                                WHERE books_trigram MATCH ? ORDER BY bm25(books_trigram) LIMIT ?''',
+    'search_similar_clients': '''SELECT clients.* FROM clients_trigram JOIN clients ON clients.client_id = clients_trigram.rowid
+                                WHERE clients_trigram MATCH ? ORDER BY bm25(clients_trigram) LIMIT ?''',
+    'insert_book': "INSERT INTO books(book_title, category, quantity) VALUES(?, ?, ?)",
+    'update_book': "UPDATE books SET book_title=?, category=?, quantity=? WHERE book_id=?",
+    'update_book_quantity': "UPDATE books SET quantity=quantity+? WHERE book_id=?",
+    'take_book_quantity': "UPDATE books SET quantity=quantity-? WHERE book_id=? AND quantity>=?",
+    'delete_book': "DELETE FROM books WHERE book_title=? AND category=?",
+    'select_category': "SELECT * FROM categories WHERE category=?",
+    'insert_category': "INSERT INTO categories VALUES(?)",
+    'select_books_count': "SELECT count(*) FROM books",
+    'insert_import_book': "INSERT INTO import_books(book_title, category, quantity) VALUES(?, ?, ?)",
+    'insert_import_categories': '''INSERT OR IGNORE INTO categories(category)
+                                    SELECT DISTINCT category FROM import_books''',
+    # WHERE true keeps SQLite from reading ON CONFLICT as a join constraint
+    'upsert_import_books': '''INSERT INTO books(book_title, category, quantity)
+                                SELECT book_title, category, sum(quantity) FROM import_books WHERE true
+                                GROUP BY book_title, category
+                                ON CONFLICT(book_title, category) DO UPDATE SET quantity=quantity+excluded.quantity''',
+    'delete_import_books': "DELETE FROM import_books",
+
+    # clients and their records
+    'select_client_id': '''SELECT client_id FROM clients WHERE client_first_name=? AND client_last_name=?
+                            AND client_class=? AND client_house=?''',
+    'select_client': '''SELECT client_first_name, client_last_name, client_class, client_house FROM clients
+                        WHERE client_id=?''',
+    'select_client_first_name_counts': "SELECT client_first_name, count(*) FROM clients GROUP BY client_first_name",
+    'select_client_last_name_counts': "SELECT client_last_name, count(*) FROM clients GROUP BY client_last_name",
+    'insert_client': '''INSERT OR IGNORE INTO clients(client_first_name, client_last_name, client_class, client_house)
+                        VALUES(?, ?, ?, ?)''',
+    'select_book_borrower_ids': "SELECT client_id FROM client_records WHERE book_id=? AND returned=0",
+    'select_client_record': '''SELECT BOOK_TITLE, CATEGORY, OWING_QUANTITY, RETURNED FROM client_record_vw
+                                WHERE first_name=? AND last_name=? AND class=? AND house=? AND RETURNED=FALSE''',
+    'select_unreturned_client_records': "SELECT * FROM client_record_vw WHERE returned=0",
+    'upsert_client_record_lend': '''INSERT INTO client_records(client_id, book_id, quantity, returned) VALUES(?, ?, ?, FALSE)
+                                    ON CONFLICT(client_id, book_id) DO UPDATE SET quantity=quantity+excluded.quantity,
+                                    returned=FALSE''',
+
+    'update_client_record_retrieve': '''UPDATE client_records SET quantity=quantity-?,
+                                        returned=(CASE WHEN quantity-?=0 THEN TRUE ELSE FALSE END)
+                                        WHERE client_id=? AND book_id=? AND quantity>=?''',
+
+    # transactions
+    'insert_transaction': "INSERT INTO transactions(client_id, book_id, quantity, type, user_id) VALUES(?, ?, ?, ?, ?)",
+    # transactions history pages are added below by transactionsPageStatements
+    # ledger export, values: first day, last day, type ('' for every type) twice
+    'count_transactions_export': count_transactions_export_query.format(transactions='transactions'),
+    'select_transactions_export': select_transactions_export_query.format(transactions='transactions'),
+    # the same with the archives attached by archive.attachArchives
+    'count_all_transactions_export': count_transactions_export_query.format(transactions='transactions_all'),
+    'select_all_transactions_export': select_transactions_export_query.format(transactions='transactions_all'),
+
+    # classes and houses
+    'insert_class': "INSERT INTO classes VALUES(?)",
+    'update_class': "UPDATE classes SET class=? WHERE class=?",
+    'delete_class': "DELETE FROM classes WHERE class=?",
+    'update_clients_class': "UPDATE clients SET client_class=? WHERE client_class=?",
+    'select_class_owing_clients': '''SELECT FIRST_NAME, LAST_NAME, CLASS, HOUSE FROM client_record_vw
+                                        WHERE class=? AND returned=0''',
+    'insert_house': "INSERT INTO houses VALUES(?)",
+    'update_house': "UPDATE houses SET house=? WHERE house=?",
+    'delete_house': "DELETE FROM houses WHERE house=?",
+    'update_clients_house': "UPDATE clients SET client_house=? WHERE client_house=?",
+    'select_classes': "SELECT class FROM classes",
+    'select_houses': "SELECT house FROM houses",
+    'select_clients_count': "SELECT count(*) FROM clients",
+    'select_house_owing_clients': '''SELECT FIRST_NAME, LAST_NAME, CLASS, HOUSE FROM client_record_vw
+                                        WHERE house=? AND returned=0''',
+}
+prepared_statements.update(transactionsPageStatements())
+prepared_statements.update(historyPageStatements())
@@ -0,0 +1,79 @@
+"""Catalogue search helpers."""
+import re
+
+
+SEARCH_LIMIT = 200  # rows shown for a search
+
+# a one letter prefix matches most of the catalogue, ranking all of it takes tens of milliseconds
+MIN_SEARCH_LENGTH = 2
+
+
+def ftsQuery(text: str) -> str:
+    """Turns what the user typed into an FTS5 query matching every word as a prefix, in any order.
+
+    Words are quoted so FTS5 operators and punctuation in titles are taken literally,
+    e.g. harry pot -> "harry"* "pot"*. Returns '' if there are fewer than MIN_SEARCH_LENGTH
+    letters to search for.
+    """
+    words = re.findall(r'\w+', text)
+    if len(''.join(words)) < MIN_SEARCH_LENGTH:
+        return ''
+    return ' '.join('"{}"*'.format(word.replace('"', '""')) for word in words)
+
+
+CANDIDATE_LIMIT = 50  # rows ranked by the trigram index before reranking by similarity
+SUGGESTION_LIMIT = 5
+MIN_SIMILARITY = 0.25
+
+
+def trigrams(text: str) -> set:
+    """Lower case three character substrings of text, the units of the trigram indexes."""
+    text = ' '.join(text.lower().split())
+    return {text[index:index + 3] for index in range(len(text) - 2)}
+
+
+def trigramQuery(text: str, column: str = None) -> str:
+    """FTS5 query matching rows sharing at least one trigram with text, in column if given.
+    Returns '' if text is shorter than a trigram.
+    """
+    terms = ' OR '.join('"{}"'.format(trigram.replace('"', '""')) for trigram in sorted(trigrams(text)))
+    if not terms:
+        return ''
+    return f"{column} : ({terms})" if column else terms
+
+
+def similarity(text: str, other: str) -> float:
+    """Share of trigrams two texts have in common, 1.0 for the same text ignoring case."""
+    if text.lower() == other.lower():
+        return 1.0
+    text_trigrams, other_trigrams = trigrams(text), trigrams(other)
+    if not text_trigrams or not other_trigrams:
+        return 0.0
+    return len(text_trigrams & other_trigrams) / len(text_trigrams | other_trigrams)
+
+
+def similarBooks(statements, book_title: str, category: str = None) -> list:
+    """Books whose title looks like book_title, most similar first. A matching category breaks ties."""
+    query = trigramQuery(book_title)
+    if not query:
+        return []
+    scored = [(similarity(book_title, book[1]), book[2] == category, book)
+              for book in statements.fetchAll('search_similar_books', query, CANDIDATE_LIMIT)]
+    scored.sort(key=lambda score: score[:2], reverse=True)
+    return [book for score, _, book in scored if score >= MIN_SIMILARITY][:SUGGESTION_LIMIT]
+
+
+def similarClients(statements, fname: str, lname: str, class_: str = None, house: str = None) -> list:
+    """Clients whose names look like fname and lname, most similar first.
+    A matching class, then house, breaks ties.
+    """
+    queries = [query for query in (trigramQuery(fname, 'client_first_name'), trigramQuery(lname, 'client_last_name'))
+               if query]
+    if not queries:
+        return []
+    scored = []
+    for client in statements.fetchAll('search_similar_clients', ' OR '.join(queries), CANDIDATE_LIMIT):
+        score = (similarity(fname, client[1]) + similarity(lname, client[2])) / 2
+        scored.append((score, client[3] == class_, client[4] == house, client))
+    scored.sort(key=lambda score: score[:3], reverse=True)
+    return [client for score, _, _, client in scored if score >= MIN_SIMILARITY][:SUGGESTION_LIMIT]
@@ -0,0 +1,126 @@
+from contextlib import contextmanager
+
+from PyQt5.QtCore import QByteArray
+from PyQt5.QtSql import QSqlDatabase, QSqlQuery
+
+
+class StatementError(Exception):
+    """A statement failed inside a StatementRegistry.transaction() block."""
+
+
+def bindValues(query: QSqlQuery, values):
+    """Binds values to the placeholders of query in order."""
+    for index, value in enumerate(values):
+        # bytes would be bound as an empty string, a QByteArray is bound as a BLOB
+        query.bindValue(index, QByteArray(value) if isinstance(value, bytes) else value)
+
+
+class StatementRegistry:
+    """Named, parameterised statements prepared once per connection.
+
+    A statement is parsed and planned by SQLite the first time it is run (a miss),
+    later runs only re-bind its values (a hit).
+    """
+
+    def __init__(self, database: QSqlDatabase, statements: dict):
+        self.database = database
+        self.statements = statements  # {name: sql with ? placeholders}
+        self.prepared = {}  # {name: forward only QSqlQuery}
+        self.hits = 0
+        self.misses = 0
+
+    def newQuery(self, name: str, forward_only=True) -> QSqlQuery:
+        """A query of its own with statement name prepared, raises ValueError if it can't be prepared."""
+        query = QSqlQuery(self.database)
+        query.setForwardOnly(forward_only)
+        if not query.prepare(self.statements[name]):
+            raise ValueError(f"Can't prepare statement '{name}': {query.lastError().text()}")
+        return query
+
+    def prepare(self, name: str) -> QSqlQuery:
+        """Returns the prepared query of statement name, preparing it on first use.
+        The query is re-bound and re-run by the next execute of name, read its rows before that.
+        """
+        prepared_query = self.prepared.get(name)
+        if prepared_query is None:
+            self.misses += 1
+            prepared_query = self.prepared[name] = self.newQuery(name)
+        else:
+            self.hits += 1
+        return prepared_query
+
+    def execute(self, name: str, *values) -> QSqlQuery:
+        """Binds values to statement name in order and executes it.
+        Check lastError() of the returned query to know whether it failed.
+        """
+        prepared_query = self.prepare(name)
+        bindValues(prepared_query, values)
+        prepared_query.exec_()
+        return prepared_query
+
+    def executeOrRaise(self, name: str, *values) -> QSqlQuery:
+        """Same as execute but raises StatementError if the statement fails."""
+        prepared_query = self.execute(name, *values)
+        if prepared_query.lastError().isValid():
+            raise StatementError(f"{name}: {prepared_query.lastError().text()}")
+        return prepared_query
+
+    @contextmanager
+    def transaction(self):
+        """Runs the block as one BEGIN IMMEDIATE ... COMMIT unit of work (a single fsync).
+        The write lock is taken up front and everything is rolled back if the block raises.
+        """
+        self.executeOrRaise('begin_immediate')
+        try:
+            yield self
+        except BaseException:
+            self.execute('rollback')
+            raise
+        commit_query = self.execute('commit')
+        if commit_query.lastError().isValid():
+            self.execute('rollback')
+            raise StatementError(f"commit: {commit_query.lastError().text()}")
+
+    def executeForModel(self, name: str, *values) -> QSqlQuery:
+        """Executes statement name for a QSqlQueryModel.setQuery call.
+
+        The model keeps reading the query it is given, so it gets a scrollable query of its own
+        rather than the cached one a later execute of name would re-run under it.
+        """
+        model_query = self.newQuery(name, forward_only=False)
+        bindValues(model_query, values)
+        model_query.exec_()
+        return model_query
+
+    def fetchAll(self, name: str, *values) -> list:
+        """Executes statement name and returns all its rows as tuples."""
+        return self.fetchTable(name, *values)[1]
+
+    def fetchTable(self, name: str, *values) -> tuple:
+        """Executes statement name and returns its (column names, rows as tuples)."""
+        prepared_query = self.execute(name, *values)
+        record = prepared_query.record()
+        columns = [record.fieldName(column) for column in range(record.count())]
+        rows = []
+        while prepared_query.next():
+            rows.append(tuple(prepared_query.value(column) for column in range(len(columns))))
+        prepared_query.finish()  # releases the read cursor
+        return columns, rows
+
+    def fetchOne(self, name: str, *values) -> tuple or None:
+        """Executes statement name and returns its first row as a tuple, None if it has no rows."""
+        prepared_query = self.execute(name, *values)
+        row = None
+        if prepared_query.next():
+            row = tuple(prepared_query.value(column)
+                        for column in range(prepared_query.record().count()))
+        prepared_query.finish()
+        return row
+
+    def fetchColumn(self, name: str, *values) -> list:
+        """Executes statement name and returns the first column of all its rows."""
+        return [row[0] for row in self.fetchAll(name, *values)]
+
+    def stats(self) -> dict:
+        """Prepared statement cache counters."""
+        return {'prepared': len(self.prepared), 'hits': self.hits, 'misses': self.misses}
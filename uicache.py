@@ -0,0 +1,97 @@
+"""Compiled UI module cache.
+
+The Qt Designer files (login.ui, main.ui and tabs/*.ui) are compiled to Python modules in ui_cache/
+instead of being parsed and turned into code by uic.loadUiType on every launch. A compiled module
+records the SHA-256 of its .ui file and is only regenerated when the .ui file changes.
+
+Run from the project directory to compile every .ui file ahead of the first launch:
+
+    python uicache.py
+"""
+import hashlib
+import importlib.util
+import io
+import os
+import sys
+
+from PyQt5 import uic
+
+
+base_dir = os.path.dirname(os.path.abspath(__file__))
+cache_dir = os.path.join(base_dir, 'ui_cache')
+
+HASH_PREFIX = '# ui source sha256: '  # first line of a compiled module
+
+
+def uiFiles() -> list:
+    """Paths of the .ui files of the app, the login and main windows then the tabs."""
+    tabs_dir = os.path.join(base_dir, 'tabs')
+    return [os.path.join(base_dir, 'login.ui'), os.path.join(base_dir, 'main.ui')] + sorted(
+        os.path.join(tabs_dir, name) for name in os.listdir(tabs_dir) if name.endswith('.ui'))
+
+
+def compiledPath(ui_path: str, cache_dir: str = cache_dir) -> str:
+    """Path of the compiled module of ui_path, e.g. ui_cache/books_tab_ui.py for tabs/books_tab.ui."""
+    return os.path.join(cache_dir, os.path.splitext(os.path.basename(ui_path))[0] + '_ui.py')
+
+
+def compiledHash(path: str) -> str or None:
+    """Hash of the .ui file the module at path was compiled from, None if there is no module."""
+    try:
+        with open(path, encoding='utf-8') as module:
+            first_line = module.readline().rstrip('\n')
+    except FileNotFoundError:
+        return None
+    return first_line[len(HASH_PREFIX):] if first_line.startswith(HASH_PREFIX) else None
+
+
+def compileUi(ui_path: str, cache_dir: str = cache_dir) -> bool:
+    """Compiles ui_path into cache_dir unless its compiled module is current.
+
+    Returns whether it was (re)compiled. Raises OSError if the module can't be written.
+    """
+    with open(ui_path, 'rb') as ui_file:
+        source_hash = hashlib.sha256(ui_file.read()).hexdigest()
+    path = compiledPath(ui_path, cache_dir)
+    if compiledHash(path) == source_hash:
+        return False
+
+    code = io.StringIO()
+    uic.compileUi(ui_path, code)
+    os.makedirs(cache_dir, exist_ok=True)
+    # written aside then renamed, a launch never imports half a module
+    with open(path + '.tmp', 'w', encoding='utf-8') as module:
+        module.write(f"{HASH_PREFIX}{source_hash}\n{code.getvalue()}")
+    os.replace(path + '.tmp', path)
+    return True
+
+
+def loadUiClass(ui_path: str, cache_dir: str = cache_dir) -> type:
+    """Form class of ui_path (the first value uic.loadUiType returns), imported from its compiled module.
+
+    The module is compiled first if it is missing or out of date. Where ui_cache can't be
+    written, e.g. a read-only install, the .ui file is compiled in memory as before.
+    """
+    try:
+        compileUi(ui_path, cache_dir)
+    except OSError:
+        return uic.loadUiType(ui_path)[0]
+
+    path = compiledPath(ui_path, cache_dir)
+    spec = importlib.util.spec_from_file_location(os.path.basename(path)[:-3], path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    # pyuic names the form class Ui_<class of the .ui file>
+    return next(value for name, value in vars(module).items() if name.startswith('Ui_') and isinstance(value, type))
+
+
+def main() -> int:
+    for ui_path in uiFiles():
+        compiled = compileUi(ui_path)
+        print(f"{'compiled  ' if compiled else 'up to date'} {os.path.relpath(ui_path, base_dir)}"
+              f" -> {os.path.relpath(compiledPath(ui_path), base_dir)}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,34 @@
+"""Database warm-up while the user signs in.
+
+Runs on a pooled connection in parallel with the password check, see LoginWindow.handleLogin.
+Pages read by any connection stay in the OS page cache (and the shared mmap), so the main
+window's first reads don't wait on the disk. The dashboard counters are read on the way and
+handed to the main window.
+"""
+from PyQt5.QtSql import QSqlDatabase, QSqlQuery
+
+from queries import *
+
+
+def warmUpDatabase(database: QSqlDatabase, progress=None, cancelled=None) -> list:
+    """Runs the warm-up queries on database and returns the dashboard counters rows (day, counter, value).
+
+    A warm-up query that fails is skipped, e.g. on a database older tables are missing from.
+    """
+    query = QSqlQuery(database)
+    query.setForwardOnly(True)
+    for number, statement in enumerate(warm_up_queries, 1):
+        if cancelled is not None and cancelled():
+            break
+        if query.exec_(statement):
+            while query.next():
+                pass
+        if progress is not None:
+            progress(number, len(warm_up_queries))
+
+    counters = []
+    if query.exec_(select_dashboard_counters_query):
+        while query.next():
+            counters.append((query.value(0), query.value(1), query.value(2)))
+    query.finish()
+    return counters
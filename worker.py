@@ -0,0 +1,299 @@
+"""Background database worker.
+
+Reads that can take seconds on a large database run on their own thread and connection,
+their rows come back to the GUI thread through signals so the window keeps repainting.
+"""
+from contextlib import contextmanager
+from itertools import count
+
+from PyQt5.QtCore import QMetaObject, QObject, Qt, QThread, pyqtSignal, pyqtSlot
+from PyQt5.QtSql import QSqlDatabase, QSqlQuery
+from connection import ConnectionPool
+from statements import StatementRegistry
+
+
+def hasSessionState(database: QSqlDatabase) -> bool:
+    """Whether database has attached databases or TEMP tables or views, which closing it would lose."""
+    query = QSqlQuery(database)
+    query.exec_("PRAGMA database_list")
+    while query.next():
+        if query.value(1) not in ('main', 'temp'):
+            return True
+    query.exec_("SELECT count(*) FROM temp.sqlite_master")
+    return query.next() and query.value(0) > 0
+
+
+class QueryRunner(QObject):
+    """Runs named statements on the worker connection. Lives in the worker thread.
+
+    The connection is acquired from the pool for each request, so it counts as idle in between
+    and retireIdle() can close it; the next request then opens a new one.
+    """
+
+    finished = pyqtSignal(int, list, list)  # request id, column names, rows
+    returned = pyqtSignal(int, object)  # request id, return value of a call
+    failed = pyqtSignal(int, str)  # request id, error
+
+    def __init__(self, pool: ConnectionPool, statements: dict):
+        super().__init__()
+        self.pool = pool
+        self.statements = statements
+        self.registry = None  # of the worker connection, None until opened and once retired
+        self.closed = False
+
+    @contextmanager
+    def connection(self):
+        """Acquires the worker connection for a block and yields its StatementRegistry.
+
+        Raises ValueError if the worker was closed or the connection can't be opened.
+        """
+        if self.closed:
+            raise ValueError("Worker database is not open.")
+        database = self.pool.acquire()
+        try:
+            if self.registry is None or self.registry.database.connectionName() != database.connectionName():
+                self.registry = StatementRegistry(database, self.statements)
+            yield self.registry
+        finally:
+            self.pool.release()
+
+    @pyqtSlot()
+    def open(self):
+        """Opens the worker connection ahead of the first request, must run in the worker thread."""
+        try:
+            with self.connection():
+                pass
+        except ValueError as error:
+            print(f"Worker can't open database: {error}")
+
+    @pyqtSlot(int, str, object)
+    def run(self, request_id: int, name: str, values: tuple):
+        try:
+            with self.connection() as registry:
+                prepared_query = registry.execute(name, *values)
+                if prepared_query.lastError().isValid():
+                    self.failed.emit(request_id, prepared_query.lastError().text())
+                    return
+                record = prepared_query.record()
+                columns = [record.fieldName(column) for column in range(record.count())]
+                rows = []
+                while prepared_query.next():
+                    rows.append(tuple(prepared_query.value(column) for column in range(len(columns))))
+                prepared_query.finish()
+        except ValueError as error:
+            self.failed.emit(request_id, str(error))
+            return
+        self.finished.emit(request_id, columns, rows)
+
+    @pyqtSlot(int, object, object)
+    def call(self, request_id: int, function, args: tuple):
+        """Runs function(database, *args) on the worker connection, e.g. to attach databases to it."""
+        try:
+            with self.connection() as registry:
+                result = function(registry.database, *args)
+        except Exception as error:
+            self.failed.emit(request_id, str(error))
+        else:
+            self.returned.emit(request_id, result)
+
+    @pyqtSlot()
+    def retireIdle(self):
+        """Closes the worker connection once it has been idle for the pool's idle_timeout, must run in the
+        worker thread. A connection with the archives attached (the archived history view) is kept, they'd be lost.
+        """
+        if self.registry is None or not self.pool.isIdle() or hasSessionState(self.registry.database):
+            return
+        self.registry = None  # drops the prepared queries holding the connection
+        self.pool.retireIdle()
+
+    @pyqtSlot()
+    def close(self):
+        """Drops the prepared queries of the worker connection, must run in the worker thread.
+        The connection is closed with the pool's.
+        """
+        self.closed = True
+        self.registry = None
+
+
+class DatabaseWorker(QObject):
+    """GUI thread handle of the worker thread.
+
+    submit() queues a statement; its callback is called on the GUI thread with the column names
+    and rows once the worker has run it. submitCall() queues a function of the worker connection
+    the same way. Requests run in the order they were queued. busyChanged fires when the first
+    request is queued and when the last busy request is answered.
+    """
+
+    requested = pyqtSignal(int, str, object)
+    call_requested = pyqtSignal(int, object, object)
+    busyChanged = pyqtSignal(bool)
+
+    def __init__(self, pool: ConnectionPool, statements: dict, name='db_worker'):
+        super().__init__()
+        self.callbacks = {}  # {request id: (on_result, on_error, busy)}
+        self.request_ids = count(1)
+        self.busy_requests = 0
+
+        self.thread = QThread()
+        self.thread.setObjectName(name)
+        self.runner = QueryRunner(pool, statements)
+        self.runner.moveToThread(self.thread)
+        self.thread.started.connect(self.runner.open)
+        self.requested.connect(self.runner.run)
+        self.call_requested.connect(self.runner.call)
+        self.runner.finished.connect(self.handleResult)
+        self.runner.returned.connect(self.handleReturn)
+        self.runner.failed.connect(self.handleError)
+        self.thread.start()
+
+    def submit(self, name: str, *values, on_result, on_error=None, busy=True) -> int:
+        """Queues statement name with values and returns the request id.
+
+        Args:
+            on_result: called with (columns, rows)
+            on_error: called with the error text, printed if not given
+            busy: whether the request counts towards the busy indicator
+        """
+        request_id = self._addCallbacks(on_result, on_error, busy)
+        self.requested.emit(request_id, name, values)
+        return request_id
+
+    def submitCall(self, function, *args, on_result=None, on_error=None, busy=False) -> int:
+        """Queues function(database, *args) to run on the worker connection and returns the request id.
+
+        Args:
+            on_result: called with the return value, if given
+            on_error: called with the error text, printed if not given
+            busy: whether the request counts towards the busy indicator
+        """
+        request_id = self._addCallbacks(on_result, on_error, busy)
+        self.call_requested.emit(request_id, function, args)
+        return request_id
+
+    def _addCallbacks(self, on_result, on_error, busy) -> int:
+        request_id = next(self.request_ids)
+        self.callbacks[request_id] = (on_result, on_error, busy)
+        if busy:
+            self.busy_requests += 1
+            if self.busy_requests == 1:
+                self.busyChanged.emit(True)
+        return request_id
+
+    def isBusy(self) -> bool:
+        return self.busy_requests > 0
+
+    def _popCallbacks(self, request_id: int) -> tuple:
+        on_result, on_error, busy = self.callbacks.pop(request_id)
+        if busy:
+            self.busy_requests -= 1
+            if self.busy_requests == 0:
+                self.busyChanged.emit(False)
+        return on_result, on_error
+
+    @pyqtSlot(int, list, list)
+    def handleResult(self, request_id: int, columns: list, rows: list):
+        on_result, _ = self._popCallbacks(request_id)
+        on_result(columns, rows)
+
+    @pyqtSlot(int, object)
+    def handleReturn(self, request_id: int, result):
+        on_result, _ = self._popCallbacks(request_id)
+        if on_result is not None:
+            on_result(result)
+
+    @pyqtSlot(int, str)
+    def handleError(self, request_id: int, error: str):
+        _, on_error = self._popCallbacks(request_id)
+        if on_error is None:
+            print(error)
+        else:
+            on_error(error)
+
+    def retireIdle(self):
+        """Has the worker thread close its connection if it has been idle for the pool's idle_timeout,
+        once the queued requests have run. Only the thread owning a connection can close it.
+        """
+        if self.thread.isRunning():
+            QMetaObject.invokeMethod(self.runner, 'retireIdle', Qt.QueuedConnection)
+
+    def stop(self):
+        """Drops the worker's prepared queries once the queued requests have run and stops the thread."""
+        if self.thread.isRunning():
+            # queued behind the pending requests, blocks until the worker thread has run it
+            QMetaObject.invokeMethod(self.runner, 'close', Qt.BlockingQueuedConnection)
+            self.thread.quit()
+            self.thread.wait()
+
+
+class TaskRunner(QObject):
+    """Runs a BackgroundTask's function. Lives in the task's thread."""
+
+    progressed = pyqtSignal(int, int)  # done, total
+    finished = pyqtSignal(object)  # the function's return value
+    failed = pyqtSignal(str)
+
+    def __init__(self, pool: ConnectionPool or None, function, args: tuple, kwargs: dict):
+        super().__init__()
+        self.pool = pool
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self.cancelled = False
+
+    @pyqtSlot()
+    def run(self):
+        try:
+            if self.pool is None:
+                result = self.function(*self.args, **self.kwargs)
+            else:
+                with self.pool.connection() as database:
+                    result = self.function(database, *self.args, progress=self.progressed.emit,
+                                           cancelled=lambda: self.cancelled, **self.kwargs)
+        except Exception as error:
+            self.failed.emit(str(error))
+        else:
+            self.finished.emit(result)
+        QThread.currentThread().quit()
+
+
+class BackgroundTask(QObject):
+    """GUI thread handle of a one-off job on its own thread.
+
+    function is called as function(database, *args, progress=..., cancelled=..., **kwargs) with a
+    connection from the pool; progress(done, total) is relayed by progressed, cancelled() turns
+    True after cancel(). finished carries the return value, failed the error text.
+    Without a pool (pool None), CPU work like hashing a password, it is called as function(*args, **kwargs).
+
+    A started task is referenced by running until its thread has stopped, so dropping the handle
+    in a finished or failed slot, which run before the thread quits, can't destroy a running QThread.
+    """
+
+    progressed = pyqtSignal(int, int)
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+    running = set()  # started tasks whose thread hasn't stopped yet
+
+    def __init__(self, pool: ConnectionPool or None, function, *args, **kwargs):
+        super().__init__()
+        self.thread = QThread()
+        self.runner = TaskRunner(pool, function, args, kwargs)
+        self.runner.moveToThread(self.thread)
+        self.thread.started.connect(self.runner.run)
+        self.runner.progressed.connect(self.progressed)
+        self.runner.finished.connect(self.finished)
+        self.runner.failed.connect(self.failed)
+        self.thread.finished.connect(lambda: BackgroundTask.running.discard(self))
+
+    def start(self):
+        BackgroundTask.running.add(self)
+        self.thread.start()
+
+    def cancel(self):
+        self.runner.cancelled = True  # read by the task's thread between rows
+
+    def isRunning(self) -> bool:
+        return self.thread.isRunning()
+
+    def wait(self):
+        self.thread.wait()